@@ -0,0 +1,259 @@
+"""Bundles the static assets of the report. The assets are resolved from a
+local content-addressed cache and only downloaded when they are missing.
+Sources pinned by their SHA-256 digest in the manifest reject a changed or
+tampered download. Unpinned sources are trusted on their first download and
+reported, unless `--strict` rejects them."""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+import requests
+
+CACHE_VARIABLE = "ASSET_CACHE"
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache",
+                             "serlo-highrise-report")
+OUTPUT_MANIFEST = "assets.json"
+FINGERPRINT_LENGTH = 12
+
+_CSS_TOKENS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""
+                         r"|(/\*.*?\*/)|(\s*[{};,>]\s*)|(\s+)", re.DOTALL)
+_SOURCE_MAP = re.compile(r"^\s*//[#@] sourceMappingURL=.*$", re.MULTILINE)
+
+def content_hash(content):
+    """Returns the SHA-256 hash of the bytes `content` as hex string."""
+    return hashlib.sha256(content).hexdigest()
+
+def download_url(url):
+    """Downloads `url` and returns its content."""
+    req = requests.get(url, timeout=30)
+    req.raise_for_status()
+
+    return req.content
+
+class AssetCache(object):
+    """Content-addressed cache of downloaded assets in the directory
+    `directory`. Each asset is stored in a file named after its SHA-256 hash.
+    The file `index.json` maps the URLs onto the hashes of their last
+    download. Missing assets are downloaded with the function `download`."""
+
+    def __init__(self, directory, download=download_url):
+        self.directory = directory
+        self._download = download
+        self._index_file = os.path.join(directory, "index.json")
+
+        os.makedirs(directory, exist_ok=True)
+
+        try:
+            with open(self._index_file, encoding="utf-8") as index_file:
+                self._index = json.load(index_file)
+        except FileNotFoundError:
+            self._index = dict()
+
+    def _read(self, expected_hash):
+        """Returns the cached asset with the hash `expected_hash`. `None` is
+        returned when it is missing or corrupted."""
+        try:
+            with open(os.path.join(self.directory, expected_hash),
+                      "rb") as asset_file:
+                content = asset_file.read()
+        except FileNotFoundError:
+            return None
+
+        return content if content_hash(content) == expected_hash else None
+
+    def _write(self, url, content):
+        """Stores the asset `content` downloaded from `url`."""
+        path = os.path.join(self.directory, content_hash(content))
+
+        with open(path + ".tmp", "wb") as asset_file:
+            asset_file.write(content)
+
+        os.replace(path + ".tmp", path)
+
+        self._index[url] = content_hash(content)
+
+        with open(self._index_file + ".tmp", "w",
+                  encoding="utf-8") as index_file:
+            json.dump(self._index, index_file, indent=2, sort_keys=True)
+
+        os.replace(self._index_file + ".tmp", self._index_file)
+
+    def get(self, url, expected_hash=None):
+        """Returns the content of the asset `url`. When `expected_hash` is
+        given, the asset is looked up by this hash and a `ValueError` is
+        raised when the downloaded content does not match it."""
+        lookup_hash = expected_hash or self._index.get(url)
+        content = self._read(lookup_hash) if lookup_hash else None
+
+        if content is None:
+            content = self._download(url)
+
+            if expected_hash and content_hash(content) != expected_hash:
+                raise ValueError(f"Content of `{url}` does not match its "
+                                 f"hash {expected_hash}.")
+
+            self._write(url, content)
+
+        return content
+
+def minify_css(source):
+    """Removes comments and superfluous whitespace of the stylesheet `source`.
+    Strings and license comments (`/*! ... */`) are kept.
+
+    >>> minify_css('a > b ,  c {\\n  content: "  x  "; /* y */\\n}\\n')
+    'a>b,c{content: "  x  ";}'
+    >>> minify_css("/*! License */ a { }")
+    '/*! License */ a{}'
+    """
+    def replace(match):
+        string, comment, punctuation, _ = match.groups()
+
+        if string:
+            return string
+        elif comment:
+            return comment if comment.startswith("/*!") else ""
+        elif punctuation:
+            return punctuation.strip()
+
+        return " "
+
+    return _CSS_TOKENS.sub(replace, source).strip()
+
+def minify_js(source):
+    """Prepares the (already minified) script `source` for concatenation by
+    removing its source map reference.
+
+    >>> minify_js("f();\\n//# sourceMappingURL=f.min.map\\n")
+    'f();'
+    """
+    return _SOURCE_MAP.sub("", source).strip()
+
+MINIFIERS = {".css": (minify_css, "\n"), ".js": (minify_js, ";\n")}
+
+def pin_sources(manifest, cache):
+    """Records the SHA-256 digests of all sources of the dictionary
+    `manifest` (see `build_assets()`) which have none yet. The sources are
+    downloaded through `cache`. It returns the list of the pinned URLs."""
+    pinned = []
+
+    for sources in manifest.values():
+        for source in sources:
+            if "sha256" not in source:
+                source["sha256"] = content_hash(cache.get(source["url"]))
+                pinned.append(source["url"])
+
+    return pinned
+
+def unpinned_sources(manifest):
+    """Returns the list of the URLs of all sources of the dictionary
+    `manifest` (see `build_assets()`) without a SHA-256 digest.
+
+    >>> unpinned_sources({"a.js": [{"url": "a", "sha256": "0"}, {"url": "b"}]})
+    ['b']
+    """
+    return [x["url"] for sources in manifest.values() for x in sources
+            if "sha256" not in x]
+
+def bundle(name, sources, cache, strict=False):
+    """Returns the content of the asset `name` which is the concatenation of
+    all `sources` (list of dictionaries with the keys `url` and optionally
+    `sha256`). Stylesheets and scripts are minified. A `ValueError` is
+    raised for downloads which do not match their digest and with `strict`
+    also for sources without digest."""
+    for source in sources:
+        if strict and "sha256" not in source:
+            raise ValueError(f"Source `{source['url']}` of `{name}` has no "
+                             "pinned sha256 digest (see --pin).")
+
+    contents = [cache.get(x["url"], x.get("sha256")) for x in sources]
+    extension = os.path.splitext(name)[1]
+
+    if extension in MINIFIERS:
+        minify, separator = MINIFIERS[extension]
+
+        return separator.join(minify(x.decode("utf-8"))
+                              for x in contents).encode("utf-8")
+
+    return b"".join(contents)
+
+def fingerprint(name, content):
+    """Returns the file name of the asset `name` with the hash of its content
+    so that browsers can cache it indefinitely.
+
+    >>> fingerprint("styles.css", b"")
+    'styles.e3b0c44298fc.css'
+    """
+    root, extension = os.path.splitext(name)
+
+    return f"{root}.{content_hash(content)[:FINGERPRINT_LENGTH]}{extension}"
+
+def build_assets(manifest, output_dir, cache, strict=False):
+    """Writes all assets of the dictionary `manifest` (mapping asset names onto
+    their sources, see `bundle()`, which also describes `strict`) into
+    `output_dir` under fingerprinted file names. The mapping of the asset
+    names onto the written file names is returned and stored in the file
+    `assets.json` of `output_dir`."""
+    result = dict()
+
+    for name, sources in manifest.items():
+        content = bundle(name, sources, cache, strict)
+        file_name = fingerprint(name, content)
+        path = os.path.join(output_dir, file_name)
+
+        if not os.path.exists(path):
+            with open(path, "wb") as asset_file:
+                asset_file.write(content)
+
+        result[name] = file_name
+
+    with open(os.path.join(output_dir, OUTPUT_MANIFEST), "w",
+              encoding="utf-8") as manifest_file:
+        json.dump(result, manifest_file, indent=2, sort_keys=True)
+
+    return result
+
+def run_script(args):
+    """Main function of the script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("manifest", help="JSON file with the asset sources")
+    parser.add_argument("output_dir", help="directory of the report")
+    parser.add_argument("--cache",
+                        default=os.environ.get(CACHE_VARIABLE, DEFAULT_CACHE),
+                        help="directory of the asset cache")
+    parser.add_argument("--pin", action="store_true",
+                        help="record the sha256 digests of the sources "
+                             "without one in the manifest (trusting their "
+                             "current download)")
+    parser.add_argument("--strict", action="store_true",
+                        help="reject sources without sha256 digest")
+
+    arguments = parser.parse_args(args)
+
+    with open(arguments.manifest, encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    cache = AssetCache(arguments.cache)
+
+    try:
+        if arguments.pin and pin_sources(manifest, cache):
+            with open(arguments.manifest, "w",
+                      encoding="utf-8") as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+                manifest_file.write("\n")
+
+        unpinned = unpinned_sources(manifest)
+
+        if unpinned and not arguments.strict:
+            print("Warning: Sources without pinned sha256 digest (see "
+                  "--pin):\n" + "\n".join(unpinned), file=sys.stderr)
+
+        build_assets(manifest, arguments.output_dir, cache, arguments.strict)
+    except (ValueError, requests.RequestException) as error:
+        sys.exit(f"Error: {error}")
+
+if __name__ == "__main__":
+    run_script(sys.argv[1:])
@@ -1,32 +1,371 @@
 """Script for generating an HTML report of all contacts."""
 
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
 import sys
+import threading
 
 from datetime import datetime
 
-import jinja2
-import pytz
+from serlo.lazy import lazy_import
 
-from serlo.model import SerloDatabase
+http_server = lazy_import("http.server")
+jinja2 = lazy_import("jinja2")
+model = lazy_import("serlo.model")
+profiler = lazy_import("serlo.profiler")
+registry = lazy_import("serlo.registry")
+render_profiler = lazy_import("serlo.render_profiler")
+search = lazy_import("serlo.search")
+server = lazy_import("serlo.server")
+
+DEFAULT_ASSETS = {"favicon.ico": "favicon.ico", "styles.css": "styles.css",
+                  "script.js": "script.js"}
+SQLITE_PREFIX = "sqlite:///"
+TIMEZONE = "Europe/Berlin"
+
+def report_timestamp():
+    """Returns the current time in the time zone of the team. The time zone
+    is looked up with `zoneinfo` and with `pytz` on Python versions before
+    3.9 which lack this module."""
+    try:
+        timezone = lazy_import("zoneinfo").ZoneInfo(TIMEZONE)
+    except ImportError:
+        timezone = lazy_import("pytz").timezone(TIMEZONE)
+
+    return datetime.now(timezone)
+
+def build_view_model(database, tags=None):
+    """Returns the data shown in the report as plain dictionaries and lists.
+    All display names, titles and orderings are computed once here so that
+    the template only iterates over precomputed lists. Lists are ordered
+    case-insensitively like the `sort` filter of Jinja. Persons and units
+    are identified by their stable ids so that links into the report survive
+    new imports. Names are followed by the displayed `tags` (see
+    `Person.tagged_name()`)."""
+    # All persons are loaded first, so that the mentors and persons
+    # responsible are resolved without further queries
+    persons = database.persons_with_relations.all()
+    units = database.working_units_with_participants.all()
+
+    person_refs = dict((p.id, {"id": p.stable_id,
+                               "name": p.tagged_name(tags)})
+                       for p in persons)
+    unit_refs = dict((u.id, {"id": u.stable_id, "title": u.title})
+                     for u in units)
+
+    def sorted_persons(objs):
+        return sorted((person_refs[x.id] for x in objs),
+                      key=lambda x: x["name"].lower())
+
+    def sorted_units(objs):
+        return sorted((unit_refs[x.id] for x in objs),
+                      key=lambda x: x["title"].lower())
+
+    def members(unit):
+        # Deduplicated by id since hashing a person loads all its contacts
+        return dict((x.id, x) for x
+                    in [unit.person_responsible] + unit.participants).values()
+
+    unit_views = sorted(({"id": u.stable_id,
+                          "title": unit_refs[u.id]["title"],
+                          "unit_type": u.unit_type,
+                          "overview_document": u.overview_document,
+                          "storage_url": u.storage_url,
+                          "slack_url": u.slack_url,
+                          "description": u.description,
+                          "person_responsible":
+                              person_refs[u.person_responsible.id],
+                          "members": sorted_persons(members(u))}
+                         for u in units), key=lambda x: x["title"].lower())
+
+    return {
+        "projects": [u for u in unit_views
+                     if u["unit_type"] == model.UnitType.project],
+        "support_units": [u for u in unit_views
+                          if u["unit_type"] == model.UnitType.support_unit],
+        "persons": [{"id": p.stable_id,
+                     "name": person_refs[p.id]["name"],
+                     "work_emails": [x.address for x in p.work_emails],
+                     "work_phone_numbers": [x.number for x
+                                            in p.work_phone_numbers],
+                     "managing_units": sorted_units(p.managing_units),
+                     "participating_units":
+                         sorted_units(p.participating_units),
+                     "mentor": person_refs[p.mentor.id] if p.mentor else None,
+                     "mentees": sorted_persons(p.mentees)}
+                    for p in persons]
+    }
+
+def build_data_feed(report):
+    """Returns the tables of the view model `report` (see
+    `build_view_model()`) in the compact form of the JSON data feed. Each
+    table is a list of rows and each row a list of values. Persons and units
+    are referenced by their ids. Unit rows contain the id, title, overview
+    document, storage URL, Slack URL, the person responsible, the members
+    and the description. Person rows contain the id, name, work emails, work
+    phone numbers, managed units, participated units, the mentor and the
+    mentees."""
+    def ids(refs):
+        return [x["id"] for x in refs]
+
+    def unit_rows(units):
+        return [[u["id"], u["title"], u["overview_document"],
+                 u["storage_url"], u["slack_url"],
+                 u["person_responsible"]["id"], ids(u["members"]),
+                 u["description"]] for u in units]
+
+    return {
+        "projects": unit_rows(report["projects"]),
+        "support_units": unit_rows(report["support_units"]),
+        "persons": [[p["id"], p["name"], p["work_emails"],
+                     p["work_phone_numbers"], ids(p["managing_units"]),
+                     ids(p["participating_units"]),
+                     p["mentor"]["id"] if p["mentor"] else None,
+                     ids(p["mentees"])] for p in report["persons"]]
+    }
+
+def write_data_feed(report, path):
+    """Writes the JSON data feed of `report` into the file `path` and returns
+    the URL under which the report loads it. The file is expected next to
+    the report; its URL contains a hash of the content so that browsers
+    never use an outdated copy."""
+    content = json.dumps(build_data_feed(report), ensure_ascii=False,
+                         separators=(",", ":")).encode("utf-8")
+
+    with open(path, "wb") as data_file:
+        data_file.write(content)
+
+    return "./" + os.path.basename(path) + "?v=" + \
+           hashlib.sha256(content).hexdigest()[:12]
+
+def load_assets(path):
+    """Returns the mapping of the asset names onto their file names. `path`
+    is the optional JSON file written by `build_assets.py`."""
+    if not path:
+        return DEFAULT_ASSETS
+
+    with open(path, encoding="utf-8") as assets_file:
+        return dict(DEFAULT_ASSETS, **json.load(assets_file))
+
+def database_snapshot(database):
+    """Returns a value which changes whenever the SQLite database file of the
+    specification `database` is modified or replaced. For all other databases
+    `None` is returned so that they are never reopened. Their changes are
+    noticed through their revision instead."""
+    path = database[len(SQLITE_PREFIX):]
+
+    if not database.startswith(SQLITE_PREFIX) or path in ("", ":memory:"):
+        return None
+
+    stat = os.stat(path)
+
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def load_template(template):
+    """Returns the compiled template of the file `template`."""
+    env = jinja2.Environment(autoescape=True, loader=jinja2.FileSystemLoader(
+        os.path.dirname(os.path.abspath(template))))
+
+    return env.get_template(os.path.basename(template))
+
+def render_report(database, template, arguments, template_profiler=None):
+    """Returns the report of `database` rendered with the compiled `template`.
+    The data feed and the search index are written and the displayed tags
+    are read from the registry as requested by the command line
+    `arguments`. The macro calls and property accesses are
+    recorded by the optional `template_profiler` (see
+    `serlo.render_profiler.RenderProfiler`)."""
+    if template_profiler is not None:
+        with template_profiler.instrument():
+            return render_report(database, template, arguments)
+
+    timestamp = report_timestamp()
+    tags = registry.Registry.load(arguments.registry).tags \
+           if arguments.registry else None
+
+    report = build_view_model(database, tags)
+    data_url = None
+
+    if arguments.data_file:
+        data_url = write_data_feed(report, arguments.data_file)
+
+    search_url = None
+
+    if arguments.search_index:
+        search.write_search_index(database, arguments.search_index, tags)
+        search_url = "./" + os.path.basename(
+            os.path.normpath(arguments.search_index))
+
+    return template.render(
+        report=report,
+        timestamp=timestamp,
+        assets=load_assets(arguments.assets),
+        data_url=data_url,
+        search_url=search_url
+    )
+
+class ReportCache(object):
+    """Rendered report of the server mode. The database and the compiled
+    template are kept in memory. The report is only rendered again when the
+    revision of the database (see `serlo.model.SerloDatabase.revision`), the
+    database file or the template file changed, so that concurrent requests
+    are served from the last render. The database is only opened again when
+    its SQLite file changed. All renders are recorded by the optional
+    `query_profiler` and `template_profiler`."""
+
+    def __init__(self, arguments, query_profiler=None,
+                 template_profiler=None):
+        self._arguments = arguments
+        self._query_profiler = query_profiler
+        self._template_profiler = template_profiler
+        self._lock = threading.Lock()
+        self._database = None
+        self._database_snapshot = None
+        self._template = None
+        self._page = (None, None)
+
+    def _connect(self):
+        """Returns the database and opens it again when its file changed
+        since it was opened (see `database_snapshot()`)."""
+        snapshot = database_snapshot(self._arguments.database)
+
+        with self._lock:
+            if self._database is None or self._database_snapshot != snapshot:
+                if self._database is not None:
+                    self._database.close()
+
+                self._database = model.SerloDatabase(self._arguments.database,
+                                                     self._query_profiler)
+                self._database_snapshot = snapshot
+
+            return self._database
+
+    def _snapshot(self):
+        """Returns the current snapshot of the database file, the revision of
+        the database and the template."""
+        database = self._connect()
+
+        return (self._database_snapshot, database.revision,
+                os.stat(self._arguments.template).st_mtime_ns)
+
+    def _render(self, snapshot):
+        """Renders the report and reloads the template beforehand when it
+        changed."""
+        old_snapshot = self._page[0] or (None, None, None)
+
+        if self._template is None or old_snapshot[2] != snapshot[2]:
+            self._template = load_template(self._arguments.template)
+
+        content = render_report(self._database, self._template,
+                                self._arguments,
+                                self._template_profiler).encode("utf-8")
+
+        # Release the connection so that the next render may use another thread
+        self._database.commit()
+
+        etag = '"' + hashlib.sha256(content).hexdigest()[:16] + '"'
+
+        return (etag, content, gzip.compress(content))
+
+    def get(self):
+        """Returns the current report as tuple of its ETag, its content and
+        its gzip compressed content."""
+        snapshot = self._snapshot()
+        cached_snapshot, page = self._page
+
+        if page is not None and cached_snapshot == snapshot:
+            return page
+
+        with self._lock:
+            if self._page[0] != snapshot or self._page[1] is None:
+                self._page = (snapshot, self._render(snapshot))
+
+            return self._page[1]
+
+def create_server(arguments, address, query_profiler=None,
+                  template_profiler=None):
+    """Returns the HTTP server of the report listening on `address`. All
+    renders are recorded by the optional `query_profiler` and
+    `template_profiler`."""
+    handler = functools.partial(server.ReportHandler,
+                                cache=ReportCache(arguments, query_profiler,
+                                                  template_profiler),
+                                directory=arguments.root)
+
+    return http_server.ThreadingHTTPServer(address, handler)
+
+def parse_arguments(args):
+    """Parses the command line arguments `args` of this script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("database", help="specification of the database")
+    parser.add_argument("template", help="file name of the template")
+    parser.add_argument("--registry",
+                        help="JSON file with the ids of the Highrise account "
+                             "whose tags are shown")
+    parser.add_argument("--assets",
+                        help="JSON file mapping the asset names onto their "
+                             "fingerprinted file names (see build_assets.py)")
+    parser.add_argument("--data-file",
+                        help="write the tables as JSON file to this path "
+                             "(next to the report) and render only a light "
+                             "page loading it")
+    parser.add_argument("--search-index",
+                        help="write a static search index into this "
+                             "directory (next to the report)")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="serve the report over HTTP and render it "
+                             "again whenever the database or the template "
+                             "changes")
+    parser.add_argument("--root", default=".",
+                        help="directory of the static files served next to "
+                             "the report (default: current directory)")
+    parser.add_argument("--profile-queries", action="store_true",
+                        help="print a summary of all SQL statements to the "
+                             "standard error output at the end")
+    parser.add_argument("--profile-template", action="store_true",
+                        help="print the time spent in the macros of the "
+                             "template and in the properties of the models "
+                             "to the standard error output at the end")
+
+    return parser.parse_args(args)
 
 def run_script(args):
     """Main function of the script."""
-    try:
-        database_file, template = args
-    except ValueError:
-        sys.exit(f"Error: Cannot parse arguments")
+    arguments = parse_arguments(args)
+
+    query_profiler = profiler.QueryProfiler() \
+                     if arguments.profile_queries else None
+    template_profiler = render_profiler.RenderProfiler() \
+                        if arguments.profile_template else None
+
+    if arguments.serve:
+        host, _, port = arguments.serve.rpartition(":")
+        report_server = create_server(arguments,
+                                      (host or "localhost", int(port)),
+                                      query_profiler, template_profiler)
 
-    database = SerloDatabase(database_file)
-    env = jinja2.Environment(autoescape=True,
-                             loader=jinja2.FileSystemLoader("."))
+        print(f"Serving the report on port {report_server.server_port}...",
+              file=sys.stderr)
 
-    template = env.get_template(template)
-    timestamp = datetime.now().astimezone(pytz.timezone('Europe/Berlin'))
+        try:
+            report_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            report_server.server_close()
+    else:
+        print(render_report(model.SerloDatabase(arguments.database,
+                                                query_profiler),
+                            load_template(arguments.template), arguments,
+                            template_profiler))
 
-    print(template.render(
-        serlo=database,
-        timestamp=timestamp
-    ))
+    for used_profiler in (query_profiler, template_profiler):
+        if used_profiler is not None:
+            print(used_profiler.summary(), file=sys.stderr)
 
 if __name__ == "__main__":
     run_script(sys.argv[1:])
@@ -0,0 +1,52 @@
+"""Script for exporting the team into Parquet or Arrow files for downstream
+analytics. One file per table is written into the output directory. The
+export requires the package `pyarrow`."""
+
+import argparse
+import os
+import sys
+
+from serlo.lazy import lazy_import
+
+export = lazy_import("serlo.export")
+model = lazy_import("serlo.model")
+
+# Same as in `serlo.export`, which is only imported for the export
+FORMATS = ["parquet", "arrow"]
+BATCH_SIZE = 10000
+
+def parse_arguments(args):
+    """Parses the command line arguments `args` of this script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("database", help="specification of the database")
+    parser.add_argument("directory", help="output directory of the files")
+    parser.add_argument("--format", choices=FORMATS, default=FORMATS[0],
+                        help="format of the exported files")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="number of rows read and written at once")
+
+    return parser.parse_args(args)
+
+def run_script(args):
+    """Main function of the script."""
+    arguments = parse_arguments(args)
+
+    try:
+        export.arrow_modules()
+    except ImportError as error:
+        sys.exit(f"Error: {error}")
+
+    os.makedirs(arguments.directory, exist_ok=True)
+    database = model.SerloDatabase(arguments.database)
+
+    try:
+        rows = export.export(database, arguments.directory, arguments.format,
+                             arguments.batch_size)
+    finally:
+        database.close()
+
+    for name, count in rows.items():
+        print(f"{name}: {count} rows")
+
+if __name__ == "__main__":
+    run_script(sys.argv[1:])
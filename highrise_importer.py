@@ -1,23 +1,43 @@
 """Imports contact informations from Highrise into a local database."""
 
+import argparse
+import collections
+import functools
+import hashlib
+import json
 import os
+import queue
 import sys
+import threading
+import time
 import xml.etree.ElementTree as ET
 
-import requests
+from serlo.lazy import lazy_import
+from serlo.registry import Registry, DEFAULT_REGISTRY_FILE, default_registry
+from serlo.validation import Quarantine, Rejection, ValidationError, \
+                             deal_problems, person_problems, reject, screen
 
-from serlo.model import SerloDatabase, Email, PhoneNumber, Person, UnitType, \
-                        WorkingUnit, Tag
+asyncio = lazy_import("asyncio")
+futures = lazy_import("concurrent.futures")
+requests = lazy_import("requests")
+diff = lazy_import("serlo.diff")
+model = lazy_import("serlo.model")
+profiler = lazy_import("serlo.profiler")
+snapshots = lazy_import("serlo.snapshots")
 
 TOKEN_VARIABLE = "HIGHRISE_API_TOKEN"
+CACHE_VARIABLE = "HIGHRISE_CACHE"
+BASE_URL = "https://de-serlo.highrisehq.com"
 
-PROJECT_ID = "6436430"
-SUPPORT_UNIT_ID = "4849968"
-MENTORING_DEAL_ID = "6438903"
-MEMBER_ID = "5360080"
-SUBJECT_DATA_OVERVIEW = "1224165"
-SUBJECT_DATA_STORAGE = "1258882"
-SUBJECT_DATA_SLACK = "1311275"
+PAGE_SIZE = 500
+QUEUE_SIZE = 4
+
+# Responses of the Highrise API after which a request is sent again, the
+# number of retries and the delay of the first retry in seconds (doubled for
+# every further retry unless the response has a `Retry-After` header)
+RETRY_STATUS_CODES = (429, 503)
+MAX_RETRIES = 5
+RETRY_DELAY = 1.0
 
 def xml_text(xml):
     """Returns the inner text of the XML element `xml`. In case it doesn't
@@ -29,152 +49,589 @@ def xml_text(xml):
 
 def xml_find(tag_name, xml):
     """Returns the child with tag `tag_name` of the XML element `xml`. It
-    throws an `AssertationError` when no or more than one children of the tag
+    throws a `ValidationError` when no or more than one children of the tag
     `tag_name` are defined."""
     if xml is None:
         raise TypeError("xml_text(): XML argument must not be 'None'")
 
     results = xml.findall(tag_name)
 
-    assert results, f"Child with tag `{tag_name}` not found."
-    assert len(results) < 2, f"Too many children with tag `{tag_name}` found."
+    if not results:
+        raise ValidationError(f"Child with tag `{tag_name}` not found.")
+
+    if len(results) > 1:
+        raise ValidationError(
+            f"Too many children with tag `{tag_name}` found.")
 
     return results[0]
 
-def parse_subject_datas(xml):
+def parse_subject_datas(xml, field_ids=None):
     """Returns a dircectory of all subject data in `xml`. Subject data are
     values stored in custom fields in Highrise. This functions returns
     a directoy with all custom field values as strings. The keys are
-    links."""
+    links. When the collection `field_ids` is given, only the values of
+    these custom fields are decoded and all other subject data are
+    skipped."""
     subject_datas = xml.find("subject_datas")
+    result = dict()
 
     if subject_datas:
-        return dict((xml_text(xml_find("subject_field_id", child)),
-                     xml_text(xml_find("value", child))) for child
-                    in subject_datas.findall("subject_data"))
+        for child in subject_datas.iterfind("subject_data"):
+            field_id = xml_text(xml_find("subject_field_id", child))
+
+            if field_ids is None or field_id in field_ids:
+                result[field_id] = xml_text(xml_find("value", child))
 
-    return dict()
+                if field_ids is not None and len(result) == len(field_ids):
+                    break
+
+    return result
 
 def parse_email(xml):
     """Parse emails defined by XML specification `xml`."""
-    return Email(address=xml_text(xml_find("address", xml)),
-                 location=xml_text(xml_find("location", xml)))
+    return model.Email(address=xml_text(xml_find("address", xml)),
+                       location=xml_text(xml_find("location", xml)))
 
 def parse_phone_number(xml):
     """Parse phone number defined by XML specification `xml`."""
-    return PhoneNumber(number=xml_text(xml_find("number", xml)),
-                       location=xml_text(xml_find("location", xml)))
+    return model.PhoneNumber(number=xml_text(xml_find("number", xml)),
+                             location=xml_text(xml_find("location", xml)))
 
 def parse_tag(xml):
     """Parse tag defined by XML specification `xml`."""
-    return Tag(tag_id=int(xml_text(xml_find("id", xml))))
+    return model.Tag(tag_id=int(xml_text(xml_find("id", xml))))
 
 def parse_person(xml):
     """Parse person defined by XML specification `xml`."""
     contact_data = xml_find("contact-data", xml)
 
-    return (xml_text(xml_find("id", xml)),
-            Person(first_name=xml_text(xml_find("first-name", xml)),
-                   last_name=xml_text(xml_find("last-name", xml)),
-                   emails=[parse_email(e) for e in
-                           xml_find("email-addresses", contact_data)],
-                   phone_numbers=[parse_phone_number(e) for e in
-                                  xml_find("phone-numbers", contact_data)],
-                   tags=[parse_tag(e) for e in xml_find("tags", xml)]))
-
-def parse_people(xml):
-    """Parse people defined by XML specification `xml`."""
-    return [parse_person(e) for e in xml.findall("person", xml)]
-
-def parse_working_unit(xml, persons):
-    """Parse a working unit defined by XML specification `xml`."""
-    category_id = xml_text(xml_find("category-id", xml))
-
-    if category_id == PROJECT_ID:
-        unit_type = UnitType.project
-    elif category_id == SUPPORT_UNIT_ID:
-        unit_type = UnitType.support_unit
-    else:
+    highrise_id = xml_text(xml_find("id", xml))
+
+    return (highrise_id,
+            model.Person(highrise_id=highrise_id,
+                         first_name=xml_text(xml_find("first-name", xml)),
+                         last_name=xml_text(xml_find("last-name", xml)),
+                         emails=[parse_email(e) for e in
+                                 xml_find("email-addresses", contact_data)],
+                         phone_numbers=[parse_phone_number(e) for e in
+                                        xml_find("phone-numbers",
+                                                 contact_data)],
+                         tags=[parse_tag(e) for e in xml_find("tags", xml)]))
+
+def parse_people(xml, quarantine=None):
+    """Parse people defined by XML specification `xml`. Malformed persons are
+    put into `quarantine` (see `serlo.validation.screen()`)."""
+    return screen(xml.findall("person"), parse_person, person_problems,
+                  "people", quarantine)
+
+def parse_working_unit_spec(xml, registry=None):
+    """Parse the specification of a working unit defined by XML specification
+    `xml` without resolving the referenced persons. It returns a tuple of the
+    keyword arguments of the `WorkingUnit`, the id of the person responsible
+    and the list of participant ids. `None` is returned when the deal is no
+    active working unit. Unit types and the custom fields to read are looked
+    up in `registry` (by default `default_registry()`). Category and status
+    are checked first so that the remaining elements of other deals are never
+    decoded."""
+    registry = registry or default_registry()
+    unit_type = registry.unit_types.get(xml_text(xml_find("category-id", xml)))
+
+    if unit_type is None:
         return None
 
     if xml_text(xml_find("status", xml)) != "pending":
         return None
 
-    subject_datas = parse_subject_datas(xml)
+    subject_fields = registry.subject_fields
+    subject_datas = parse_subject_datas(xml, subject_fields)
+
+    # Custom fields never overwrite the attributes of the deal itself
+    attributes = dict((attribute, subject_datas.get(field_id, ""))
+                      for field_id, attribute in subject_fields.items())
+    attributes.update(highrise_id=xml_text(xml_find("id", xml)),
+                      name=xml_text(xml_find("name", xml)),
+                      description=xml_text(xml_find("background", xml)),
+                      unit_type=unit_type)
+
+    participant_ids = [xml_text(xml_find("id", x)) for x
+                       in xml_find("parties", xml)]
+
+    return (attributes, xml_text(xml_find("party-id", xml)), participant_ids)
 
-    overview_document = subject_datas.get(SUBJECT_DATA_OVERVIEW, "")
-    storage_url = subject_datas.get(SUBJECT_DATA_STORAGE, "")
-    slack_url = subject_datas.get(SUBJECT_DATA_SLACK, "")
+def link_working_unit(spec, persons):
+    """Creates the working unit specified by `spec` (as returned by
+    `parse_working_unit_spec()`). Person ids are resolved with the dictionary
+    `persons`. `None` is returned when `spec` is `None` or when the person
+    responsible is unknown."""
+    if spec is None:
+        return None
+
+    attributes, person_responsible_id, participant_ids = spec
 
     try:
-        person_responsible = persons[xml_text(xml_find("party-id", xml))]
+        person_responsible = persons[person_responsible_id]
     except KeyError:
         # TODO: write unittests for this exception
         return None
 
-    participant_ids = [xml_text(xml_find("id", x)) for x
-                       in xml_find("parties", xml)]
+    return model.WorkingUnit(person_responsible=person_responsible,
+                             participants=[persons[x] for x
+                                           in participant_ids
+                                           if x in persons],
+                             **attributes)
+
+def parse_working_unit(xml, persons, registry=None):
+    """Parse a working unit defined by XML specification `xml`."""
+    return link_working_unit(parse_working_unit_spec(xml, registry), persons)
 
-    return WorkingUnit(name=xml_text(xml_find("name", xml)),
-                       description=xml_text(xml_find("background", xml)),
-                       overview_document=overview_document,
-                       storage_url=storage_url,
-                       slack_url=slack_url,
-                       unit_type=unit_type,
-                       person_responsible=person_responsible,
-                       participants=[persons[x] for x in participant_ids
-                                     if x in persons])
-
-def parse_working_units(xml, persons):
+def parse_working_units(xml, persons, registry=None):
     """Parse working units from a XML specification."""
-    results = [parse_working_unit(x, persons) for x in xml]
+    results = [parse_working_unit(x, persons, registry) for x in xml]
 
     return [x for x in results if x is not None]
 
-def parse_mentoring(xml):
+def parse_mentoring_deal(xml):
+    """Returns the mentoring relationship of the deal `xml` as tuple of the
+    mentor's person id and the list of person ids of all mentees."""
+    return (xml_text(xml_find("party-id", xml)),
+            [xml_text(xml_find("id", party)) for
+             party in xml_find("parties", xml)])
+
+def parse_mentoring(xml, registry=None):
     """Returns a dictionary specifing all mentoring relationships. The key is
     the person id of mentor and the value is a list of all person ids which
     are the mentees."""
-    result = []
+    registry = registry or default_registry()
+
+    return dict(parse_mentoring_deal(deal) for deal in xml
+                if xml_text(xml_find("category-id", deal))
+                in registry.mentoring_categories)
 
-    for deal in xml:
-        if xml_text(xml_find("category-id", deal)) == MENTORING_DEAL_ID:
-            result.append((xml_text(xml_find("party-id", deal)),
-                           [xml_text(xml_find("id", party)) for
-                            party in xml_find("parties", deal)]))
+def parse_deal(xml, registry):
+    """Parses the deal `xml`. It returns a tuple of its kind (`"mentoring"`
+    or `"unit"`) and the result of `parse_mentoring_deal()` respectively
+    `parse_working_unit_spec()`. `None` is returned for deals of other
+    categories and for inactive working units."""
+    category_id = xml_text(xml_find("category-id", xml))
 
-    return dict(result)
+    if category_id in registry.mentoring_categories:
+        return ("mentoring", parse_mentoring_deal(xml))
 
-def api_call(endpoint, api_token, params=None):
-    """Executes an API call to Highrise."""
+    if category_id in registry.unit_types:
+        spec = parse_working_unit_spec(xml, registry)
+
+        return None if spec is None else ("unit", spec)
+
+    return None
+
+def parse_deals(xml, registry=None, quarantine=None):
+    """Parse a page of deals defined by XML specification `xml`. It returns
+    the specifications of all active working units (see
+    `parse_working_unit_spec()`) and the mentoring relationships of the page
+    (see `parse_mentoring()`). Deals of other categories are skipped.
+    Malformed deals are put into `quarantine` (see
+    `serlo.validation.screen()`)."""
+    registry = registry or default_registry()
+    specs = []
+    mentoring = dict()
+
+    for result in screen(xml, functools.partial(parse_deal,
+                                                registry=registry),
+                         functools.partial(deal_problems, registry=registry),
+                         "deals", quarantine):
+        if result is None:
+            continue
+
+        kind, value = result
+
+        if kind == "mentoring":
+            mentoring[value[0]] = value[1]
+        else:
+            specs.append(value)
+
+    return (specs, mentoring)
+
+def endpoint_params(registry=None):
+    """Returns the query parameters of the imported API endpoints."""
+    registry = registry or default_registry()
+
+    return {"people": {"tag_id": registry.member_tag}, "deals": {}}
+
+def retry_delay(response, retry):
+    """Returns the seconds to wait before the retry number `retry` (counted
+    from 0) of the request answered by `response`. A `Retry-After` header
+    in seconds is honoured, otherwise the delay grows exponentially.
+
+    >>> Response = collections.namedtuple("Response", ["headers"])
+    >>> retry_delay(Response({"Retry-After": "7"}), 0)
+    7.0
+    >>> retry_delay(Response({}), 2)
+    4.0
+    """
+    try:
+        return max(float(response.headers.get("Retry-After")), 0.0)
+    except (TypeError, ValueError):
+        return RETRY_DELAY * 2 ** retry
+
+def api_request(endpoint, api_token, params=None, base_url=BASE_URL,
+                session=None):
+    """Executes an API call to Highrise and returns the XML response as
+    string. The request is sent with the `requests.Session` `session` when
+    given so that its connection pool is reused. Requests which are
+    throttled or temporarily unavailable (see `RETRY_STATUS_CODES`) are sent
+    again up to `MAX_RETRIES` times (see `retry_delay()`); for all other
+    error responses, like for the last retry, a `requests.HTTPError` is
+    raised, so that an error document is never taken for a page."""
     if params is None:
         params = {}
 
-    url = f"https://de-serlo.highrisehq.com/{endpoint}.xml"
-    req = requests.get(url, auth=(api_token, "_"), params=params)
+    url = f"{base_url}/{endpoint}.xml"
 
-    return ET.fromstring(req.text)
+    for retry in range(MAX_RETRIES + 1):
+        req = (session or requests).get(url, auth=(api_token, "_"),
+                                        params=params)
 
-def run_script():
-    """Executes this script."""
-    try:
-        database_file = sys.argv[1]
-    except IndexError:
-        sys.exit("Error: No database file specified as first argument.")
+        if req.status_code not in RETRY_STATUS_CODES or retry == MAX_RETRIES:
+            break
 
-    try:
-        api_token = os.environ[TOKEN_VARIABLE]
-    except KeyError:
-        sys.exit(f"Error: Environment Variable {TOKEN_VARIABLE} not defined.")
+        time.sleep(retry_delay(req, retry))
+
+    req.raise_for_status()
 
-    database = SerloDatabase(database_file)
+    return req.text
 
-    persons = dict(parse_people(api_call("people", api_token,
-                                         params={"tag_id": MEMBER_ID})))
+def api_call(endpoint, api_token, params=None):
+    """Executes an API call to Highrise."""
+    return ET.fromstring(api_request(endpoint, api_token, params))
+
+def hash_page(source):
+    """Returns the content hash of the XML source `source` of a page."""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+def download_page(fetch_page, endpoint, params, offset):
+    """Downloads the page of `endpoint` starting at `offset` with the function
+    `fetch_page` and the query parameters `params` and decodes its XML
+    source. It returns the page together with its (not yet stored)
+    checkpoint."""
+    source = fetch_page(endpoint, dict(params, n=offset))
+    page = ET.fromstring(source)
+
+    return (page, model.ImportCheckpoint(endpoint=endpoint, offset=offset,
+                                         records=len(page),
+                                         content_hash=hash_page(source)))
+
+def resume_offsets(database, fetch_page, page_size=PAGE_SIZE,
+                   registry=None, verify_all=False):
+    """Returns the offsets at which an interrupted import into `database`
+    continues as a dictionary from endpoints to offsets. Completely imported
+    endpoints are mapped to `None` and endpoints without checkpoints to 0;
+    without any checkpoint an empty dictionary is returned. The last
+    checkpoint of every endpoint (with `verify_all` every checkpoint) is
+    verified by downloading its page again, which also detects records
+    inserted or removed before it. When the content of a verified page has
+    changed since, the import can't be continued and `None` is
+    returned."""
+    checkpoints = collections.defaultdict(list)
+    params = endpoint_params(registry)
+    offsets = dict()
+
+    for checkpoint in database.checkpoints.order_by(
+            model.ImportCheckpoint.offset):
+        checkpoints[checkpoint.endpoint].append(checkpoint)
 
-    deals = api_call("deals", api_token)
+    for endpoint, endpoint_checkpoints in checkpoints.items():
+        verified = endpoint_checkpoints if verify_all \
+                   else endpoint_checkpoints[-1:]
+
+        for checkpoint in verified:
+            source = fetch_page(endpoint, dict(params[endpoint],
+                                               n=checkpoint.offset))
+
+            if hash_page(source) != checkpoint.content_hash:
+                return None
+
+        checkpoint = endpoint_checkpoints[-1]
+
+        if checkpoint.records < page_size:
+            offsets[endpoint] = None
+        else:
+            offsets[endpoint] = checkpoint.offset + checkpoint.records
+
+    if offsets:
+        for endpoint in params:
+            offsets.setdefault(endpoint, 0)
+
+    return offsets
+
+async def fetch_pages(fetch_page, endpoint, params, pages,
+                      page_size=PAGE_SIZE, offset=0):
+    """Downloads all pages of `endpoint` beginning at `offset` with the
+    function `fetch_page` and the query parameters `params` and puts them
+    with their checkpoints into the queue `pages`. `None` is put into the
+    queue after the last page. Highrise returns at most `page_size` records
+    per page and the next page is selected with the offset parameter `n`.
+    For `offset=None` nothing is downloaded."""
+    loop = asyncio.get_running_loop()
+
+    while offset is not None:
+        page, checkpoint = await loop.run_in_executor(
+            None, download_page, fetch_page, endpoint, params, offset)
+
+        await pages.put((page, checkpoint))
+
+        if len(page) < page_size:
+            break
+
+        offset += len(page)
+
+    await pages.put(None)
+
+async def parse_pages(parse, pages, parsed):
+    """Parses the pages of the queue `pages` with the function `parse` and
+    puts the results with their checkpoints into the queue `parsed` until
+    `None` is received."""
+    while True:
+        item = await pages.get()
+
+        if item is None:
+            break
+
+        page, checkpoint = item
+
+        await parsed.put((parse(page), checkpoint))
+
+    await parsed.put(None)
+
+async def put_batch(batches, batch, errors):
+    """Puts `batch` into the (thread-safe) queue `batches` of the database
+    writer. The first error of the writer in the list `errors` is raised,
+    so that the pipeline stops instead of downloading the remaining
+    pages."""
+    await asyncio.get_running_loop().run_in_executor(None, batches.put, batch)
+
+    if errors:
+        raise errors[0]
+
+async def link_pages(people, deals, batches, person_ids, errors):
+    """Resolves the references of the parsed deals in the queue `deals` to
+    the persons in the queue `people` and to the already stored persons with
+    the ids `person_ids`. The resulting batches are put into the queue
+    `batches` of the database writer (see `put_batch()`). Deals are linked
+    only after all persons have been received."""
+    person_ids = set(person_ids)
+
+    while True:
+        item = await people.get()
+
+        if item is None:
+            break
+
+        persons, checkpoint = item
+
+        person_ids.update(person_id for person_id, _ in persons)
+
+        await put_batch(batches, ("persons", persons, checkpoint), errors)
+
+    while True:
+        item = await deals.get()
+
+        if item is None:
+            break
+
+        (specs, mentoring_spec), checkpoint = item
+        mentoring = [(mentor_id, mentee_id) for mentor_id, mentee_ids
+                     in mentoring_spec.items() for mentee_id in mentee_ids
+                     if mentor_id in person_ids and mentee_id in person_ids]
+        specs = [(attributes, person_responsible_id,
+                  [x for x in participant_ids if x in person_ids])
+                 for attributes, person_responsible_id, participant_ids
+                 in specs if person_responsible_id in person_ids]
+
+        await put_batch(batches, ("deals", (specs, mentoring), checkpoint),
+                        errors)
+
+def write_batches(database, batches, errors):
+    """Writes the batches of the queue `batches` into `database` until `None`
+    is received. Each batch is committed together with the checkpoint of its
+    page. The persons referenced by deals are looked up by their Highrise
+    ids and all entities are removed from the session after each batch, so
+    that the memory of the writer stays bounded. This function is run by the
+    database writer thread and is the only one accessing `database` and the
+    stored entities during the import. Exceptions are appended to the list
+    `errors`; afterwards the queue is still drained so that the producers
+    never block."""
+    while True:
+        batch = batches.get()
+
+        if batch is None:
+            break
+
+        if errors:
+            continue
+
+        kind, payload, checkpoint = batch
+
+        try:
+            if kind == "persons":
+                entities = [person for _, person in payload]
+            else:
+                specs, mentoring = payload
+                persons = database.persons_by_highrise_ids(
+                    set(x for pair in mentoring for x in pair) |
+                    set(x for _, person_responsible_id, participant_ids
+                        in specs for x
+                        in [person_responsible_id] + participant_ids))
+
+                for mentor_id, mentee_id in mentoring:
+                    persons[mentee_id].mentor = persons[mentor_id]
+
+                entities = [link_working_unit(x, persons) for x in specs]
+
+            database.add_all(entities + [checkpoint])
+            database.expunge_all()
+        except Exception as error: # pylint: disable=broad-except
+            errors.append(error)
+
+async def import_pages(fetch_page, batches, errors, offsets, person_ids,
+                       queue_size=QUEUE_SIZE, page_size=PAGE_SIZE,
+                       registry=None, quarantine=None):
+    """Runs the stages fetching, parsing and linking of the import pipeline
+    concurrently. The stages are connected by queues of size `queue_size`
+    so that at most this many pages are hold in memory per stage. The
+    dictionary `offsets` specifies the offsets at which the endpoints are
+    downloaded (see `resume_offsets()`). Malformed records are put into
+    `quarantine`. When a stage fails or the database writer reports an
+    error in `errors`, all other stages are cancelled."""
+    people_pages, deal_pages, people, deals = \
+            [asyncio.Queue(queue_size) for _ in range(4)]
+    params = endpoint_params(registry)
+
+    stages = [asyncio.ensure_future(x) for x in [
+        fetch_pages(fetch_page, "people", params["people"], people_pages,
+                    page_size, offsets.get("people", 0)),
+        fetch_pages(fetch_page, "deals", params["deals"], deal_pages,
+                    page_size, offsets.get("deals", 0)),
+        parse_pages(functools.partial(parse_people, quarantine=quarantine),
+                    people_pages, people),
+        parse_pages(functools.partial(parse_deals, registry=registry,
+                                      quarantine=quarantine),
+                    deal_pages, deals),
+        link_pages(people, deals, batches, person_ids, errors)]]
+
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        for stage in stages:
+            stage.cancel()
+
+def download_source(fetch_page, endpoint, params, page_size=PAGE_SIZE):
+    """Downloads all pages of `endpoint` (see `fetch_pages()`) and returns the
+    XML source of one document with all their records together with the
+    list of the checkpoints of the pages."""
+    document = None
+    checkpoints = []
+    offset = 0
+
+    while True:
+        page, checkpoint = download_page(fetch_page, endpoint, params, offset)
+        checkpoints.append(checkpoint)
+
+        if document is None:
+            document = page
+        else:
+            document.extend(page)
+
+        if len(page) < page_size:
+            break
+
+        offset += len(page)
+
+    return (ET.tostring(document, encoding="unicode"), checkpoints)
+
+def sync_pages(database, fetch_page, page_size=PAGE_SIZE, registry=None,
+               quarantine=None):
+    """Synchronizes `database` with all pages of the Highrise API returned
+    by `fetch_page` (see `sync()`) and replaces the stored checkpoints with
+    the ones of the downloaded pages. The change log is returned. Unlike the
+    import pipeline, the pages of each endpoint are combined into one
+    document before diffing (see `download_source()`), so the memory grows
+    with the size of the account like for `--sync`."""
+    params = endpoint_params(registry)
+    people, people_checkpoints = download_source(
+        fetch_page, "people", params["people"], page_size)
+    deals, deal_checkpoints = download_source(
+        fetch_page, "deals", params["deals"], page_size)
+
+    change_log = sync(database, people, deals, registry,
+                      quarantine=quarantine)
+
+    database.sync(people_checkpoints + deal_checkpoints,
+                  list(database.checkpoints))
+
+    return change_log
+
+def run_pipeline(database, fetch_page, queue_size=QUEUE_SIZE,
+                 page_size=PAGE_SIZE, resume=False, registry=None,
+                 quarantine=None, verify_all=False):
+    """Imports all persons and working units into `database` with the
+    asynchronous import pipeline. The function `fetch_page(endpoint, params)`
+    shall return the XML source of an API response. Downloading, parsing and
+    writing overlap; the entities are written page by page in a dedicated
+    thread and every written page is recorded as a checkpoint. With
+    `resume=True` an interrupted import continues after the last checkpoint
+    and reuses the already stored persons (see `resume_offsets()`, which
+    also describes `verify_all`). A database which already holds entities
+    and can't be continued (because it is not resumed, because its import
+    is complete or because imported pages have changed since) is
+    synchronized with the diff engine instead (see `sync_pages()`). The ids
+    of the Highrise account are looked up in `registry`. Malformed records
+    are put into `quarantine` and the import goes on; without a quarantine
+    the first page with malformed records aborts the import with a
+    `ValidationError` listing all of them."""
+    offsets = resume_offsets(database, fetch_page, page_size, registry,
+                             verify_all) if resume else dict()
+    continued = offsets and any(x is not None for x in offsets.values())
+
+    if not continued and (database.max_id(model.Person) or
+                          database.max_id(model.WorkingUnit)):
+        sync_pages(database, fetch_page, page_size, registry, quarantine)
+        return
+
+    if not continued:
+        # Checkpoints of another import are stale
+        database.sync([], list(database.checkpoints))
+        offsets = dict()
+
+    person_ids = database.person_ids() if offsets else dict()
+
+    # The writer thread needs its own connection to the database
+    database.commit()
+
+    batches = queue.Queue(queue_size)
+    errors = []
+    writer = threading.Thread(target=write_batches,
+                              args=(database, batches, errors))
+
+    writer.start()
 
-    mentoring_spec = parse_mentoring(deals)
+    try:
+        asyncio.run(import_pages(fetch_page, batches, errors, offsets,
+                                 set(person_ids), queue_size, page_size,
+                                 registry, quarantine))
+    finally:
+        batches.put(None)
+        writer.join()
+
+    if errors:
+        raise errors[0]
+
+def parse_all(people, deals, registry=None, quarantine=None):
+    """Parses the XML specifications of all `people` and `deals` and links
+    them. It returns a dictionary of all persons by their Highrise ids and
+    the list of all working units. Malformed records are put into
+    `quarantine` (see `serlo.validation.screen()`)."""
+    persons = dict(parse_people(people, quarantine))
+    specs, mentoring_spec = parse_deals(deals, registry, quarantine)
 
     for mentor_id, mentee_ids in mentoring_spec.items():
         for mentee_id in mentee_ids:
@@ -184,10 +641,324 @@ def run_script():
             if mentor and mentee:
                 mentee.mentor = mentor
 
-    units = parse_working_units(deals, persons)
+    units = [link_working_unit(x, persons) for x in specs]
+
+    return (persons, [x for x in units if x is not None])
+
+def download_all(api_token, registry=None):
+    """Downloads the XML sources of all people and deals."""
+    params = endpoint_params(registry)
+
+    return (api_request("people", api_token, params=params["people"]),
+            api_request("deals", api_token, params=params["deals"]))
+
+def parse_snapshots(people, deals, registry=None, quarantine=None):
+    """Parses the XML specifications of all `people` and `deals`. It returns
+    the snapshots of all persons and working units as dictionaries from
+    their Highrise ids onto the snapshots (see `serlo.diff`). Malformed
+    records are put into `quarantine`."""
+    persons, units = parse_all(people, deals, registry, quarantine)
+
+    return (dict((key, diff.person_snapshot(x)) for key, x in persons.items()),
+            dict((x.highrise_id, diff.unit_snapshot(x)) for x in units))
+
+def snapshot_key(people, deals, registry):
+    """Returns the key of the parsed XML sources `people` and `deals` in the
+    snapshot cache. It depends on the sources and on the ids of `registry`
+    which influence the parsing."""
+    digest = hashlib.sha256(registry.fingerprint.encode("utf-8"))
+
+    for source in (people, deals):
+        source = source.encode("utf-8")
+        digest.update(len(source).to_bytes(8, "little") + source)
+
+    return digest.hexdigest()
+
+def load_snapshots(people, deals, registry=None, cache=None,
+                   quarantine=None):
+    """Returns the snapshots of the XML sources `people` and `deals` (see
+    `parse_snapshots()`). With the `SnapshotCache` `cache` the snapshots of
+    an already parsed payload are loaded without parsing it. Malformed
+    records are put into `quarantine`; without a quarantine a
+    `ValidationError` listing all of them is raised. The records rejected
+    while parsing a payload are cached with its snapshots, so that they are
+    reported again whenever the payload is loaded from the cache."""
+    registry = registry or default_registry()
+    key = snapshot_key(people, deals, registry) if cache else None
+    cached = cache.get(key) if cache else None
+
+    if cached is None:
+        rejected = Quarantine()
+        persons, units = parse_snapshots(ET.fromstring(people),
+                                         ET.fromstring(deals), registry,
+                                         rejected)
+        rejections = rejected.rejections
+
+        if cache:
+            cache.put(key, persons, units, rejections)
+    else:
+        persons, units, rejections = cached
+        rejections = [Rejection(*x) for x in rejections]
+
+    reject(rejections, quarantine)
+
+    return (persons, units)
+
+def sync(database, people, deals, registry=None, cache=None,
+         chunk_size=None, quarantine=None):
+    """Synchronizes `database` with the XML sources of all `people` and
+    `deals`. Persons and working units are matched by their Highrise ids
+    and only the changed ones are written (see `serlo.diff`). Parsed
+    payloads are cached in `cache` (see `load_snapshots()`). With
+    `chunk_size` the changes are committed in chunks of this size so that
+    the memory of the database session stays bounded. Malformed records are
+    put into `quarantine`; the stored entities of these records are kept
+    unchanged. The change log is returned."""
+    start = len(quarantine) if quarantine is not None else 0
+    persons, units = load_snapshots(people, deals, registry, cache,
+                                    quarantine)
+    rejections = quarantine.rejections[start:] \
+                 if quarantine is not None else []
+    changes = diff.diff_database(database, persons, units, rejections)
+
+    diff.apply_changes(database, changes, chunk_size)
+
+    return diff.format_change_log(changes, persons)
+
+def import_all(database, api_token, registry=None, cache=None,
+               chunk_size=None, quarantine=None):
+    """Imports all persons and working units into `database` by downloading
+    and parsing all data before writing it. Already stored entities are
+    updated (see `sync()`)."""
+    sync(database, *download_all(api_token, registry), registry=registry,
+         cache=cache, chunk_size=chunk_size, quarantine=quarantine)
+
+Account = collections.namedtuple( # pylint: disable=invalid-name
+    "Account", ["name", "base_url", "api_token", "database", "registry",
+                "rate_limit"])
+
+class RateLimiter(object):
+    """Limits the rate of API requests of one account to `rate` requests per
+    second. A rate of `None` disables the limit. The limiter can be shared
+    between threads."""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, rate=None):
+        self._interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        """Blocks until the next request is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self._interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+def load_accounts(path):
+    """Loads the accounts of the multi-account import from the JSON file
+    under `path`. It contains a list `accounts` of objects with the keys
+    `name` and `database` and optionally `base_url`, `token_variable` (the
+    environment variable of the API token), `registry` (the file name of the
+    registry) and `rate_limit` (maximal requests per second)."""
+    with open(path, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+
+    accounts = []
+
+    for spec in config["accounts"]:
+        token_variable = spec.get("token_variable", TOKEN_VARIABLE)
+
+        try:
+            api_token = os.environ[token_variable]
+        except KeyError:
+            raise ValueError(f"Environment Variable {token_variable} not "
+                             f"defined for account `{spec['name']}`.")
+
+        accounts.append(Account(
+            name=spec["name"], base_url=spec.get("base_url", BASE_URL),
+            api_token=api_token, database=spec["database"],
+            registry=Registry.load(spec.get("registry",
+                                            DEFAULT_REGISTRY_FILE)),
+            rate_limit=spec.get("rate_limit")))
+
+    return accounts
+
+def import_account(account, session, resume=False, query_profiler=None):
+    """Imports the account `account` into its own database with the import
+    pipeline. The API requests are sent with the shared `session` and limited
+    to the rate limit of the account. The statements are recorded by the
+    optional `query_profiler`. It returns a tuple of the account name, the
+    duration in seconds, the number of imported persons and working units and
+    the error message (`None` on success)."""
+    start = time.monotonic()
+    limiter = RateLimiter(account.rate_limit)
+
+    def fetch_page(endpoint, params):
+        limiter.wait()
+
+        return api_request(endpoint, account.api_token, params,
+                           account.base_url, session)
+
+    try:
+        database = model.SerloDatabase(account.database, query_profiler)
+
+        run_pipeline(database, fetch_page, resume=resume,
+                     registry=account.registry)
+
+        return (account.name, time.monotonic() - start,
+                database.persons.count(), database.working_units.count(),
+                None)
+    except Exception as error: # pylint: disable=broad-except
+        return (account.name, time.monotonic() - start, 0, 0,
+                f"{error.__class__.__name__}: {error}")
+
+def import_accounts(accounts, session=None, resume=False,
+                    query_profiler=None):
+    """Imports all accounts of the list `accounts` concurrently and returns
+    their import status (see `import_account()`). All accounts share the
+    connection pool of `session` and the optional `query_profiler`."""
+    if session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=max(len(accounts), 1) * QUEUE_SIZE)
+
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    with futures.ThreadPoolExecutor(max(len(accounts), 1)) as pool:
+        return list(pool.map(lambda x: import_account(x, session, resume,
+                                                      query_profiler),
+                             accounts))
+
+def format_status(results):
+    """Returns the combined status report of the multi-account import
+    `results` (see `import_accounts()`) as a text table."""
+    lines = ["{:<20} {:>8} {:>8} {:>9}  {}".format(
+        "Account", "Persons", "Units", "Seconds", "Status")]
+
+    for name, duration, persons, units, error in results:
+        lines.append("{:<20} {:>8} {:>8} {:>9.2f}  {}".format(
+            name, persons, units, duration, error or "OK"))
+
+    return "\n".join(lines)
+
+def parse_arguments(args):
+    """Parses the command line arguments `args` of this script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("database", nargs="?",
+                        help="specification of the database")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="download, parse and write the data "
+                             "concurrently page by page (a database which "
+                             "already holds an import is synchronized)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted import of --pipeline "
+                             "after its last imported page")
+    parser.add_argument("--verify-all", action="store_true",
+                        help="with --resume download every imported page "
+                             "again to verify it instead of only the last "
+                             "one of each endpoint")
+    parser.add_argument("--sync", action="store_true",
+                        help="update an existing database with the changes "
+                             "since the last import and print a change log")
+    parser.add_argument("--cache", default=os.environ.get(CACHE_VARIABLE),
+                        help="directory of the cache of parsed data which is "
+                             "used by the full import and by --sync")
+    parser.add_argument("--chunk-size", type=int,
+                        help="commit the full import and --sync in chunks "
+                             "of this many entities to bound the memory")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_FILE,
+                        help="JSON file with the ids of the Highrise account")
+    parser.add_argument("--accounts",
+                        help="JSON file with several accounts which are "
+                             "imported concurrently into their own database")
+    parser.add_argument("--profile-queries", action="store_true",
+                        help="print a summary of all SQL statements to the "
+                             "standard error output at the end")
+    parser.add_argument("--quarantine",
+                        help="skip malformed records and write them with "
+                             "their problems to this JSON file")
+
+    arguments = parser.parse_args(args)
+
+    if arguments.database is None and arguments.accounts is None:
+        sys.exit("Error: No database file specified as first argument.")
 
-    database.add_all(persons.values())
-    database.add_all(units)
+    if arguments.accounts and arguments.quarantine:
+        sys.exit("Error: --quarantine can't be used with --accounts.")
+
+    return arguments
+
+def print_profile(query_profiler):
+    """Prints the summary of `query_profiler` to the standard error output
+    unless it is `None`."""
+    if query_profiler is not None:
+        print(query_profiler.summary(), file=sys.stderr)
+
+def run_script():
+    """Executes this script."""
+    arguments = parse_arguments(sys.argv[1:])
+    query_profiler = profiler.QueryProfiler() \
+                     if arguments.profile_queries else None
+
+    if arguments.accounts:
+        try:
+            accounts = load_accounts(arguments.accounts)
+        except ValueError as error:
+            sys.exit(f"Error: {error}")
+
+        results = import_accounts(accounts, resume=arguments.resume,
+                                  query_profiler=query_profiler)
+
+        print(format_status(results))
+        print_profile(query_profiler)
+
+        if any(x[-1] for x in results):
+            sys.exit("Error: Import of at least one account failed.")
+
+        return
+
+    try:
+        api_token = os.environ[TOKEN_VARIABLE]
+    except KeyError:
+        sys.exit(f"Error: Environment Variable {TOKEN_VARIABLE} not defined.")
+
+    registry = Registry.load(arguments.registry)
+    database = model.SerloDatabase(arguments.database, query_profiler)
+
+    cache = snapshots.SnapshotCache(arguments.cache) \
+            if arguments.cache else None
+    quarantine = Quarantine() if arguments.quarantine else None
+
+    try:
+        if arguments.sync:
+            print(sync(database, *download_all(api_token, registry),
+                       registry=registry, cache=cache,
+                       chunk_size=arguments.chunk_size,
+                       quarantine=quarantine))
+        elif arguments.pipeline or arguments.resume:
+            run_pipeline(database, lambda endpoint, params:
+                         api_request(endpoint, api_token, params),
+                         resume=arguments.resume, registry=registry,
+                         quarantine=quarantine,
+                         verify_all=arguments.verify_all)
+        else:
+            import_all(database, api_token, registry, cache,
+                       arguments.chunk_size, quarantine)
+    except ValidationError as error:
+        sys.exit(f"Error: {error}")
+
+    print_profile(query_profiler)
+
+    if quarantine is not None:
+        quarantine.save(arguments.quarantine)
+
+        if quarantine:
+            print(quarantine.summary(), file=sys.stderr)
 
 if __name__ == "__main__":
     run_script()
@@ -0,0 +1,227 @@
+"""Analytics of the graph of mentoring relationships and unit memberships.
+The graph is read from a `SerloDatabase` once into plain dictionaries of
+ids without loading any entity. All analyses run in linear time in the
+number of persons, units and memberships. Overlaps and similarities are
+products of the sparse incidence matrix of persons and units with its
+transpose, which only visit pairs sharing a unit or a person."""
+
+import collections
+
+from serlo.model import Person, WorkingUnit
+
+TeamGraph = collections.namedtuple( # pylint: disable=invalid-name
+    "TeamGraph", ["keys", "names", "mentors", "unit_keys", "titles", "leads",
+                  "members"])
+TeamGraph.__doc__ = """Graph of a team. All dictionaries are keyed by the
+database ids. `keys` and `unit_keys` map them onto the stable ids of the
+persons and units, `names` and `titles` onto their display names,
+`mentors` onto the id of the mentor (or `None`), `leads` onto the id of the
+person responsible and `members` onto the set of ids of all members
+(person responsible and participants)."""
+
+def build_graph(database):
+    """Returns the `TeamGraph` of `database`."""
+    keys = dict()
+    names = dict()
+    mentors = dict()
+
+    for person_id, highrise_id, first_name, last_name, mentor_id \
+            in database.persons.with_entities(
+                    Person.id, Person.highrise_id, Person.first_name,
+                    Person.last_name, Person.mentor_id):
+        keys[person_id] = highrise_id or str(person_id)
+        names[person_id] = f"{first_name} {last_name}"
+        mentors[person_id] = mentor_id
+
+    unit_keys = dict()
+    titles = dict()
+    leads = dict()
+    members = dict()
+
+    for unit_id, highrise_id, name, unit_type, lead_id \
+            in database.working_units.with_entities(
+                    WorkingUnit.id, WorkingUnit.highrise_id, WorkingUnit.name,
+                    WorkingUnit.unit_type, WorkingUnit.person_responsible_id):
+        unit_keys[unit_id] = highrise_id or str(unit_id)
+        titles[unit_id] = f"{unit_type.abbreviation} - {name}"
+        leads[unit_id] = lead_id
+        members[unit_id] = set([lead_id]) if lead_id in keys else set()
+
+    for unit_id, person_id in database.participations:
+        if unit_id in members and person_id in keys:
+            members[unit_id].add(person_id)
+
+    return TeamGraph(keys, names, mentors, unit_keys, titles, leads, members)
+
+def mentoring_depths(mentors):
+    """Returns the depth of every person in the mentoring forest given by the
+    dictionary `mentors` (person id onto the id of the mentor) and the list
+    of all mentoring cycles. Persons without mentor have depth 0. Persons on
+    a cycle or mentored by one have the depth `None`. Every person is
+    visited once.
+
+    >>> mentoring_depths({1: None, 2: 1, 3: 2, 4: 5, 5: 4, 6: 4})
+    ({1: 0, 2: 1, 3: 2, 4: None, 5: None, 6: None}, [[4, 5]])
+    """
+    depths = dict()
+    cycles = []
+
+    for start in mentors:
+        path = []
+        on_path = dict()
+        person = start
+
+        while person is not None and person not in depths:
+            if person in on_path:
+                cycles.append(path[on_path[person]:])
+                break
+
+            on_path[person] = len(path)
+            path.append(person)
+            person = mentors.get(person)
+
+        if person is None:
+            depth = -1
+        else:
+            depth = depths.get(person)
+
+        for person in reversed(path):
+            depth = None if depth is None else depth + 1
+            depths[person] = depth
+
+    return (dict((x, depths[x]) for x in mentors), cycles)
+
+def incidence(members):
+    """Returns the sparse incidence matrix of persons and units as dictionary
+    from person ids onto the sorted lists of the ids of their units.
+    `members` maps unit ids onto sets of person ids.
+
+    >>> incidence({1: {10, 11}, 2: {11}})
+    {10: [1], 11: [1, 2]}
+    """
+    units_of = collections.defaultdict(list)
+
+    for unit_id in sorted(members):
+        for person_id in members[unit_id]:
+            units_of[person_id].append(unit_id)
+
+    return dict(sorted(units_of.items()))
+
+def _sparse_product(rows):
+    """Returns the upper triangle of the product of the transposed incidence
+    matrix `rows` (mapping each row onto the sorted list of its columns)
+    with itself. The result maps every column `a` onto a `Counter` mapping
+    the columns `b > a` onto the number of rows containing both. Only pairs
+    sharing a row are visited."""
+    product = collections.defaultdict(collections.Counter)
+
+    for columns in rows.values():
+        for index in range(len(columns) - 1):
+            product[columns[index]].update(columns[index + 1:])
+
+    return dict(sorted(product.items()))
+
+def unit_overlaps(members):
+    """Returns the number of shared members of all pairs of units with at
+    least one shared member. `members` maps unit ids onto sets of person
+    ids. The result maps every unit onto a dictionary from the units with
+    a greater id onto the number of shared members.
+
+    >>> overlaps = unit_overlaps({1: {10, 11}, 2: {11, 12}, 3: {10, 11, 12},
+    ...                           4: set()})
+    >>> overlaps == {1: {2: 1, 3: 2}, 2: {3: 2}}
+    True
+    """
+    return _sparse_product(incidence(members))
+
+def co_memberships(members):
+    """Returns the number of shared units of all pairs of persons working in
+    at least one unit together. `members` maps unit ids onto sets of person
+    ids. The result maps every person onto a dictionary from the persons
+    with a greater id onto the number of shared units.
+
+    >>> shared = co_memberships({1: {10, 11}, 2: {11, 12}, 3: {10, 11, 12}})
+    >>> shared == {10: {11: 2, 12: 1}, 11: {12: 2}}
+    True
+    """
+    return _sparse_product(dict((x, sorted(y)) for x, y in members.items()))
+
+def jaccard(shared, sizes):
+    """Returns the Jaccard similarity of all pairs in `shared` (see
+    `unit_overlaps()`) in the same format. `sizes` maps the ids onto the
+    sizes of their sets.
+
+    >>> jaccard({1: {2: 1}}, {1: 2, 2: 3})
+    {1: {2: 0.25}}
+    """
+    return dict((a, dict((b, count / (sizes[a] + sizes[b] - count))
+                         for b, count in row.items()))
+                for a, row in shared.items())
+
+def lead_loads(graph):
+    """Returns the load of every person responsible for at least one unit
+    of the `TeamGraph` `graph`. It maps the person ids onto dictionaries with
+    the number of `units` led, the number of distinct `members` of these
+    units (without the lead) and the number of `mentees`."""
+    mentees = collections.Counter(x for x in graph.mentors.values()
+                                  if x is not None)
+    units = collections.defaultdict(list)
+
+    for unit_id, lead_id in graph.leads.items():
+        if lead_id in graph.keys:
+            units[lead_id].append(unit_id)
+
+    return dict((lead_id, {"units": len(unit_ids),
+                           "members": len(set().union(
+                               *(graph.members[x] for x in unit_ids)) -
+                                          set([lead_id])),
+                           "mentees": mentees[lead_id]})
+                for lead_id, unit_ids in units.items())
+
+def _similarities(keys, shared, sizes):
+    """Returns the sparse matrix `shared` (see `unit_overlaps()`) and its
+    Jaccard similarities as JSON serializable dictionaries, in which the ids
+    are replaced by their keys in `keys`."""
+    def rekey(matrix, value=lambda x: x):
+        return dict((keys[a], dict((keys[b], value(x))
+                                   for b, x in row.items()))
+                    for a, row in matrix.items())
+
+    return {"shared": rekey(shared),
+            "jaccard": rekey(jaccard(shared, sizes),
+                             lambda x: round(x, 4))}
+
+def analyze(graph):
+    """Returns all analyses of the `TeamGraph` `graph` as JSON serializable
+    dictionary. Persons and units are referenced by their stable ids."""
+    keys, unit_keys = graph.keys, graph.unit_keys
+    depths, cycles = mentoring_depths(graph.mentors)
+    units_of = incidence(graph.members)
+    unit_sizes = dict((x, len(y)) for x, y in graph.members.items())
+    person_sizes = dict((x, len(y)) for x, y in units_of.items())
+
+    def sorted_keys(person_ids):
+        return sorted(keys[x] for x in person_ids)
+
+    return {
+        "persons": dict((keys[x], name) for x, name in graph.names.items()),
+        "units": dict((unit_keys[x], title)
+                      for x, title in graph.titles.items()),
+        "mentoring": {
+            "depths": dict((keys[x], depth) for x, depth in depths.items()),
+            "max_depth": max([x for x in depths.values() if x is not None],
+                             default=0),
+            "cycles": [[keys[x] for x in cycle] for cycle in cycles]
+        },
+        "without_mentor": sorted_keys(x for x, mentor
+                                      in graph.mentors.items()
+                                      if mentor is None),
+        "without_unit": sorted_keys(x for x in keys if x not in units_of),
+        "unit_overlaps": _similarities(unit_keys,
+                                       unit_overlaps(graph.members),
+                                       unit_sizes),
+        "co_membership": _similarities(keys, co_memberships(graph.members),
+                                       person_sizes),
+        "lead_load": dict((keys[x], load)
+                          for x, load in lead_loads(graph).items())
+    }
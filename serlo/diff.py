@@ -0,0 +1,527 @@
+"""Diff engine between freshly parsed data and the stored state of a
+`SerloDatabase`. Persons and working units are compared by their Highrise
+ids as snapshots, which are plain dictionaries of all their imported values.
+The stored content hashes of the snapshots allow skipping unchanged entities
+without loading them; only the entities whose hashes differ are loaded."""
+
+import collections
+import hashlib
+import json
+
+from sqlalchemy.orm import aliased, selectinload
+
+from serlo.model import Email, Person, PhoneNumber, Tag, UnitType, \
+                        WorkingUnit
+
+# Number of changed entities loaded with one query while diffing
+LOAD_CHUNK_SIZE = 500
+
+_PARTICIPANTS = Person.metadata.tables["working_unit_participants"]
+
+Change = collections.namedtuple( # pylint: disable=invalid-name
+    "Change", ["kind", "key", "old", "new"])
+Change.__doc__ = """Change of the entity of type `kind` (`"person"` or
+`"unit"`) with the Highrise id `key`. `old` is the stored snapshot (`None`
+for inserts) and `new` the parsed one (`None` for deletes)."""
+
+def person_snapshot(person):
+    """Returns the snapshot of `person`.
+
+    >>> person_snapshot(Person(first_name="Markus", last_name="Miller",
+    ...                        emails=[Email(address="m@example.org",
+    ...                                      location="Work")]))
+    ... # doctest: +NORMALIZE_WHITESPACE
+    {'first_name': 'Markus', 'last_name': 'Miller',
+     'emails': [['m@example.org', 'Work']], 'phone_numbers': [], 'tags': [],
+     'mentor': None}
+    """
+    return {"first_name": person.first_name,
+            "last_name": person.last_name,
+            "emails": sorted([x.address, x.location] for x in person.emails),
+            "phone_numbers": sorted([x.number, x.location]
+                                    for x in person.phone_numbers),
+            "tags": sorted(x.tag_id for x in person.tags),
+            "mentor": person.mentor.highrise_id if person.mentor else None}
+
+def unit_snapshot(unit):
+    """Returns the snapshot of the working unit `unit`. Persons are
+    referenced by their Highrise ids."""
+    return {"name": unit.name,
+            "description": unit.description,
+            "unit_type": unit.unit_type.name,
+            "overview_document": unit.overview_document,
+            "storage_url": unit.storage_url,
+            "slack_url": unit.slack_url,
+            "person_responsible": unit.person_responsible.highrise_id,
+            "participants": sorted(x.highrise_id for x in unit.participants)}
+
+def content_hash(snapshot):
+    """Returns the content hash of `snapshot`. It does not depend on the order
+    of the keys.
+
+    >>> content_hash({"a": 1, "b": [2]}) == content_hash({"b": [2], "a": 1})
+    True
+    """
+    content = json.dumps(snapshot, sort_keys=True, separators=(",", ":"))
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def _partition(stored):
+    """Returns the tuples `stored` of the ids, Highrise ids and content
+    hashes of entities as dictionary from the Highrise ids onto the tuples
+    and the list of the ids of all entities which can't be matched because
+    their Highrise id is missing or duplicated."""
+    by_key = dict()
+    unmatched = []
+
+    for entity_id, key, entity_hash in stored:
+        if key is None or key in by_key:
+            unmatched.append(entity_id)
+        else:
+            by_key[key] = (entity_id, entity_hash)
+
+    return (by_key, unmatched)
+
+def _snapshots(ids, load, snapshot, hashes):
+    """Returns the snapshots of the stored entities with the list of `ids`
+    as dictionary from their ids onto the snapshots. The entities are loaded
+    with the function `load(ids)` in chunks of `LOAD_CHUNK_SIZE` ids. The
+    dictionary `hashes` maps ids onto the content hashes of the parsed
+    snapshots; matching entities get their missing content hash filled in
+    and are left out of the result."""
+    snapshots = dict()
+
+    for start in range(0, len(ids), LOAD_CHUNK_SIZE):
+        for entity in load(ids[start:start + LOAD_CHUNK_SIZE]):
+            old = snapshot(entity)
+
+            if hashes.get(entity.id) == content_hash(old):
+                entity.content_hash = hashes[entity.id]
+            else:
+                snapshots[entity.id] = old
+
+    return snapshots
+
+def diff_entities(kind, stored, parsed, snapshot, load):
+    """Returns the changes between the stored entities and the dictionary
+    `parsed` mapping Highrise ids onto snapshots. `stored` yields the tuples
+    of the ids, Highrise ids and content hashes of all stored entities (see
+    `SerloDatabase.content_hashes()`). Only the entities whose stored
+    content hash differs or is missing are loaded with the function
+    `load(ids)` and their snapshots computed with the function `snapshot`.
+    Missing content hashes of unchanged entities are filled in so that the
+    next diff skips them. Stored entities which can't be matched by their
+    Highrise id are deleted."""
+    by_key, unmatched = _partition(stored)
+    # Tuples of the key, the id of the stored entity and the new snapshot
+    entries = [(None, x, None) for x in unmatched]
+    hashes = dict()
+
+    for key, new in parsed.items():
+        entity_id, entity_hash = by_key.pop(key, (None, None))
+        new_hash = content_hash(new)
+
+        if entity_id is None or entity_hash != new_hash:
+            entries.append((key, entity_id, new))
+
+        if entity_id is not None and entity_hash != new_hash:
+            hashes[entity_id] = new_hash
+
+    entries += [(key, entity_id, None)
+                for key, (entity_id, _) in by_key.items()]
+    snapshots = _snapshots([x for _, x, _ in entries if x is not None],
+                           load, snapshot, hashes)
+
+    return [Change(kind, key, snapshots.get(entity_id), new)
+            for key, entity_id, new in entries
+            if entity_id is None or entity_id in snapshots]
+
+def _loader(query, model):
+    """Returns a function loading the entities of the class `model` with
+    the given ids from `query`."""
+    return lambda ids: query.filter(model.id.in_(ids))
+
+def _kept(database, rejections):
+    """Returns the Highrise ids of the stored persons and of the stored
+    working units which are kept unchanged because of the list of
+    `rejections` (see `serlo.validation.Rejection`). These are the rejected
+    records themselves, the persons whose mentor and the working units whose
+    person responsible or participants were rejected."""
+    rejected = dict((x, set(y.highrise_id for y in rejections
+                            if y.endpoint == x and y.highrise_id))
+                    for x in ["people", "deals"])
+    persons, units = set(rejected["people"]), set(rejected["deals"])
+
+    if rejected["people"]:
+        mentor = aliased(Person)
+        persons.update(x for x, in database.persons
+                       .join(mentor, Person.mentor)
+                       .filter(mentor.highrise_id.in_(rejected["people"]))
+                       .with_entities(Person.highrise_id))
+
+        for relationship in [WorkingUnit.person_responsible,
+                             WorkingUnit.participants]:
+            units.update(x for x, in database.working_units
+                         .join(relationship)
+                         .filter(Person.highrise_id.in_(rejected["people"]))
+                         .with_entities(WorkingUnit.highrise_id))
+
+    return (persons, units)
+
+def _without(kept, stored, parsed):
+    """Returns the tuples `stored` of the ids, Highrise ids and content
+    hashes of entities and the dictionary `parsed` from Highrise ids onto
+    snapshots without the entities with the Highrise ids `kept`."""
+    return ((x for x in stored if x[1] not in kept),
+            dict((key, x) for key, x in parsed.items() if key not in kept))
+
+def diff_database(database, persons, units, rejections=()):
+    """Returns the minimal list of changes which turns the stored state of
+    `database` into the parsed one. `persons` and `units` are dictionaries
+    mapping Highrise ids onto the snapshots of the parsed persons and working
+    units. Only changed entities are loaded, together with the rows of their
+    snapshots. The list of `rejections` holds the records which were
+    rejected while parsing; their stored entities and the ones referencing
+    them are neither updated nor deleted (see `_kept()`)."""
+    persons_query = database.persons.options(
+        selectinload(Person.emails), selectinload(Person.phone_numbers),
+        selectinload(Person.tags), selectinload(Person.mentor))
+    units_query = database.working_units.options(
+        selectinload(WorkingUnit.person_responsible),
+        selectinload(WorkingUnit.participants))
+    kept_persons, kept_units = _kept(database, rejections)
+    stored_persons, persons = _without(
+        kept_persons, database.content_hashes(Person), persons)
+    stored_units, units = _without(
+        kept_units, database.content_hashes(WorkingUnit), units)
+
+    return diff_entities("person", stored_persons, persons, person_snapshot,
+                         _loader(persons_query, Person)) + \
+           diff_entities("unit", stored_units, units, unit_snapshot,
+                         _loader(units_query, WorkingUnit))
+
+# Lists of rows of a person in its snapshot as pairs of the functions
+# returning the snapshot value of a row and creating a row of a value
+_PERSON_ROWS = {
+    "emails": (lambda x: [x.address, x.location],
+               lambda x: Email(address=x[0], location=x[1])),
+    "phone_numbers": (lambda x: [x.number, x.location],
+                      lambda x: PhoneNumber(number=x[0], location=x[1])),
+    "tags": (lambda x: x.tag_id, lambda x: Tag(tag_id=x))}
+
+def _update_person(person, snapshot):
+    """Sets all values of `person` except the mentor to `snapshot`. Only the
+    names and the lists of contact rows and tags which differ are written.
+    Replaced rows are returned."""
+    replaced = []
+
+    for name in ["first_name", "last_name"]:
+        if getattr(person, name) != snapshot[name]:
+            setattr(person, name, snapshot[name])
+
+    for name, (value, create) in _PERSON_ROWS.items():
+        rows = getattr(person, name)
+
+        if sorted(value(x) for x in rows) != sorted(snapshot[name]):
+            replaced += rows
+            setattr(person, name, [create(x) for x in snapshot[name]])
+
+    person.content_hash = content_hash(snapshot)
+
+    return replaced
+
+def _update_unit(unit, snapshot, person_ids, participants):
+    """Sets all values of the working unit `unit` to `snapshot`. The person
+    responsible is resolved with the dictionary `person_ids` from Highrise
+    ids onto stored ids and the participants with the dictionary
+    `participants` from stored ids onto persons."""
+    unit.name = snapshot["name"]
+    unit.description = snapshot["description"]
+    unit.unit_type = UnitType[snapshot["unit_type"]]
+    unit.overview_document = snapshot["overview_document"]
+    unit.storage_url = snapshot["storage_url"]
+    unit.slack_url = snapshot["slack_url"]
+    unit.person_responsible_id = person_ids[snapshot["person_responsible"]]
+    unit.participants = [participants[person_ids[x]]
+                         for x in snapshot["participants"]]
+    unit.content_hash = content_hash(snapshot)
+
+def _chunks(items, size):
+    """Yields the list `items` in chunks of at most `size` items. With
+    `size=None` all items are yielded as one chunk.
+
+    >>> list(_chunks([1, 2, 3], 2))
+    [[1, 2], [3]]
+    """
+    size = size or max(len(items), 1)
+
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _load_chunk(query, model, changes):
+    """Returns the stored entities of the chunk `changes` from `query` as
+    dictionary from their Highrise ids onto the entities. Entities without a
+    Highrise id which are deleted by the chunk are stored under `None` as
+    list."""
+    keys = [x.key for x in changes if x.key is not None]
+    unmatched = sum(1 for x in changes if x.key is None)
+    entities = dict((x.highrise_id, x) for x
+                    in query.filter(model.highrise_id.in_(keys)))
+
+    if unmatched:
+        entities[None] = query.filter_by(highrise_id=None) \
+                              .limit(unmatched).all()
+
+    return entities
+
+def _apply_chunk(database, model, changes, update):
+    """Applies the inserts and deletes of the chunk `changes` of entities of
+    the type `model` and updates all inserted and changed entities with the
+    function `update(entity, snapshot)`. It returns the lists of entities to
+    insert and to delete."""
+    query = database.persons if model is Person else database.working_units
+    entities = _load_chunk(query, model, changes)
+    inserts = []
+    deletes = []
+
+    for change in changes:
+        if change.new is None:
+            entity = entities[change.key] if change.key is not None \
+                     else entities[None].pop(0)
+
+            if model is Person:
+                deletes += entity.emails + entity.phone_numbers + entity.tags
+
+            deletes.append(entity)
+            continue
+
+        entity = entities.get(change.key)
+
+        if entity is None:
+            entity = model(highrise_id=change.key)
+            inserts.append(entity)
+
+        deletes += update(entity, change.new) or []
+
+    return (inserts, deletes)
+
+def bulk_load(database, changes, chunk_size=None):
+    """Writes the list `changes` which only contains inserts with the bulk
+    loading of `SerloDatabase.bulk_insert()` instead of the ORM. The ids of
+    the new rows are assigned by the database and mapped back through the
+    Highrise ids. References to persons are resolved like by
+    `apply_changes()`, which also describes `chunk_size`."""
+    chunked = chunk_size is not None
+    persons = [x for x in changes if x.kind == "person"]
+    units = [x for x in changes if x.kind == "unit"]
+
+    for chunk in _chunks(persons, chunk_size):
+        database.bulk_insert(Person.__table__, [
+            {"highrise_id": x.key, "content_hash": content_hash(x.new),
+             "first_name": x.new["first_name"],
+             "last_name": x.new["last_name"]} for x in chunk])
+
+        ids = database.ids_by_highrise_id(Person, [x.key for x in chunk])
+
+        database.bulk_insert(Email.__table__, [
+            {"person_id": ids[x.key], "address": address,
+             "location": location}
+            for x in chunk for address, location in x.new["emails"]])
+        database.bulk_insert(PhoneNumber.__table__, [
+            {"person_id": ids[x.key], "number": number, "location": location}
+            for x in chunk for number, location in x.new["phone_numbers"]])
+        database.bulk_insert(Tag.__table__, [
+            {"person_id": ids[x.key], "tag_id": tag_id}
+            for x in chunk for tag_id in x.new["tags"]])
+
+        if chunked:
+            database.commit()
+
+    person_ids = database.person_ids()
+    mentees = [x for x in persons if x.new["mentor"] in person_ids]
+
+    for chunk in _chunks(mentees, chunk_size):
+        database.bulk_update(Person.__table__, [
+            {"id": person_ids[x.key],
+             "mentor_id": person_ids[x.new["mentor"]]} for x in chunk])
+
+        if chunked:
+            database.commit()
+
+    for chunk in _chunks(units, chunk_size):
+        database.bulk_insert(WorkingUnit.__table__, [
+            {"highrise_id": x.key, "content_hash": content_hash(x.new),
+             "name": x.new["name"], "description": x.new["description"],
+             "unit_type": UnitType[x.new["unit_type"]],
+             "overview_document": x.new["overview_document"],
+             "storage_url": x.new["storage_url"],
+             "slack_url": x.new["slack_url"],
+             "person_responsible_id":
+                 person_ids[x.new["person_responsible"]]} for x in chunk])
+
+        ids = database.ids_by_highrise_id(WorkingUnit,
+                                          [x.key for x in chunk])
+
+        database.bulk_insert(_PARTICIPANTS, [
+            {"working_unit_id": ids[x.key], "person_id": person_ids[y]}
+            for x in chunk for y in x.new["participants"]])
+
+        if chunked:
+            database.commit()
+
+    database.commit()
+
+def apply_changes(database, changes, chunk_size=None):
+    """Applies the list of `changes` (see `diff_database()`) to `database`.
+    Only the changed entities are written. By default all changes are
+    written in one transaction. With `chunk_size` they are committed in
+    chunks of this many changes and the written entities are expunged
+    afterwards so that the memory of the session does not grow with the
+    number of changes. References between persons and working units are
+    therefore resolved through their stored ids. Changes which only insert
+    entities, like a first import, are bulk loaded in the same chunks (see
+    `bulk_load()`)."""
+    if changes and all(x.old is None for x in changes):
+        bulk_load(database, changes, chunk_size)
+        return
+
+    chunked = chunk_size is not None
+
+    def write(inserts, deletes):
+        database.sync(inserts, deletes, commit=chunked)
+
+        if chunked:
+            database.expunge_all()
+
+    persons = [x for x in changes if x.kind == "person"]
+    units = [x for x in changes if x.kind == "unit"]
+
+    for chunk in _chunks(persons, chunk_size):
+        write(*_apply_chunk(database, Person, chunk, _update_person))
+
+    person_ids = database.person_ids()
+
+    def update_mentor(person, snapshot):
+        person.mentor_id = person_ids.get(snapshot["mentor"])
+
+    for chunk in _chunks([x for x in persons if x.new is not None],
+                         chunk_size):
+        write(*_apply_chunk(database, Person, chunk, update_mentor))
+
+    for chunk in _chunks(units, chunk_size):
+        participants = dict((x.id, x) for x in database.persons.filter(
+            Person.id.in_(set(person_ids[y] for x in chunk if x.new
+                              for y in x.new["participants"]))))
+
+        write(*_apply_chunk(database, WorkingUnit, chunk,
+                            lambda unit, snapshot, participants=participants:
+                            _update_unit(unit, snapshot, person_ids,
+                                         participants)))
+
+    database.commit()
+
+def _describe_values(snapshot, keys):
+    """Returns the values of `keys` in `snapshot` as readable text."""
+    return ", ".join(f"{key}={snapshot[key]!r}" for key in keys)
+
+def _log_person(change, label, name):
+    """Returns the lines of the change log for the change of a person."""
+    old, new = change.old, change.new
+
+    if old is None:
+        return [f"Joined: {label}"]
+    elif new is None:
+        return [f"Left: {label}"]
+
+    lines = []
+
+    if old["mentor"] != new["mentor"]:
+        mentor = name(new["mentor"]) if new["mentor"] else "nobody"
+        lines.append(f"Mentoring: {label} is now mentored by {mentor}")
+
+    keys = [x for x in new if x != "mentor" and old[x] != new[x]]
+
+    if keys:
+        lines.append(f"Changed person {old['first_name']} "
+                     f"{old['last_name']}: {_describe_values(new, keys)}")
+
+    return lines
+
+def _log_unit(change, label, name):
+    """Returns the lines of the change log for the change of a unit."""
+    old, new = change.old or dict(), change.new or dict()
+    lines = []
+
+    if not old:
+        lines.append(f"New unit: {label}")
+    elif not new:
+        lines.append(f"Closed unit: {label}")
+
+    old_members = set(old.get("participants", []) +
+                      [old.get("person_responsible")]) - set([None])
+    new_members = set(new.get("participants", []) +
+                      [new.get("person_responsible")]) - set([None])
+
+    lines += [f"{name(x)} joined {label}"
+              for x in sorted(new_members - old_members, key=name)]
+    lines += [f"{name(x)} left {label}"
+              for x in sorted(old_members - new_members, key=name)]
+
+    if old and new:
+        if old["person_responsible"] != new["person_responsible"]:
+            lines.append(f"{name(new['person_responsible'])} is now "
+                         f"responsible for {label}")
+
+        keys = [x for x in new if old[x] != new[x] and x
+                not in ("participants", "person_responsible")]
+
+        if keys:
+            lines.append(f"Changed unit {label}: "
+                         f"{_describe_values(new, keys)}")
+
+    return lines
+
+def format_change_log(changes, persons=None):
+    """Returns a human-readable change log of the list `changes`. The
+    dictionary `persons` maps Highrise ids onto snapshots of persons and is
+    used to name persons which did not change themselves.
+
+    >>> anna = {"first_name": "Anna", "last_name": "A", "mentor": None}
+    >>> print(format_change_log([
+    ...     Change("person", "1", None, anna),
+    ...     Change("person", "2", dict(anna, last_name="B"),
+    ...            dict(anna, last_name="C"))]))
+    Joined: Anna A
+    Changed person Anna B: last_name='C'
+    """
+    names = dict((key, x["first_name"] + " " + x["last_name"])
+                 for key, x in (persons or dict()).items())
+    titles = dict()
+
+    for change in changes:
+        for snapshot in (change.old, change.new):
+            if snapshot and change.kind == "person":
+                names[change.key] = snapshot["first_name"] + " " + \
+                                    snapshot["last_name"]
+            elif snapshot:
+                titles[change.key] = \
+                    UnitType[snapshot["unit_type"]].abbreviation + " - " + \
+                    snapshot["name"]
+
+    def name(key):
+        return names.get(key, f"#{key}")
+
+    lines = []
+
+    for change in changes:
+        if change.key is None:
+            label = "(without Highrise id)"
+        elif change.kind == "person":
+            label = name(change.key)
+        else:
+            label = titles[change.key]
+
+        log = _log_person if change.kind == "person" else _log_unit
+        lines += log(change, label, name)
+
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+"""Columnar export of the team for downstream analytics. Persons, their
+contact data and tags, working units, participations and mentoring edges
+are read with batched Core queries (no entity is loaded) and written as one
+Parquet or Arrow IPC file per table, one record batch per query batch, so
+that the memory stays bounded for large databases. The optional package
+`pyarrow` is only needed for writing the files."""
+
+import enum
+import os
+
+from sqlalchemy import select
+
+from serlo.lazy import lazy_import
+from serlo.model import Email, Person, PhoneNumber, Tag, WorkingUnit
+
+BATCH_SIZE = 10000
+FORMATS = ["parquet", "arrow"]
+
+_PARTICIPANTS = Person.metadata.tables["working_unit_participants"]
+
+# Exported tables as lists of the column name, the column expression and
+# the name of the Arrow type
+TABLES = {
+    "persons": [("id", Person.id, "int64"),
+                ("highrise_id", Person.highrise_id, "string"),
+                ("first_name", Person.first_name, "string"),
+                ("last_name", Person.last_name, "string"),
+                ("mentor_id", Person.mentor_id, "int64")],
+    "emails": [("id", Email.id, "int64"),
+               ("person_id", Email.person_id, "int64"),
+               ("address", Email.address, "string"),
+               ("location", Email.location, "string")],
+    "phone_numbers": [("id", PhoneNumber.id, "int64"),
+                      ("person_id", PhoneNumber.person_id, "int64"),
+                      ("number", PhoneNumber.number, "string"),
+                      ("location", PhoneNumber.location, "string")],
+    "tags": [("id", Tag.id, "int64"),
+             ("person_id", Tag.person_id, "int64"),
+             ("tag_id", Tag.tag_id, "int64")],
+    "working_units": [
+        ("id", WorkingUnit.id, "int64"),
+        ("highrise_id", WorkingUnit.highrise_id, "string"),
+        ("name", WorkingUnit.name, "string"),
+        ("description", WorkingUnit.description, "string"),
+        ("unit_type", WorkingUnit.unit_type, "string"),
+        ("person_responsible_id", WorkingUnit.person_responsible_id,
+         "int64"),
+        ("overview_document", WorkingUnit.overview_document, "string"),
+        ("storage_url", WorkingUnit.storage_url, "string"),
+        ("slack_url", WorkingUnit.slack_url, "string")],
+    "participants": [
+        ("working_unit_id", _PARTICIPANTS.c.working_unit_id, "int64"),
+        ("person_id", _PARTICIPANTS.c.person_id, "int64")],
+    "mentoring": [("mentor_id", Person.mentor_id, "int64"),
+                  ("mentee_id", Person.id, "int64")]}
+
+def table_statement(name):
+    """Returns the Core select of the exported table `name`. Rows are ordered
+    by their id and tables without id by all columns."""
+    columns = [expression for _, expression, _ in TABLES[name]]
+    keys = columns[:1] if TABLES[name][0][0] == "id" else columns
+    statement = select(columns).order_by(*keys)
+
+    if name == "mentoring":
+        statement = statement.where(Person.mentor_id.isnot(None))
+
+    return statement
+
+def _value(value):
+    """Returns the exported value of the column value `value`. Enumerations
+    are exported by their name."""
+    return value.name if isinstance(value, enum.Enum) else value
+
+def column_batches(database, name, batch_size=BATCH_SIZE):
+    """Yields the rows of the exported table `name` of `database` in batches
+    of at most `batch_size` rows. Every batch is a dictionary from the
+    column names onto the lists of their values."""
+    names = [column_name for column_name, _, _ in TABLES[name]]
+
+    for rows in database.stream(table_statement(name), batch_size):
+        yield dict((column_name, [_value(x) for x in column])
+                   for column_name, column in zip(names, zip(*rows)))
+
+def arrow_modules():
+    """Returns the modules `pyarrow`, `pyarrow.ipc` and `pyarrow.parquet`.
+    An `ImportError` is raised when `pyarrow` is not installed."""
+    try:
+        return (lazy_import("pyarrow"), lazy_import("pyarrow.ipc"),
+                lazy_import("pyarrow.parquet"))
+    except ImportError:
+        raise ImportError("The export requires the package `pyarrow`.",
+                          name="pyarrow")
+
+def table_schema(name):
+    """Returns the Arrow schema of the exported table `name`."""
+    pyarrow = arrow_modules()[0]
+
+    return pyarrow.schema([(column_name, getattr(pyarrow, arrow_type)())
+                           for column_name, _, arrow_type in TABLES[name]])
+
+def record_batches(database, name, batch_size=BATCH_SIZE):
+    """Yields the exported table `name` of `database` as Arrow record
+    batches of at most `batch_size` rows (see `column_batches()`)."""
+    pyarrow = arrow_modules()[0]
+    schema = table_schema(name)
+
+    for columns in column_batches(database, name, batch_size):
+        yield pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(columns[x.name], type=x.type) for x in schema],
+            schema=schema)
+
+def export_table(database, name, path, file_format="parquet",
+                 batch_size=BATCH_SIZE):
+    """Writes the exported table `name` of `database` into the file `path`
+    in the format `file_format` (`"parquet"` or `"arrow"`) and returns the
+    number of written rows. Every batch of `batch_size` rows becomes a row
+    group respectively a record batch of the file."""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format `{file_format}`")
+
+    pyarrow, ipc, parquet = arrow_modules()
+    schema = table_schema(name)
+    rows = 0
+
+    writer = parquet.ParquetWriter(path, schema) \
+             if file_format == "parquet" else ipc.new_file(path, schema)
+
+    try:
+        for batch in record_batches(database, name, batch_size):
+            if file_format == "parquet":
+                writer.write_table(pyarrow.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+
+            rows += batch.num_rows
+    finally:
+        writer.close()
+
+    return rows
+
+def export(database, directory, file_format="parquet",
+           batch_size=BATCH_SIZE):
+    """Exports all tables of `database` into the directory `directory` (see
+    `export_table()`). The files are named after the tables with the format
+    as extension. It returns a dictionary from the table names onto the
+    numbers of exported rows."""
+    rows = dict()
+
+    for name in TABLES:
+        path = os.path.join(directory, f"{name}.{file_format}")
+        rows[name] = export_table(database, name, path, file_format,
+                                  batch_size)
+
+    return rows
@@ -0,0 +1,31 @@
+"""Lazy imports of heavy modules. The command line scripts import SQLAlchemy,
+Jinja and requests only on the code paths which actually use them so that
+`--help` and invalid arguments are answered without loading them."""
+
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """Returns the module `name`. It is only executed on the first access of
+    one of its attributes. Already imported modules are returned directly.
+
+    >>> json = lazy_import("json")
+    >>> json.dumps([1])
+    '[1]'
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
@@ -1,14 +1,27 @@
 """Object relational mapping for Serlo entities."""
 
 import enum
+import io
 
 from abc import abstractmethod
 from collections.abc import Sequence, Set, Hashable
 
 from sqlalchemy import Column, Integer, String, create_engine, ForeignKey, \
-                       Table, Enum
+                       Table, Enum, Index, bindparam, case, func, inspect, \
+                       select
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.ext.declarative import declared_attr, declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import sessionmaker, relationship, selectinload
+
+# Location of the contacts shown in the report
+WORK_LOCATION = "Work"
+
+# Connection pool of server databases like PostgreSQL
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+POOL_RECYCLE = 1800
 
 def _hash(obj):
     """Computes the hash value of `obj`. This function expands the domain of
@@ -55,6 +68,26 @@ class _SerloEntity(object):
 
 _SerloEntity = declarative_base(cls=_SerloEntity) #pylint: disable=invalid-name
 
+class _HighriseEntity(object):
+    """Mixin of all models imported from a Highrise record. The Highrise id
+    is stored as indexed natural key so that records can be looked up and
+    linked across imports. `content_hash` is the hash of the last written
+    snapshot of the record (see `serlo.diff`)."""
+    # pylint: disable=too-few-public-methods
+
+    highrise_id = Column(String, index=True, unique=True)
+    content_hash = Column(String)
+
+    @property
+    def stable_id(self):
+        """Returns an id which is stable between imports. It is the Highrise
+        id and the database id for entities created without one.
+
+        >>> Person(highrise_id="23", first_name="", last_name="").stable_id
+        '23'
+        """
+        return self.highrise_id or str(self.id) # pylint: disable=no-member
+
 class Email(_SerloEntity):
     """Model of an email contact."""
     # pylint: disable=too-few-public-methods
@@ -63,6 +96,9 @@ class Email(_SerloEntity):
     person_id = Column(Integer, ForeignKey("person.id"))
     location = Column(String)
 
+    __table_args__ = (Index("ix_email_person_location", "person_id",
+                            "location"),)
+
     @property
     def _properties(self):
         return (self.address, self.location)
@@ -75,6 +111,9 @@ class PhoneNumber(_SerloEntity):
     person_id = Column(Integer, ForeignKey("person.id"))
     location = Column(String)
 
+    __table_args__ = (Index("ix_phonenumber_person_location", "person_id",
+                            "location"),)
+
     @property
     def _properties(self):
         return (self.number, self.location)
@@ -83,11 +122,11 @@ class Tag(_SerloEntity):
     """Model of a tag for a person"""
     # pylint: disable=too-few-public-methods
 
+    # Displayed tag names and the ids of the tags shown with them
     TAGS = {
-        "Pause": 5979171,
-        "Intern": 5363523,
-        "Newcomer": 5978316,
-        "Intern (School)": 5417900
+        "Pause": [5979171],
+        "Intern": [5363523, 5417900],
+        "Newcomer": [5978316]
     }
 
     tag_id = Column(Integer)
@@ -102,7 +141,7 @@ _WorkingUnitParticipants = Table( # pylint: disable=invalid-name
     Column("working_unit_id", Integer, ForeignKey("workingunit.id")),
     Column("person_id", Integer, ForeignKey("person.id")))
 
-class Person(_SerloEntity):
+class Person(_HighriseEntity, _SerloEntity):
     """Model of a person working at Serlo."""
     # pylint: disable=too-few-public-methods
 
@@ -120,42 +159,87 @@ class Person(_SerloEntity):
     mentor_id = Column(Integer, ForeignKey("person.id"))
     mentor = relationship("Person", remote_side=[id], post_update=True)
     mentees = relationship("Person", back_populates="mentor")
+    _work_emails = relationship(
+        "Email", viewonly=True,
+        primaryjoin=f"and_(Person.id == Email.person_id, "
+                    f"Email.location == '{WORK_LOCATION}')")
+    _work_phone_numbers = relationship(
+        "PhoneNumber", viewonly=True,
+        primaryjoin=f"and_(Person.id == PhoneNumber.person_id, "
+                    f"PhoneNumber.location == '{WORK_LOCATION}')")
 
     @property
     def _properties(self):
         return (self.first_name, self.last_name, self.emails,
                 self.phone_numbers, self.tags)
 
+    @hybrid_property
+    def full_name(self):
+        """Returns the first and the last name of the person. In queries it
+        is an SQL expression, so that persons can be sorted and filtered by
+        their names.
+
+        >>> Person(first_name="Markus", last_name="Miller").full_name
+        'Markus Miller'
+        >>> print(Person.full_name)
+        person.first_name || :first_name_1 || person.last_name
+        """
+        return self.first_name + " " + self.last_name
+
     @property
     def name(self):
-        """Returns the full name of the person.
+        """Returns the displayed name of the person, i.e. the full name
+        followed by the displayed tags of `Tag.TAGS` (see `tagged_name()`).
 
         >>> p = Person(first_name="Markus", last_name="Miller")
         >>> p.name
         'Markus Miller'
         """
-        name = self.first_name + " " + self.last_name
-        tags = [tag_name for tag_name, tag_id in Tag.TAGS.items()
-                if self.has_tag(tag_id)]
-
-        tags = ["Intern" if x == "Intern (School)" else x for x in tags]
+        return self.tagged_name()
+
+    def tagged_name(self, tags=None):
+        """Returns the full name of the person followed by the names of the
+        displayed `tags` it has. `tags` maps the displayed names onto the
+        lists of the ids of the tags shown with them (by default
+        `Tag.TAGS`).
+
+        >>> p = Person(first_name="Markus", last_name="Miller",
+        ...            tags=[Tag(tag_id=2), Tag(tag_id=3)])
+        >>> p.tagged_name({"Pause": [1], "Intern": [2, 3]})
+        'Markus Miller (Intern)'
+        >>> p.tagged_name({})
+        'Markus Miller'
+        """
+        name = self.full_name
+        tag_names = [tag_name for tag_name, tag_ids
+                     in (Tag.TAGS if tags is None else tags).items()
+                     if any(self.has_tag(x) for x in tag_ids)]
 
-        if tags:
-            name += " (%s)" % ", ".join(tags)
+        if tag_names:
+            name += " (%s)" % ", ".join(tag_names)
 
         return name
 
     @property
     def work_emails(self):
-        """Returns a list of all emails of a person with location 'work'."""
-        return [email for email in self.emails if email.location == "Work"]
+        """Returns a list of all emails of a person with location 'work'.
+        Unless all emails are already loaded, only these are loaded."""
+        if "emails" in inspect(self).unloaded:
+            return self._work_emails
+
+        return [email for email in self.emails
+                if email.location == WORK_LOCATION]
 
     @property
     def work_phone_numbers(self):
         """Returns a list of all phone numbers of a person with location
-        'work'."""
+        'work'. Unless all phone numbers are already loaded, only these are
+        loaded."""
+        if "phone_numbers" in inspect(self).unloaded:
+            return self._work_phone_numbers
+
         return [PhoneNumber for PhoneNumber in self.phone_numbers
-                if PhoneNumber.location == "Work"]
+                if PhoneNumber.location == WORK_LOCATION]
 
     def has_tag(self, tag_id):
         """Checks whether this Person has the tag with the ID `tag_id`."""
@@ -176,7 +260,7 @@ class UnitType(enum.Enum):
         else:
             raise ValueError("Unknown Unit Type")
 
-class WorkingUnit(_SerloEntity):
+class WorkingUnit(_HighriseEntity, _SerloEntity):
     """Model for a working unit."""
     # pylint: disable=too-few-public-methods
 
@@ -193,11 +277,19 @@ class WorkingUnit(_SerloEntity):
     storage_url = Column(String)
     slack_url = Column(String)
 
-    @property
+    @hybrid_property
     def title(self):
-        """Returns a descriptive title of the working unit."""
+        """Returns a descriptive title of the working unit. In queries it is
+        an SQL expression, so that units can be sorted and filtered by their
+        titles."""
         return self.unit_type.abbreviation + " - " + self.name
 
+    @title.expression
+    def title(cls): # pylint: disable=no-self-argument
+        """Returns the SQL expression of the title."""
+        return case([(cls.unit_type == x, x.abbreviation) for x in UnitType]) \
+               + " - " + cls.name
+
     @property
     def _properties(self):
         return (self.name, self.description, self.unit_type,
@@ -210,24 +302,207 @@ class WorkingUnit(_SerloEntity):
         and participants)."""
         return set([self.person_responsible] + self.participants)
 
+class ImportCheckpoint(_SerloEntity):
+    """Model of an imported page of the Highrise API. It stores the offset of
+    the page, the number of records on it and a hash of its content."""
+    # pylint: disable=too-few-public-methods
+
+    endpoint = Column(String)
+    offset = Column(Integer)
+    records = Column(Integer)
+    content_hash = Column(String)
+
+    @property
+    def _properties(self):
+        return (self.endpoint, self.offset, self.records, self.content_hash)
+
+class ImportRevision(_SerloEntity):
+    """Model of the revision of the stored entities. Every write of
+    `SerloDatabase` increases it, so that readers notice changes without
+    comparing the entities."""
+    # pylint: disable=too-few-public-methods
+
+    revision = Column(Integer, nullable=False)
+
+    @property
+    def _properties(self):
+        return (self.revision,)
+
+def engine_options(database):
+    """Returns the keyword arguments of `create_engine()` for the database
+    specification `database`. SQLite keeps the default pool of SQLAlchemy.
+    Server databases get a pool of `POOL_SIZE` connections (and up to
+    `MAX_OVERFLOW` more under load) which are checked before each use and
+    replaced after `POOL_RECYCLE` seconds.
+
+    >>> engine_options("sqlite:///serlo.db")
+    {}
+    >>> engine_options("postgresql://localhost/serlo")["pool_size"]
+    5
+    """
+    if make_url(database).get_backend_name() == "sqlite":
+        return dict()
+
+    return {"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW,
+            "pool_pre_ping": True, "pool_recycle": POOL_RECYCLE}
+
+def _csv_field(value):
+    """Returns `value` as field of the CSV format of PostgreSQL. `None` is
+    the unquoted empty field and all strings are quoted, so that `NULL` and
+    the empty string are told apart.
+
+    >>> [_csv_field(x) for x in [None, "", 'a "b" c', 42]]
+    ['', '""', '"a ""b"" c"', '42']
+    """
+    if value is None:
+        return ""
+
+    if isinstance(value, int):
+        return str(value)
+
+    return '"' + str(value).replace('"', '""') + '"'
+
+def copy_columns(table, rows):
+    """Returns the columns of `table` which have values in the list of
+    dictionaries `rows` (all rows have the same keys). The other columns are
+    left to their defaults, e.g. ids to their sequences."""
+    return [x for x in table.columns if x.name in rows[0]]
+
+def copy_statement(table, columns, dialect):
+    """Returns the PostgreSQL `COPY` statement loading CSV input (see
+    `copy_payload()`) into the `columns` of `table`. Identifiers are quoted
+    like by `dialect`."""
+    preparer = dialect.identifier_preparer
+    names = ", ".join(preparer.quote(x.name) for x in columns)
+
+    return f"COPY {preparer.format_table(table)} ({names}) FROM STDIN " \
+           "WITH (FORMAT csv)"
+
+def copy_payload(table, rows, dialect):
+    """Returns the list of dictionaries `rows` as CSV input of a PostgreSQL
+    `COPY` into the columns of `table` given by `copy_columns()`. The values
+    are converted like by a statement of `dialect`."""
+    columns = copy_columns(table, rows)
+    processors = [x.type.bind_processor(dialect) for x in columns]
+    output = io.StringIO()
+
+    for row in rows:
+        values = [row[x.name] for x in columns]
+        output.write(",".join(
+            _csv_field(value if processor is None or value is None
+                       else processor(value))
+            for value, processor in zip(values, processors)) + "\n")
+
+    output.seek(0)
+
+    return output
+
 class SerloDatabase(object):
     """Class for accessing the stored entities of Serlo and saving new
     entities."""
 
-    def __init__(self, database):
+    def __init__(self, database, profiler=None):
         """Initializes the object. The parameter `database` is a specification
-        of the database."""
+        of the database or an SQLAlchemy engine or connection to use. All
+        statements are recorded by the optional `profiler` (see
+        `serlo.profiler.QueryProfiler`)."""
+
+        self._engine = create_engine(database, **engine_options(database)) \
+                       if isinstance(database, str) else database
+
+        if profiler is not None:
+            profiler.attach(self._engine)
 
-        self._engine = create_engine(database)
         self._session = sessionmaker(bind=self._engine)()
 
         _SerloEntity.metadata.create_all(self._engine)
 
     def add_all(self, instances):
-        """Adds all entities of the iterator `iterator` to the database."""
+        """Adds all entities of the iterator `iterator` to the database and
+        increases the revision."""
         self._session.add_all(instances)
+        self._bump_revision()
+        self._session.commit()
+
+    def sync(self, inserts, deletes, commit=True):
+        """Adds the entities `inserts`, deletes the entities `deletes` and
+        writes them together with all changes of stored entities and an
+        increased revision. They are committed when `commit` is true and
+        only flushed otherwise."""
+        self._session.add_all(inserts)
+
+        for instance in deletes:
+            self._session.delete(instance)
+
+        self._bump_revision()
+
+        if commit:
+            self._session.commit()
+        else:
+            self._session.flush()
+
+    def expunge_all(self):
+        """Removes all loaded entities from the session so that they are no
+        longer referenced by it. Pending changes are discarded."""
+        self._session.expunge_all()
+
+    def person_ids(self):
+        """Returns a dictionary mapping the Highrise ids of all stored persons
+        onto their ids. No entities are loaded."""
+        return dict(self._session.query(Person.highrise_id, Person.id)
+                    .filter(Person.highrise_id.isnot(None)))
+
+    def commit(self):
+        """Commits all pending changes and releases the connection of the
+        current transaction."""
         self._session.commit()
 
+    def close(self):
+        """Closes the session and all connections to the database. Passed
+        connections are kept open."""
+        self._session.close()
+
+        if isinstance(self._engine, Engine):
+            self._engine.dispose()
+
+    def clear(self):
+        """Deletes all stored entities. The revision is kept and increased."""
+        self._session.close()
+
+        tables = [x for x in _SerloEntity.metadata.sorted_tables
+                  if x is not ImportRevision.__table__]
+
+        _SerloEntity.metadata.drop_all(self._engine, tables)
+        _SerloEntity.metadata.create_all(self._engine, tables)
+
+        self._bump_revision()
+        self._session.commit()
+
+    @property
+    def revision(self):
+        """Returns the revision of the stored entities (see `ImportRevision`).
+        It is read with a connection of its own, so that the writes committed
+        by other processes are seen outside of the current transaction."""
+        with self._engine.connect() as connection:
+            return connection.execute(
+                select([func.coalesce(func.max(ImportRevision.revision),
+                                      0)])).scalar()
+
+    def _bump_revision(self):
+        """Increases the revision of the stored entities within the current
+        transaction."""
+        table = ImportRevision.__table__
+        connection = self._session.connection()
+
+        if not connection.execute(table.update().values(
+                revision=table.c.revision + 1)).rowcount:
+            connection.execute(table.insert().values(revision=1))
+
+    @property
+    def checkpoints(self):
+        """Returns the checkpoints of all imported pages."""
+        return self._session.query(ImportCheckpoint)
+
     @property
     def persons(self):
         """Returns all stored persons."""
@@ -238,6 +513,164 @@ class SerloDatabase(object):
         """Returns all working units."""
         return self._session.query(WorkingUnit)
 
+    @property
+    def persons_with_work_contacts(self):
+        """Returns all stored persons with their work emails, work phone
+        numbers and tags (for their displayed names) loaded in one query
+        each. No other contacts are loaded."""
+        # pylint: disable=protected-access
+        return self.persons.options(selectinload(Person._work_emails),
+                                    selectinload(Person._work_phone_numbers),
+                                    selectinload(Person.tags))
+
+    @property
+    def persons_with_relations(self):
+        """Returns all stored persons with their work contacts, tags, mentees
+        and working units loaded in one query per relationship. Mentors are
+        resolved from the loaded persons without further queries."""
+        return self.persons_with_work_contacts.options(
+            selectinload(Person.mentees),
+            selectinload(Person.managing_units),
+            selectinload(Person.participating_units))
+
+    @property
+    def working_units_with_participants(self):
+        """Returns all working units with their participants loaded in one
+        query."""
+        return self.working_units.options(
+            selectinload(WorkingUnit.participants))
+
+    @property
+    def participations(self):
+        """Returns all pairs of the ids of a working unit and of one of its
+        participants. No entities are loaded."""
+        return self._session.query(
+            _WorkingUnitParticipants.c.working_unit_id,
+            _WorkingUnitParticipants.c.person_id)
+
+    def bulk_insert(self, table, rows):
+        """Inserts the list of dictionaries `rows` into the Core `table`
+        within the current transaction and increases the revision. Omitted
+        columns like the ids get their defaults, so that concurrent loads
+        never assign the same ids. PostgreSQL loads the rows with one
+        `COPY`, other databases insert them with one executemany
+        statement."""
+        if not rows:
+            return
+
+        connection = self._session.connection()
+        self._bump_revision()
+
+        if connection.dialect.name != "postgresql":
+            connection.execute(table.insert(), rows)
+            return
+
+        cursor = connection.connection.cursor()
+
+        try:
+            cursor.copy_expert(
+                copy_statement(table, copy_columns(table, rows),
+                               connection.dialect),
+                copy_payload(table, rows, connection.dialect))
+        finally:
+            cursor.close()
+
+    def bulk_update(self, table, rows):
+        """Updates the rows of the Core `table` with the ids and values of
+        the list of dictionaries `rows` (all rows have the same keys) within
+        the current transaction with one executemany statement and increases
+        the revision."""
+        if not rows:
+            return
+
+        names = [x for x in rows[0] if x != "id"]
+        statement = table.update() \
+                         .where(table.c.id == bindparam("_id")) \
+                         .values(dict((x, bindparam("_" + x)) for x in names))
+
+        self._session.connection().execute(
+            statement, [dict(("_" + key, value) for key, value in x.items())
+                        for x in rows])
+        self._bump_revision()
+
+    def ids_by_highrise_id(self, model, highrise_ids, chunk_size=500):
+        """Returns a dictionary mapping the Highrise ids `highrise_ids` onto
+        the ids of the stored entities of the class `model`. The ids are
+        queried in chunks of `chunk_size` Highrise ids and no entities are
+        loaded."""
+        highrise_ids = list(highrise_ids)
+        ids = dict()
+
+        for start in range(0, len(highrise_ids), chunk_size):
+            ids.update(self._session.query(model.highrise_id, model.id)
+                       .filter(model.highrise_id.in_(
+                           highrise_ids[start:start + chunk_size])))
+
+        return ids
+
+    def content_hashes(self, model):
+        """Returns the ids, the Highrise ids and the content hashes of all
+        stored entities of the class `model` as streamed tuples. No entities
+        are loaded."""
+        return self.streamed(self._session.query(
+            model.id, model.highrise_id, model.content_hash))
+
+    def max_id(self, model):
+        """Returns the largest stored id of the entities of the class `model`
+        or 0 when there is none."""
+        return self._session.query(func.max(model.id)).scalar() or 0
+
+    def streamed(self, query, batch_size=1000):
+        """Returns the ORM `query` loading its entities in batches of
+        `batch_size`. Databases supporting server-side cursors stream the
+        rows instead of buffering the whole result."""
+        return query.execution_options(stream_results=True) \
+                    .yield_per(batch_size)
+
+    def stream(self, statement, batch_size=1000):
+        """Executes the SQLAlchemy Core `statement` and yields its rows in
+        lists of at most `batch_size` rows. Databases supporting server-side
+        cursors stream the rows, so that the memory stays bounded."""
+        result = self._session.execute(
+            statement.execution_options(stream_results=True))
+
+        try:
+            while True:
+                rows = result.fetchmany(batch_size)
+
+                if not rows:
+                    break
+
+                yield rows
+        finally:
+            result.close()
+
+    def person_by_highrise_id(self, highrise_id):
+        """Returns the person with the Highrise id `highrise_id` or `None`
+        when there is no such person."""
+        return self.persons.filter_by(highrise_id=highrise_id).one_or_none()
+
+    def persons_by_highrise_ids(self, highrise_ids, chunk_size=500):
+        """Returns a dictionary mapping the Highrise ids `highrise_ids` onto
+        the stored persons. Unknown ids are skipped. The persons are queried
+        in chunks of `chunk_size` ids to stay below the limit of bound
+        parameters."""
+        highrise_ids = list(highrise_ids)
+        persons = dict()
+
+        for start in range(0, len(highrise_ids), chunk_size):
+            chunk = highrise_ids[start:start + chunk_size]
+            persons.update((x.highrise_id, x) for x in self.persons.filter(
+                Person.highrise_id.in_(chunk)))
+
+        return persons
+
+    def working_unit_by_highrise_id(self, highrise_id):
+        """Returns the working unit with the Highrise id `highrise_id` or
+        `None` when there is no such unit."""
+        return self.working_units.filter_by(highrise_id=highrise_id) \
+                                 .one_or_none()
+
     @property
     def projects(self):
         """Returns all active projects."""
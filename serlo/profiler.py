@@ -0,0 +1,187 @@
+"""Opt-in profiling of the SQL statements sent by a `SerloDatabase`. The
+statements are grouped by their fingerprint, in which all literals and
+lists of parameters are replaced by placeholders, so that a loop issuing
+the same query for every entity (an N+1 pattern) shows up as one statement
+with a high count."""
+
+import math
+import re
+import threading
+import time
+
+from sqlalchemy import event
+
+# Placeholders of the pyformat and format parameter styles (e.g. psycopg2)
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+_COLUMN_LISTS = re.compile(r"SELECT .+? FROM")
+
+def fingerprint(statement):
+    """Returns the normalized form of the SQL `statement`. Placeholders of
+    the pyformat and format parameter styles become `?` like in qmark.
+
+    >>> fingerprint("SELECT a FROM t1 WHERE id IN (?, ?, ?)\\n  AND b = 'x'")
+    'SELECT a FROM t1 WHERE id IN (?, ...) AND b = ?'
+    >>> fingerprint("SELECT a FROM t1 WHERE id IN (%(id_1_1)s, %(id_1_2)s) "
+    ...             "AND b = %(b_1)s")
+    'SELECT a FROM t1 WHERE id IN (?, ...) AND b = ?'
+    """
+    statement = _PLACEHOLDERS.sub("?", statement)
+    statement = _LITERALS.sub("?", statement)
+    statement = _PARAMETER_LISTS.sub("(?, ...)", statement)
+
+    return _SPACES.sub(" ", statement).strip()
+
+def abbreviate(statement):
+    """Returns `statement` with the column lists of all selects omitted.
+
+    >>> abbreviate("SELECT a.x AS a_x, a.y AS a_y FROM a WHERE a.x = ?")
+    'SELECT ... FROM a WHERE a.x = ?'
+    """
+    return _COLUMN_LISTS.sub("SELECT ... FROM", statement)
+
+def percentile(values, percent):
+    """Returns the `percent` percentile of the list `values` with the
+    nearest-rank method.
+
+    >>> percentile([5, 1, 4, 2, 3], 95)
+    5
+    >>> percentile([5, 1, 4, 2, 3], 50)
+    3
+    """
+    if not values:
+        return 0
+
+    return sorted(values)[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+class StatementStatistics(object):
+    """Statistics of all executions of the statements with one
+    fingerprint."""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, statement):
+        self.statement = statement
+        self.durations = []
+        self.rows = 0
+
+    @property
+    def count(self):
+        """Returns the number of executions."""
+        return len(self.durations)
+
+    @property
+    def total(self):
+        """Returns the total duration of all executions in seconds."""
+        return sum(self.durations)
+
+class _CountingCursor(object):
+    """Proxy of a DBAPI cursor which adds the number of fetched rows to the
+    statistics `statistics`."""
+
+    def __init__(self, cursor, statistics, lock):
+        self._cursor = cursor
+        self._statistics = statistics
+        self._lock = lock
+
+    def _count(self, rows):
+        with self._lock:
+            self._statistics.rows += len(rows)
+
+        return rows
+
+    def fetchone(self):
+        """Fetches the next row."""
+        row = self._cursor.fetchone()
+
+        return row if row is None else self._count([row])[0]
+
+    def fetchmany(self, *args):
+        """Fetches the next rows."""
+        return self._count(self._cursor.fetchmany(*args))
+
+    def fetchall(self):
+        """Fetches all remaining rows."""
+        return self._count(self._cursor.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class QueryProfiler(object):
+    """Profiler of the SQL statements of the engines it is attached to. It
+    records the number of executions, the durations and the number of
+    fetched or changed rows of all statements. It may be shared between
+    threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = dict()
+
+    def attach(self, engine):
+        """Records all statements executed by the SQLAlchemy `engine`."""
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, connection, *_):
+        """Notes the start time of a statement."""
+        connection.info.setdefault("query_start", []).append(
+            time.perf_counter())
+
+    def _after_execute(self, connection, cursor, statement, parameters,
+                       context, executemany):
+        """Records a statement after its execution."""
+        # pylint: disable=too-many-arguments,unused-argument
+        duration = time.perf_counter() - connection.info["query_start"].pop()
+        key = fingerprint(statement)
+
+        with self._lock:
+            statistics = self._statements.get(key)
+
+            if statistics is None:
+                statistics = StatementStatistics(key)
+                self._statements[key] = statistics
+
+            statistics.durations.append(duration)
+
+            if cursor.description is None:
+                statistics.rows += max(cursor.rowcount, 0)
+
+        if cursor.description is not None and context is not None:
+            context.cursor = _CountingCursor(cursor, statistics, self._lock)
+
+    @property
+    def statements(self):
+        """Returns the statistics of all recorded statements ordered by
+        their total duration."""
+        with self._lock:
+            return sorted(self._statements.values(),
+                          key=lambda x: x.total, reverse=True)
+
+    def reset(self):
+        """Discards all recorded statements."""
+        with self._lock:
+            self._statements.clear()
+
+    def summary(self, limit=10):
+        """Returns a readable summary of the total number and duration of
+        all statements and of the `limit` statements with the highest total
+        duration. The column lists of the statements are omitted."""
+        statements = self.statements
+        durations = [x for y in statements for x in y.durations]
+
+        lines = ["Queries: {} statements ({} distinct), {:.1f} ms total, "
+                 "{:.2f} ms p95, {} rows".format(
+                     len(durations), len(statements), sum(durations) * 1000,
+                     percentile(durations, 95) * 1000,
+                     sum(x.rows for x in statements)),
+                 "{:>7} {:>10} {:>9} {:>8}  {}".format(
+                     "Count", "Total ms", "p95 ms", "Rows", "Statement")]
+
+        for statistics in statements[:limit]:
+            lines.append("{:>7} {:>10.1f} {:>9.2f} {:>8}  {}".format(
+                statistics.count, statistics.total * 1000,
+                percentile(statistics.durations, 95) * 1000,
+                statistics.rows, abbreviate(statistics.statement)))
+
+        return "\n".join(lines)
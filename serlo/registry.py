@@ -0,0 +1,96 @@
+"""Registry of the ids used by a Highrise account."""
+
+import functools
+import hashlib
+import json
+import os
+
+from serlo.lazy import lazy_import
+
+model = lazy_import("serlo.model")
+
+MENTORING = "mentoring"
+
+# Attributes of `WorkingUnit` which may be read from custom fields
+SUBJECT_ATTRIBUTES = ["overview_document", "storage_url", "slack_url"]
+
+DEFAULT_REGISTRY_FILE = os.path.join(os.path.dirname(__file__),
+                                     "registry.json")
+
+class Registry(object):
+    """Maps the ids of categories, custom fields and tags of a Highrise
+    account onto the entities of Serlo. The specification is compiled into
+    dictionaries which are used for dispatching while parsing."""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, spec):
+        """Compiles the registry specification `spec`. It is a dictionary
+        with the following keys:
+
+        - `member_tag`: id of the tag of all team members
+        - `categories`: maps deal category ids onto the name of a `UnitType`
+          or onto `"mentoring"` for mentoring deals
+        - `subject_fields`: maps custom field ids onto attributes of
+          `WorkingUnit` (one of `SUBJECT_ATTRIBUTES`)
+        - `tags` (optional): maps displayed tag names onto a tag id or a
+          list of tag ids (by default `Tag.TAGS`)
+
+        >>> registry = Registry({"member_tag": 1,
+        ...                      "categories": {"2": "project",
+        ...                                     "3": "mentoring"},
+        ...                      "subject_fields": {"4": "slack_url"}})
+        >>> registry.unit_types
+        {'2': <UnitType.project: 1>}
+        >>> registry.mentoring_categories
+        {'3'}
+        >>> registry.subject_fields
+        {'4': 'slack_url'}
+        >>> Registry({"member_tag": 1, "tags": {"Pause": 5}}).tags
+        {'Pause': [5]}
+        """
+        self.member_tag = str(spec["member_tag"])
+        self.unit_types = dict()
+        self.mentoring_categories = set()
+        self.subject_fields = dict()
+        self.tags = dict(
+            (name, [int(x) for x in
+                    (tag_ids if isinstance(tag_ids, list) else [tag_ids])])
+            for name, tag_ids in spec.get("tags", model.Tag.TAGS).items())
+
+        for category_id, name in spec.get("categories", {}).items():
+            if name == MENTORING:
+                self.mentoring_categories.add(str(category_id))
+            elif name in model.UnitType.__members__:
+                self.unit_types[str(category_id)] = model.UnitType[name]
+            else:
+                raise ValueError(f"Unknown category `{name}`")
+
+        for field_id, attribute in spec.get("subject_fields", {}).items():
+            if attribute not in SUBJECT_ATTRIBUTES:
+                raise ValueError(f"Unknown attribute `{attribute}`")
+
+            self.subject_fields[str(field_id)] = attribute
+
+    @property
+    def fingerprint(self):
+        """Returns a hash of all ids which influence the parsing of Highrise
+        data. The displayed tags are not included."""
+        spec = [self.member_tag,
+                sorted((key, value.name)
+                       for key, value in self.unit_types.items()),
+                sorted(self.mentoring_categories),
+                sorted(self.subject_fields.items())]
+
+        return hashlib.sha256(json.dumps(spec).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def load(cls, path):
+        """Loads the registry stored as JSON file under `path`."""
+        with open(path, encoding="utf-8") as registry_file:
+            return cls(json.load(registry_file))
+
+@functools.lru_cache(maxsize=None)
+def default_registry():
+    """Returns the registry of the Serlo account. It is loaded on the first
+    call so that importing this module does not load the ORM."""
+    return Registry.load(DEFAULT_REGISTRY_FILE)
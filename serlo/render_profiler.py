@@ -0,0 +1,96 @@
+"""Profiling of the render of the report. While instrumented, every call of a
+Jinja macro (including `caller` blocks) and every access of the profiled
+properties of the models is timed, so that the time of a render can be
+attributed to the macros of the template and to the computed properties."""
+
+import collections
+import contextlib
+import functools
+import time
+
+from jinja2.runtime import Macro
+from sqlalchemy.ext.hybrid import hybrid_property
+
+from serlo.model import Person, WorkingUnit
+
+DEFAULT_PROPERTIES = [(Person, "name"), (Person, "work_emails"),
+                      (Person, "work_phone_numbers"),
+                      (WorkingUnit, "members"), (WorkingUnit, "title")]
+
+class RenderProfiler(object):
+    """Profiler of macro calls and property accesses. `properties` is a list
+    of pairs of a class and the name of one of its properties. The profiler
+    is not thread-safe and is meant for one render at a time."""
+
+    def __init__(self, properties=None):
+        self.properties = DEFAULT_PROPERTIES if properties is None \
+                          else properties
+        self.calls = collections.Counter()
+        self.cumulative = collections.Counter()
+        self.own = collections.Counter()
+        self._stack = []
+
+    def _call(self, name, function, *args, **kwargs):
+        """Calls `function` with `args` and `kwargs` and records the call
+        under `name`. The time spent in nested recorded calls is not added
+        to the own time of `name`."""
+        self._stack.append(0.0)
+        start = time.perf_counter()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            nested = self._stack.pop()
+
+            if self._stack:
+                self._stack[-1] += duration
+
+            self.calls[name] += 1
+            self.cumulative[name] += duration
+            self.own[name] += duration - nested
+
+    @contextlib.contextmanager
+    def instrument(self):
+        """Context manager which records all macro calls and accesses of the
+        profiled properties within its block. Blocks of `call` tags are
+        recorded as macro `caller`. Only the accesses on instances are
+        recorded, so that hybrid properties can still be used in queries."""
+        macro_call = Macro.__call__
+        originals = [(cls, name, cls.__dict__[name])
+                     for cls, name in self.properties]
+
+        def call(macro, *args, **kwargs):
+            return self._call("macro " + (macro.name or "caller"),
+                              macro_call, macro, *args, **kwargs)
+
+        Macro.__call__ = call
+
+        for cls, name, prop in originals:
+            fget = functools.update_wrapper(functools.partial(
+                self._call, f"{cls.__name__}.{name}", prop.fget), prop.fget)
+
+            # Hybrid properties keep their SQL expression
+            setattr(cls, name, prop.getter(fget)
+                    if isinstance(prop, hybrid_property) else property(fget))
+
+        try:
+            yield self
+        finally:
+            Macro.__call__ = macro_call
+
+            for cls, name, prop in originals:
+                setattr(cls, name, prop)
+
+    def summary(self, limit=20):
+        """Returns a readable table of the `limit` macros and properties with
+        the highest cumulative time."""
+        lines = ["{:>7} {:>10} {:>9}  {}".format("Calls", "Cumul. ms",
+                                                 "Own ms", "Name")]
+
+        for name, cumulative in self.cumulative.most_common(limit):
+            lines.append("{:>7} {:>10.1f} {:>9.1f}  {}".format(
+                self.calls[name], cumulative * 1000, self.own[name] * 1000,
+                name))
+
+        return "\n".join(lines)
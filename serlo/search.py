@@ -0,0 +1,103 @@
+"""Static search index of the report. The index is an inverted index from
+tokens onto documents (persons and working units). It is split into shards
+by the prefix of the tokens and the documents are split into chunks so that
+a client only loads the parts of the index needed for its query."""
+
+import json
+import os
+import re
+
+PREFIX_LENGTH = 2
+CHUNK_SIZE = 500
+META_FILE = "meta.json"
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text):
+    """Returns the list of all search tokens in `text`.
+
+    >>> tokenize("Markus Müller <hello@example.org>")
+    ['markus', 'müller', 'hello', 'example', 'org']
+    >>> tokenize(None)
+    []
+    """
+    return _TOKEN.findall(text.lower()) if text else []
+
+def shard_key(token):
+    """Returns the key of the shard containing `token`. The key is the hex
+    encoded prefix of the token so that it can be used as file name.
+
+    >>> shard_key("müller")
+    '6dc3bc'
+    """
+    return token[:PREFIX_LENGTH].encode("utf-8").hex()
+
+def shard_file(key):
+    """Returns the file name of the shard `key`."""
+    return f"shard-{key}.json"
+
+def chunk_file(number):
+    """Returns the file name of the document chunk `number`."""
+    return f"docs-{number}.json"
+
+def iter_documents(database, tags=None):
+    """Yields all searchable documents of `database` as tuples of the anchor
+    in the report, the displayed label and the searchable texts. Persons are
+    labeled with the displayed `tags` (see `Person.tagged_name()`) and are
+    found by their work emails, the only ones shown in the report."""
+    for person in database.streamed(database.persons_with_work_contacts):
+        name = person.tagged_name(tags)
+
+        yield (f"#{person.stable_id}", name,
+               [name] + [x.address for x in person.work_emails])
+
+    for unit in database.streamed(database.working_units):
+        yield (f"#unit{unit.stable_id}", unit.title,
+               [unit.title, unit.description])
+
+def build_search_index(database, tags=None):
+    """Returns the search index of `database` as a tuple of the metadata, the
+    shards and the document chunks. Shards are dictionaries from shard keys
+    onto dictionaries mapping each token onto the sorted list of the numbers
+    of the documents containing it. A document with number `n` is the entry
+    `n % CHUNK_SIZE` of the chunk `n // CHUNK_SIZE` and is stored as list of
+    its anchor and label. Persons are labeled with the displayed `tags`."""
+    shards = dict()
+    docs = []
+
+    documents = iter_documents(database, tags)
+
+    for number, (anchor, label, texts) in enumerate(documents):
+        docs.append([anchor, label])
+
+        for token in set(token for x in texts for token in tokenize(x)):
+            shards.setdefault(shard_key(token), {}) \
+                  .setdefault(token, []).append(number)
+
+    chunks = [docs[i:i + CHUNK_SIZE] for i in range(0, len(docs), CHUNK_SIZE)]
+    meta = {"prefix_length": PREFIX_LENGTH, "chunk_size": CHUNK_SIZE,
+            "shards": sorted(shards)}
+
+    return (meta, shards, chunks)
+
+def write_search_index(database, directory, tags=None):
+    """Writes the search index of `database` into `directory` which is created
+    if necessary. Files of an older index are replaced. Persons are labeled
+    with the displayed `tags`."""
+    meta, shards, chunks = build_search_index(database, tags)
+
+    os.makedirs(directory, exist_ok=True)
+
+    for name in os.listdir(directory):
+        if name.startswith(("shard-", "docs-")):
+            os.remove(os.path.join(directory, name))
+
+    files = [(META_FILE, meta)]
+    files += [(shard_file(key), shard) for key, shard in shards.items()]
+    files += [(chunk_file(i), chunk) for i, chunk in enumerate(chunks)]
+
+    for name, content in files:
+        with open(os.path.join(directory, name), "w",
+                  encoding="utf-8") as index_file:
+            json.dump(content, index_file, ensure_ascii=False,
+                      separators=(",", ":"), sort_keys=True)
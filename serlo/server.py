@@ -0,0 +1,63 @@
+"""HTTP request handler of the server mode of the report."""
+
+from http.server import SimpleHTTPRequestHandler
+
+class ReportHandler(SimpleHTTPRequestHandler):
+    """Request handler of the server mode. The report is served under `/`
+    from `cache` (see `ReportCache` of `create_team_report.py`) and all
+    other files (assets, data feed and search index) from `directory`."""
+
+    REPORT_PATHS = ("/", "/index.html")
+
+    def __init__(self, *args, cache, **kwargs):
+        self.cache = cache
+
+        super().__init__(*args, **kwargs)
+
+    def _accepts(self, header, value):
+        """Returns whether the list in the request header `header` contains
+        `value`."""
+        return value in [x.split(";")[0].strip()
+                         for x in self.headers.get(header, "").split(",")]
+
+    def _send_report(self, with_body):
+        """Sends the cached report."""
+        etag, content, compressed = self.cache.get()
+
+        if self._accepts("If-None-Match", etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        use_gzip = self._accepts("Accept-Encoding", "gzip")
+        body = compressed if use_gzip else content
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+
+        self.end_headers()
+
+        if with_body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        """Serves a GET request."""
+        if self.path.split("?")[0] in self.REPORT_PATHS:
+            self._send_report(with_body=True)
+        else:
+            super().do_GET()
+
+    def do_HEAD(self):
+        """Serves a HEAD request."""
+        if self.path.split("?")[0] in self.REPORT_PATHS:
+            self._send_report(with_body=False)
+        else:
+            super().do_HEAD()
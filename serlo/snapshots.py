@@ -0,0 +1,177 @@
+"""Compact binary cache of parsed Highrise data. The snapshots of persons and
+working units (see `serlo.diff`) and the records rejected while parsing
+them (see `serlo.validation`) are stored with `struct` in a file which
+starts with a table of all distinct strings; values refer to strings by
+their index. Files are named after a hash of the source payload so that an
+unchanged payload is loaded without parsing any XML."""
+
+import os
+import struct
+
+MAGIC = b"SRLS"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sHI")
+_UINT = struct.Struct("<I")
+_INT = struct.Struct("<q")
+
+_NONE, _STR, _INT_TAG, _LIST, _DICT = b"N", b"S", b"I", b"L", b"D"
+
+def _collect_strings(value, strings):
+    """Adds all strings of `value` to the dictionary `strings` which maps
+    them onto their indices."""
+    if isinstance(value, str):
+        strings.setdefault(value, len(strings))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            strings.setdefault(key, len(strings))
+            _collect_strings(item, strings)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_strings(item, strings)
+
+def _encode_value(value, strings, out):
+    """Appends the encoding of `value` to the list of byte strings `out`."""
+    if value is None:
+        out.append(_NONE)
+    elif isinstance(value, str):
+        out += [_STR, _UINT.pack(strings[value])]
+    elif isinstance(value, int):
+        out += [_INT_TAG, _INT.pack(value)]
+    elif isinstance(value, dict):
+        out += [_DICT, _UINT.pack(len(value))]
+
+        for key, item in value.items():
+            out.append(_UINT.pack(strings[key]))
+            _encode_value(item, strings, out)
+    elif isinstance(value, (list, tuple)):
+        out += [_LIST, _UINT.pack(len(value))]
+
+        for item in value:
+            _encode_value(item, strings, out)
+    else:
+        raise TypeError(f"Can't encode value of type {type(value).__name__}")
+
+def _decode_value(data, offset, strings):
+    """Decodes the value at `offset` of `data`. It returns the value and the
+    offset after it."""
+    tag = data[offset:offset + 1]
+    offset += 1
+
+    if tag == _NONE:
+        return (None, offset)
+    elif tag == _STR:
+        return (strings[_UINT.unpack_from(data, offset)[0]],
+                offset + _UINT.size)
+    elif tag == _INT_TAG:
+        return (_INT.unpack_from(data, offset)[0], offset + _INT.size)
+
+    count = _UINT.unpack_from(data, offset)[0]
+    offset += _UINT.size
+
+    if tag == _LIST:
+        result = []
+
+        for _ in range(count):
+            item, offset = _decode_value(data, offset, strings)
+            result.append(item)
+    elif tag == _DICT:
+        result = dict()
+
+        for _ in range(count):
+            key = strings[_UINT.unpack_from(data, offset)[0]]
+            result[key], offset = _decode_value(data, offset + _UINT.size,
+                                                strings)
+    else:
+        raise ValueError(f"Unknown tag {tag!r} at offset {offset - 1}")
+
+    return (result, offset)
+
+def encode_snapshots(persons, units, rejections=()):
+    """Returns the binary encoding of the dictionaries `persons` and `units`
+    which map Highrise ids onto snapshots and of the list of `rejections`
+    (tuples of strings, integers and lists of strings).
+
+    >>> data = encode_snapshots({"1": {"tags": [5], "mentor": None}}, {})
+    >>> decode_snapshots(data)
+    ({'1': {'tags': [5], 'mentor': None}}, {}, [])
+    """
+    value = [persons, units, [list(x) for x in rejections]]
+    strings = dict()
+    _collect_strings(value, strings)
+
+    out = [_HEADER.pack(MAGIC, VERSION, len(strings))]
+
+    for string in strings:
+        encoded = string.encode("utf-8")
+        out += [_UINT.pack(len(encoded)), encoded]
+
+    _encode_value(value, strings, out)
+
+    return b"".join(out)
+
+def decode_snapshots(data):
+    """Returns the dictionaries of persons and units and the list of
+    rejections (as lists) encoded in `data` by `encode_snapshots()`. A
+    `ValueError` is raised for invalid data."""
+    try:
+        magic, version, count = _HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("Snapshot data is truncated") from None
+
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unsupported snapshot format")
+
+    data = memoryview(data)
+    offset = _HEADER.size
+    strings = []
+
+    try:
+        for _ in range(count):
+            length = _UINT.unpack_from(data, offset)[0]
+            offset += _UINT.size
+            strings.append(str(data[offset:offset + length], "utf-8"))
+            offset += length
+
+        (persons, units, rejections), offset = _decode_value(data, offset,
+                                                             strings)
+    except (struct.error, IndexError, UnicodeDecodeError):
+        raise ValueError("Snapshot data is corrupted") from None
+
+    if offset != len(data):
+        raise ValueError("Snapshot data has trailing bytes")
+
+    return (persons, units, rejections)
+
+class SnapshotCache(object):
+    """Cache of encoded snapshots in the directory `directory`. Entries are
+    stored in files named after their key."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        """Returns the path of the entry `key`."""
+        return os.path.join(self.directory, key + ".bin")
+
+    def get(self, key):
+        """Returns the snapshots of persons and units and the rejections
+        stored under `key` (see `decode_snapshots()`). `None` is returned
+        for missing or corrupted entries."""
+        try:
+            with open(self._path(key), "rb") as cache_file:
+                return decode_snapshots(cache_file.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, persons, units, rejections=()):
+        """Stores the snapshots of `persons` and `units` and the list of
+        `rejections` under `key`."""
+        path = self._path(key)
+
+        with open(path + ".tmp", "wb") as cache_file:
+            cache_file.write(encode_snapshots(persons, units, rejections))
+
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,223 @@
+"""Validation of the XML records of the Highrise API. Records are parsed
+optimistically; only a record whose parsing fails is validated completely,
+so that all of its problems are reported at once while valid records cost
+no additional checks. The malformed records of a page are either reported
+together in one `ValidationError` or put into a `Quarantine`, so that the
+remaining records of the import can still be imported."""
+
+import collections
+import json
+import xml.etree.ElementTree as ET
+
+Rejection = collections.namedtuple( # pylint: disable=invalid-name
+    "Rejection", ["endpoint", "position", "highrise_id", "problems",
+                  "source"])
+
+class ValidationError(ValueError):
+    """Error of malformed XML. When the error reports the malformed records
+    of a page, they are listed in `rejections` (see `Rejection`)."""
+
+    def __init__(self, message, rejections=()):
+        super().__init__(message)
+        self.rejections = list(rejections)
+
+def _text(xml):
+    """Returns the inner text of the XML element `xml`."""
+    return "".join(xml.itertext())
+
+def record_id(xml):
+    """Returns the Highrise id of the record `xml` or `None` when it has no
+    id.
+
+    >>> record_id(ET.fromstring("<person><id>42</id></person>"))
+    '42'
+    >>> record_id(ET.fromstring("<person/>")) is None
+    True
+    """
+    element = xml.find("id")
+
+    return None if element is None else _text(element)
+
+def describe(rejection):
+    """Returns a readable description of the problems of `rejection`."""
+    record = rejection.highrise_id or f"#{rejection.position}"
+    prefix = f"{rejection.endpoint} {record}: "
+
+    return "\n".join(prefix + x for x in rejection.problems)
+
+def child_problems(xml, paths, prefix=""):
+    """Returns the problems of the XML element `xml` for all `paths` which
+    do not match exactly one element. Every problem starts with `prefix`.
+
+    >>> child_problems(ET.fromstring("<a><b/><b/></a>"), ["b", "c"])
+    ['`b` occurs 2 times', '`c` is missing']
+    """
+    problems = []
+
+    for path in paths:
+        count = len(xml.findall(path))
+
+        if count == 0:
+            problems.append(f"{prefix}`{path}` is missing")
+        elif count > 1:
+            problems.append(f"{prefix}`{path}` occurs {count} times")
+
+    return problems
+
+def item_problems(xml, path, paths, items="*"):
+    """Returns the problems (see `child_problems()`) of all items `items` of
+    the list `path` of `xml`. Lists which are missing are skipped.
+
+    >>> item_problems(ET.fromstring("<a><l><i><x/></i><i/></l></a>"),
+    ...               "l", ["x"])
+    ['l/i[2]: `x` is missing']
+    """
+    problems = []
+
+    for parent in xml.findall(path)[:1]:
+        for number, item in enumerate(parent.iterfind(items), 1):
+            problems += child_problems(item, paths,
+                                       f"{path}/{item.tag}[{number}]: ")
+
+    return problems
+
+def integer_problems(xml, path):
+    """Returns the problems of all elements `path` of `xml` whose text is no
+    integer.
+
+    >>> integer_problems(ET.fromstring("<a><t><id>x</id></t></a>"), "t/id")
+    ["`t/id` is no integer: 'x'"]
+    """
+    problems = []
+
+    for element in xml.iterfind(path):
+        try:
+            int(_text(element))
+        except ValueError:
+            problems.append(f"`{path}` is no integer: {_text(element)!r}")
+
+    return problems
+
+def person_problems(xml):
+    """Returns all problems of the person record `xml` of the endpoint
+    `people`."""
+    return (child_problems(xml, ["id", "first-name", "last-name",
+                                 "contact-data",
+                                 "contact-data/email-addresses",
+                                 "contact-data/phone-numbers", "tags"]) +
+            item_problems(xml, "contact-data/email-addresses",
+                          ["address", "location"]) +
+            item_problems(xml, "contact-data/phone-numbers",
+                          ["number", "location"]) +
+            item_problems(xml, "tags", ["id"]) +
+            integer_problems(xml, "tags/*/id"))
+
+def deal_problems(xml, registry):
+    """Returns all problems of the deal record `xml` of the endpoint `deals`.
+    Only the elements which are decoded for the category of the deal in
+    `registry` are checked."""
+    problems = child_problems(xml, ["category-id"])
+
+    if problems:
+        return problems
+
+    category_id = _text(xml.find("category-id"))
+    parties = child_problems(xml, ["party-id", "parties"]) + \
+              item_problems(xml, "parties", ["id"])
+
+    if category_id in registry.mentoring_categories:
+        return parties
+
+    if category_id not in registry.unit_types:
+        return []
+
+    problems = child_problems(xml, ["status"])
+
+    if problems or _text(xml.find("status")) != "pending":
+        return problems
+
+    problems = child_problems(xml, ["id", "name", "background"]) + parties
+
+    for number, field in enumerate(xml.iterfind("subject_datas/subject_data"),
+                                   1):
+        prefix = f"subject_datas/subject_data[{number}]: "
+        field_problems = child_problems(field, ["subject_field_id"], prefix)
+
+        if not field_problems and _text(field.find("subject_field_id")) \
+                in registry.subject_fields:
+            field_problems = child_problems(field, ["value"], prefix)
+
+        problems += field_problems
+
+    return problems
+
+def screen(elements, parse, validate, endpoint, quarantine=None):
+    """Parses all XML records `elements` of `endpoint` with the function
+    `parse` and returns the list of the results. When `parse` fails with a
+    `ValueError`, the record is validated with `validate` which shall return
+    the list of all its problems. All malformed records of `elements` are
+    put into `quarantine` and skipped. Without a quarantine a
+    `ValidationError` with all of them is raised after the last record."""
+    results = []
+    rejections = []
+
+    for position, element in enumerate(elements):
+        try:
+            results.append(parse(element))
+        except ValueError as error:
+            rejections.append(Rejection(
+                endpoint, position, record_id(element),
+                validate(element) or [str(error)],
+                ET.tostring(element, encoding="unicode")))
+
+    reject(rejections, quarantine)
+
+    return results
+
+def reject(rejections, quarantine=None):
+    """Puts the list `rejections` into `quarantine`. Without a quarantine a
+    `ValidationError` listing all of them is raised.
+
+    >>> reject([])
+    >>> reject([Rejection("people", 0, None, ["`id` is missing"], "")])
+    Traceback (most recent call last):
+    ...
+    serlo.validation.ValidationError: 1 malformed records of `people`:
+    people #0: `id` is missing
+    """
+    if rejections and quarantine is None:
+        endpoints = ", ".join(f"`{x}`" for x in
+                              dict.fromkeys(x.endpoint for x in rejections))
+
+        raise ValidationError(
+            f"{len(rejections)} malformed records of {endpoints}:\n" +
+            "\n".join(describe(x) for x in rejections), rejections)
+
+    if rejections:
+        quarantine.extend(rejections)
+
+class Quarantine(object):
+    """Collection of the records which were rejected during an import (see
+    `Rejection`)."""
+
+    def __init__(self):
+        self.rejections = []
+
+    def __len__(self):
+        return len(self.rejections)
+
+    def extend(self, rejections):
+        """Adds the list `rejections` to the quarantine."""
+        self.rejections.extend(rejections)
+
+    def summary(self):
+        """Returns a readable report of all rejected records."""
+        return "\n".join([f"Quarantined records: {len(self)}"] +
+                         [describe(x) for x in self.rejections])
+
+    def save(self, path):
+        """Writes all rejected records with their problems and their XML
+        source into the JSON file `path`."""
+        with open(path, "w", encoding="utf-8") as quarantine_file:
+            json.dump([x._asdict() for x in self.rejections],
+                      quarantine_file, indent=2, ensure_ascii=False)
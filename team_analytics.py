@@ -0,0 +1,44 @@
+"""Script for analyzing the mentoring relationships and unit memberships of
+the team. The result is printed as JSON."""
+
+import argparse
+import json
+import sys
+
+from serlo.lazy import lazy_import
+
+analytics = lazy_import("serlo.analytics")
+model = lazy_import("serlo.model")
+
+def parse_arguments(args):
+    """Parses the command line arguments `args` of this script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("database", help="specification of the database")
+    parser.add_argument("--indent", type=int,
+                        help="indent the JSON output by this many spaces")
+    parser.add_argument("--output",
+                        help="write the JSON output to this file instead of "
+                             "the standard output")
+
+    return parser.parse_args(args)
+
+def run_script(args):
+    """Main function of the script."""
+    arguments = parse_arguments(args)
+    database = model.SerloDatabase(arguments.database)
+
+    try:
+        result = analytics.analyze(analytics.build_graph(database))
+    finally:
+        database.close()
+
+    content = json.dumps(result, indent=arguments.indent, ensure_ascii=False)
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output_file:
+            output_file.write(content + "\n")
+    else:
+        print(content)
+
+if __name__ == "__main__":
+    run_script(sys.argv[1:])
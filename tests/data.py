@@ -449,7 +449,7 @@ def generate_working_unit_specs():
                  <currency>USD</currency>
                  <duration type="integer">1</duration>
                  <group-id type="integer" nil="true"></group-id>
-                 <id type="integer">789</id>
+                 <id type="integer">790</id>
                  <name>Another support unit</name>
                  <owner-id type="integer" nil="true"></owner-id>
                  <party-id type="integer">{id3}</party-id>
@@ -0,0 +1,97 @@
+"""Shared fixtures of the testsuite. All tests of a process share one
+in-memory SQLite database whose schema is created once. Every test of a
+`DatabaseTestCase` runs in a transaction which is rolled back afterwards,
+while commits of the tested code only release a SAVEPOINT. The suite can
+therefore also run in parallel processes (see `make test-parallel`)."""
+
+import functools
+import os
+import xml.etree.ElementTree as ET
+
+from copy import deepcopy
+from unittest import TestCase
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+from serlo.model import SerloDatabase
+from tests.data import generate_mentoring_spec, generate_people_specs, \
+                       generate_working_unit_list_spec
+
+# Environment variable with the URL of a disposable PostgreSQL database (for
+# example of a local container) for the tests of the PostgreSQL backend
+POSTGRES_VARIABLE = "SERLO_TEST_POSTGRES"
+POSTGRES_URL = os.environ.get(POSTGRES_VARIABLE)
+
+@functools.lru_cache(maxsize=None)
+def shared_engine():
+    """Returns the engine of the in-memory database shared by all tests of
+    this process. The transaction handling of `sqlite3` is disabled so that
+    SAVEPOINTs work (see the SQLAlchemy documentation of the pysqlite
+    dialect)."""
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def disable_transactions(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        connection.execute("BEGIN")
+
+    SerloDatabase(engine)
+
+    return engine
+
+@functools.lru_cache(maxsize=None)
+def _parse(spec):
+    """Returns the parsed XML `spec`."""
+    return ET.fromstring(spec)
+
+def xml_fixture(spec):
+    """Returns a copy of the parsed XML `spec`. Every spec is parsed only
+    once per process."""
+    return deepcopy(_parse(spec))
+
+@functools.lru_cache(maxsize=None)
+def highrise_responses():
+    """Returns the responses of the Highrise API for the endpoints `people`
+    and `deals` with all test persons, working units and mentorings."""
+    deals = ET.fromstring(generate_working_unit_list_spec())
+    deals.extend(ET.fromstring(generate_mentoring_spec()))
+
+    return {"people": generate_people_specs()[0],
+            "deals": ET.tostring(deals, encoding="unicode")}
+
+class DatabaseTestCase(TestCase):
+    """Base class of testcases using `self.database`, a `SerloDatabase` of
+    the shared in-memory database. All changes of a test are rolled back."""
+
+    def setUp(self):
+        self._connection = shared_engine().connect()
+        self._transaction = self._connection.begin()
+        self.database = SerloDatabase(self._connection)
+        # pylint: disable=protected-access
+        self._session = self.database._session
+
+        self._session.begin_nested()
+        event.listen(self._session, "after_transaction_end",
+                     self._restart_savepoint)
+
+    @staticmethod
+    def _restart_savepoint(session, transaction):
+        """Starts a new SAVEPOINT whenever the tested code ended one."""
+        # pylint: disable=protected-access
+        if transaction.nested and not transaction._parent.nested:
+            session.expire_all()
+            session.begin_nested()
+
+    def tearDown(self):
+        event.remove(self._session, "after_transaction_end",
+                     self._restart_savepoint)
+
+        self._session.rollback()
+        self.database.close()
+        self._transaction.rollback()
+        self._connection.close()
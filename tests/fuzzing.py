@@ -0,0 +1,151 @@
+"""Generator of random Highrise-shaped XML for fuzzing the parsers of
+`highrise_importer.py`. Every generated element comes with the values the
+parsers are expected to extract from it. All randomness is drawn from a
+seeded `random.Random`, so every failure is reproduced by its seed."""
+
+import time
+import xml.etree.ElementTree as ET
+
+from serlo.registry import Registry
+
+ALPHABET = "abcXYZ019 -_.@+&<>\"'äöüßéñ中文😀"
+
+REGISTRY = Registry({"member_tag": 1,
+                     "categories": {"20": "project", "30": "support_unit",
+                                    "40": "mentoring"},
+                     "subject_fields": {"101": "slack_url",
+                                        "102": "overview_document",
+                                        "103": "storage_url"}})
+
+def random_text(rng, max_length=12):
+    """Returns a random string of at most `max_length` characters with
+    characters which need escaping in XML."""
+    return "".join(rng.choice(ALPHABET)
+                   for _ in range(rng.randint(0, max_length)))
+
+def text_element(rng, parent, tag, depth=0):
+    """Appends an element `tag` to `parent` whose random text is split over
+    `depth` levels of nested children. The full text is returned."""
+    element = ET.SubElement(parent, tag)
+    texts = []
+    tails = []
+
+    for level in range(depth + 1):
+        element.text = random_text(rng)
+        texts.append(element.text)
+
+        if level < depth:
+            element = ET.SubElement(element, "span")
+            element.tail = random_text(rng)
+            tails.append(element.tail)
+
+    return "".join(texts) + "".join(reversed(tails))
+
+def id_element(parent, tag, value):
+    """Appends an integer element `tag` with the value `value` to
+    `parent`."""
+    ET.SubElement(parent, tag, type="integer").text = str(value)
+
+def person_element(rng, parent, highrise_id, depth=0, contacts=3):
+    """Appends a random person with the id `highrise_id` to `parent`. The
+    names are nested `depth` levels deep and there are up to `contacts`
+    emails, phone numbers and tags. It returns the expected values of the
+    person."""
+    person = ET.SubElement(parent, "person")
+    id_element(person, "id", highrise_id)
+    ET.SubElement(person, "background").text = random_text(rng)
+    expected = {"highrise_id": str(highrise_id),
+                "first_name": text_element(rng, person, "first-name", depth),
+                "last_name": text_element(rng, person, "last-name", depth),
+                "emails": [], "phone_numbers": [], "tags": []}
+
+    contact_data = ET.SubElement(person, "contact-data")
+    emails = ET.SubElement(contact_data, "email-addresses", type="array")
+    numbers = ET.SubElement(contact_data, "phone-numbers", type="array")
+    tags = ET.SubElement(person, "tags", type="array")
+
+    for _ in range(rng.randint(0, contacts)):
+        email = ET.SubElement(emails, "email-address")
+        expected["emails"].append((text_element(rng, email, "address"),
+                                   text_element(rng, email, "location")))
+
+    for _ in range(rng.randint(0, contacts)):
+        number = ET.SubElement(numbers, "phone-number")
+        expected["phone_numbers"].append(
+            (text_element(rng, number, "number"),
+             text_element(rng, number, "location")))
+
+    for _ in range(rng.randint(0, contacts)):
+        tag = ET.SubElement(tags, "tag")
+        tag_id = rng.randint(1, 10 ** 9)
+        id_element(tag, "id", tag_id)
+        text_element(rng, tag, "name")
+        expected["tags"].append(tag_id)
+
+    return expected
+
+def people_document(rng, count, depth=0, contacts=3):
+    """Returns the XML source of `count` random persons (see
+    `person_element()`) and the list of their expected values."""
+    people = ET.Element("people", type="array")
+    expected = [person_element(rng, people, number + 1, depth, contacts)
+                for number in range(count)]
+
+    return (ET.tostring(people, encoding="unicode"), expected)
+
+def deal_element(rng, parent, highrise_id, parties=5, subject_datas=5):
+    """Appends a random active working unit with the id `highrise_id`, up to
+    `parties` participants and up to `subject_datas` custom fields which
+    are not used by `REGISTRY` to `parent`. It returns the expected result
+    of `parse_working_unit_spec()`."""
+    deal = ET.SubElement(parent, "deal")
+    category_id = rng.choice(sorted(REGISTRY.unit_types))
+    person_responsible = str(rng.randint(1, 10 ** 6))
+
+    id_element(deal, "id", highrise_id)
+    id_element(deal, "category-id", category_id)
+    id_element(deal, "party-id", person_responsible)
+    ET.SubElement(deal, "status").text = "pending"
+
+    attributes = {"highrise_id": str(highrise_id),
+                  "name": text_element(rng, deal, "name"),
+                  "description": text_element(rng, deal, "background"),
+                  "unit_type": REGISTRY.unit_types[category_id]}
+
+    participants = ET.SubElement(deal, "parties", type="array")
+    participant_ids = []
+
+    for _ in range(rng.randint(0, parties)):
+        party = ET.SubElement(participants, "party")
+        participant_ids.append(str(rng.randint(1, 10 ** 6)))
+        id_element(party, "id", participant_ids[-1])
+
+    fields = ET.SubElement(deal, "subject_datas", type="array")
+    field_ids = [str(200 + x) for x in range(rng.randint(0, subject_datas))]
+    field_ids += [x for x in REGISTRY.subject_fields if rng.random() < 0.7]
+    rng.shuffle(field_ids)
+
+    for field_id in field_ids:
+        field = ET.SubElement(fields, "subject_data")
+        id_element(field, "subject_field_id", field_id)
+        value = text_element(rng, field, "value")
+
+        if field_id in REGISTRY.subject_fields:
+            attributes[REGISTRY.subject_fields[field_id]] = value
+
+    for attribute in REGISTRY.subject_fields.values():
+        attributes.setdefault(attribute, "")
+
+    return (attributes, person_responsible, participant_ids)
+
+def best_time(function, repeat=3):
+    """Returns the shortest duration of `repeat` calls of `function` in
+    seconds."""
+    durations = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    return min(durations)
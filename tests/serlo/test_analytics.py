@@ -0,0 +1,99 @@
+"""Tests for the modul `serlo.analytics`."""
+
+from serlo.analytics import analyze, build_graph, mentoring_depths
+from serlo.model import Person
+from tests.data import generate_person_ids, generate_working_units
+from tests.fixtures import DatabaseTestCase
+
+def pairs(matrix):
+    """Returns the sparse `matrix` as dictionary from sorted pairs of keys
+    onto the values."""
+    return dict((tuple(sorted([a, b])), value)
+                for a, row in matrix.items() for b, value in row.items())
+
+class TestAnalytics(DatabaseTestCase):
+    """Testcases for the graph analytics."""
+
+    def setUp(self):
+        super().setUp()
+
+        units = generate_working_units()
+        persons = [units[0].person_responsible, units[1].person_responsible,
+                   units[3].person_responsible]
+
+        for person, highrise_id in zip(persons, generate_person_ids()):
+            person.highrise_id = highrise_id
+
+        for number, unit in enumerate(units):
+            unit.highrise_id = str(number + 1)
+
+        self.database.add_all(units + [Person(highrise_id="99",
+                                              first_name="Anna",
+                                              last_name="Neu")])
+
+        self.result = analyze(build_graph(self.database))
+
+    def test_graph(self):
+        """Testcase for the function `build_graph()`."""
+        graph = build_graph(self.database)
+
+        self.assertListEqual(sorted(graph.keys.values()),
+                             ["1", "23", "42", "99"])
+        self.assertListEqual(sorted(graph.titles.values()),
+                             ["P - ", "P - project1",
+                              "U - Another support unit",
+                              "U - Support Unit Master"])
+        self.assertListEqual(sorted(len(x) for x in graph.members.values()),
+                             [1, 2, 2, 3])
+
+    def test_mentoring(self):
+        """Testcase for the mentoring depths."""
+        mentoring = self.result["mentoring"]
+
+        self.assertDictEqual(mentoring["depths"],
+                             {"23": 2, "42": 1, "1": 0, "99": 0})
+        self.assertEqual(mentoring["max_depth"], 2)
+        self.assertListEqual(mentoring["cycles"], [])
+        self.assertListEqual(self.result["without_mentor"], ["1", "99"])
+
+    def test_mentoring_cycles(self):
+        """Testcase for cycles and long chains of mentors."""
+        depths, cycles = mentoring_depths({1: 2, 2: 3, 3: 1, 4: 3, 5: None})
+
+        self.assertDictEqual(depths, {1: None, 2: None, 3: None, 4: None,
+                                      5: 0})
+        self.assertListEqual(cycles, [[1, 2, 3]])
+
+        chain = dict((x, x - 1 if x else None) for x in range(10000))
+        depths, cycles = mentoring_depths(chain)
+
+        self.assertEqual(depths[9999], 9999)
+        self.assertListEqual(cycles, [])
+
+    def test_units(self):
+        """Testcase for the unit overlaps and persons without unit."""
+        overlaps = self.result["unit_overlaps"]
+
+        self.assertListEqual(self.result["without_unit"], ["99"])
+        self.assertDictEqual(pairs(overlaps["shared"]), {
+            ("1", "3"): 1, ("1", "4"): 2, ("2", "3"): 1, ("2", "4"): 1,
+            ("3", "4"): 2})
+        self.assertDictEqual(pairs(overlaps["jaccard"]), {
+            ("1", "3"): 0.3333, ("1", "4"): 0.6667, ("2", "3"): 0.5,
+            ("2", "4"): 0.3333, ("3", "4"): 0.6667})
+
+    def test_co_membership(self):
+        """Testcase for the co-membership of persons."""
+        co_membership = self.result["co_membership"]
+
+        self.assertDictEqual(pairs(co_membership["shared"]), {
+            ("1", "23"): 2, ("1", "42"): 1, ("23", "42"): 2})
+        self.assertDictEqual(pairs(co_membership["jaccard"]), {
+            ("1", "23"): 0.6667, ("1", "42"): 0.25, ("23", "42"): 0.5})
+
+    def test_lead_load(self):
+        """Testcase for the load of the persons responsible."""
+        self.assertDictEqual(self.result["lead_load"], {
+            "23": {"units": 2, "members": 2, "mentees": 0},
+            "42": {"units": 1, "members": 0, "mentees": 1},
+            "1": {"units": 1, "members": 2, "mentees": 1}})
@@ -0,0 +1,236 @@
+"""Tests for the modul `serlo.diff`."""
+
+from serlo.diff import Change, apply_changes, diff_database, \
+                       diff_entities, format_change_log, person_snapshot, \
+                       unit_snapshot
+from serlo.model import Person, SerloDatabase
+from tests.data import generate_person_ids, generate_working_units
+from tests.fixtures import DatabaseTestCase
+
+class TestDiff(DatabaseTestCase):
+    """Testcases for the diff engine."""
+
+    def setUp(self):
+        super().setUp()
+
+        units = generate_working_units()
+        persons = [units[0].person_responsible, units[1].person_responsible,
+                   units[3].person_responsible]
+
+        for person, highrise_id in zip(persons, generate_person_ids()):
+            person.highrise_id = highrise_id
+
+        for number, unit in enumerate(units):
+            unit.highrise_id = str(number + 1)
+
+        self.database.add_all(units)
+
+    def snapshots(self):
+        """Returns the snapshots of all stored persons and units."""
+        return (dict((x.highrise_id, person_snapshot(x))
+                     for x in self.database.persons),
+                dict((x.highrise_id, unit_snapshot(x))
+                     for x in self.database.working_units))
+
+    def test_snapshots(self):
+        """Testcase for the functions `person_snapshot()` and
+        `unit_snapshot()`."""
+        persons, units = self.snapshots()
+
+        self.assertEqual(persons["23"]["first_name"], "Markus")
+        self.assertEqual(persons["23"]["mentor"], "42")
+        self.assertListEqual(persons["23"]["phone_numbers"],
+                             [["0123456789", "Mobile"]])
+        self.assertEqual(units["1"]["unit_type"], "project")
+        self.assertEqual(units["1"]["person_responsible"], "23")
+        self.assertListEqual(units["4"]["participants"], ["23", "42"])
+
+    def test_unchanged(self):
+        """Testcase for diffing the unchanged state."""
+        persons, units = self.snapshots()
+
+        self.assertListEqual(diff_database(self.database, persons, units), [])
+        self.assertTrue(all(x.content_hash for x in self.database.persons))
+
+        def fail(entity):
+            raise AssertionError(f"Snapshot of {entity!r} computed")
+
+        self.assertListEqual(diff_entities(
+            "person", self.database.content_hashes(Person), persons, fail,
+            fail), [])
+
+    def test_loaded_entities(self):
+        """Testcase that only the changed entities are loaded."""
+        persons, units = self.snapshots()
+        diff_database(self.database, persons, units)
+        persons["23"] = dict(persons["23"], last_name="Meyer")
+        loaded = []
+
+        def load(ids):
+            loaded.extend(ids)
+            return self.database.persons.filter(Person.id.in_(ids))
+
+        changes = diff_entities("person",
+                                self.database.content_hashes(Person),
+                                persons, person_snapshot, load)
+
+        self.assertListEqual([x.key for x in changes], ["23"])
+        self.assertListEqual(loaded, [self.database.person_by_highrise_id(
+            "23").id])
+
+    def test_changes(self):
+        """Testcase for diffing and applying changes."""
+        persons, units = self.snapshots()
+        old_markus, old_unit = persons["23"], units["2"]
+
+        persons["23"] = dict(old_markus, last_name="Meyer", mentor=None)
+        persons["7"] = dict(old_markus, first_name="Anna", last_name="Neu",
+                            tags=[], mentor="1")
+        units["3"]["participants"] = ["7"]
+        del units["2"]
+
+        changes = diff_database(self.database, persons, units)
+
+        self.assertListEqual(
+            [(x.kind, x.key, x.old is None, x.new is None) for x in changes],
+            [("person", "23", False, False), ("person", "7", True, False),
+             ("unit", "3", False, False), ("unit", "2", False, True)])
+        self.assertEqual(changes[0].old, old_markus)
+        self.assertEqual(changes[3].old, old_unit)
+
+        apply_changes(self.database, changes)
+
+        self.assertListEqual(diff_database(self.database, persons, units), [])
+        self.assertEqual(self.database.working_units.count(), 3)
+
+        anna = self.database.persons.filter_by(highrise_id="7").one()
+
+        self.assertEqual(anna.mentor.highrise_id, "1")
+        self.assertListEqual([x.name for x in anna.participating_units],
+                             ["Support Unit Master"])
+
+    def test_unchanged_rows(self):
+        """Testcase that only the changed rows of a person are replaced."""
+        persons, units = self.snapshots()
+
+        def row_ids():
+            markus = self.database.person_by_highrise_id("23")
+
+            return [[x.id for x in markus.emails],
+                    [x.id for x in markus.phone_numbers],
+                    [x.id for x in markus.tags]]
+
+        old_ids = row_ids()
+        persons["23"] = dict(persons["23"], mentor=None)
+        apply_changes(self.database, diff_database(self.database, persons,
+                                                   units))
+
+        self.assertListEqual(row_ids(), old_ids)
+        self.assertIsNone(self.database.person_by_highrise_id("23").mentor)
+
+        persons["23"] = dict(persons["23"], emails=[["m@example.org",
+                                                     "Work"]])
+        apply_changes(self.database, diff_database(self.database, persons,
+                                                   units))
+        new_ids = row_ids()
+
+        self.assertNotEqual(new_ids[0], old_ids[0])
+        self.assertListEqual(new_ids[1:], old_ids[1:])
+        self.assertListEqual(diff_database(self.database, persons, units), [])
+
+    def test_chunked_changes(self):
+        """Testcase for applying changes in chunks."""
+        persons, units = self.snapshots()
+        database = SerloDatabase("sqlite:///:memory:")
+        changes = diff_database(database, persons, units)
+
+        self.assertEqual(len(changes), 7)
+
+        apply_changes(database, changes, chunk_size=2)
+
+        # pylint: disable=protected-access
+        self.assertEqual(len(database._session.identity_map), 0)
+        self.assertListEqual(diff_database(database, persons, units), [])
+
+        del persons["42"]
+        persons["23"]["mentor"] = None
+        units = dict((key, x) for key, x in units.items()
+                     if x["person_responsible"] != "42")
+
+        for unit in units.values():
+            unit["participants"] = [x for x in unit["participants"]
+                                    if x != "42"]
+
+        apply_changes(database, diff_database(database, persons, units),
+                      chunk_size=1)
+
+        self.assertListEqual(diff_database(database, persons, units), [])
+        self.assertEqual(database.persons.count(), 2)
+        self.assertEqual(database.working_units.count(), 3)
+
+    def test_bulk_load(self):
+        """Testcase for bulk loading changes which only insert entities."""
+        persons, units = self.snapshots()
+        markus = persons["23"]
+        new_persons = {"7": dict(markus, first_name="Anna", mentor="23"),
+                       "8": dict(markus, first_name="Ben", mentor="7")}
+        new_units = {"5": dict(units["1"], person_responsible="7",
+                               participants=["8", "23"])}
+
+        changes = diff_database(self.database, dict(persons, **new_persons),
+                                dict(units, **new_units))
+
+        self.assertTrue(all(x.old is None for x in changes))
+
+        apply_changes(self.database, changes)
+        persons.update(new_persons)
+        units.update(new_units)
+
+        self.assertListEqual(diff_database(self.database, persons, units), [])
+
+        ben = self.database.person_by_highrise_id("8")
+
+        self.assertEqual(ben.mentor.mentor.highrise_id, "23")
+        self.assertEqual(ben.emails[0].address, markus["emails"][0][0])
+        self.assertSetEqual(set(x.name for x in ben.participating_units),
+                            set([units["5"]["name"]]))
+
+        self.database.add_all([Person(highrise_id="9", first_name="C",
+                                      last_name="D")])
+
+        self.assertEqual(self.database.persons.count(), 6)
+
+    def test_unmatched(self):
+        """Testcase for deleting persons without Highrise id."""
+        persons, units = self.snapshots()
+
+        self.database.add_all([Person(first_name="A", last_name="B")])
+
+        changes = diff_database(self.database, persons, units)
+
+        self.assertListEqual([(x.key, x.new) for x in changes], [(None, None)])
+
+        apply_changes(self.database, changes)
+
+        self.assertEqual(self.database.persons.count(), 3)
+
+    def test_format_change_log(self):
+        """Testcase for the function `format_change_log()`."""
+        persons, units = self.snapshots()
+        markus = persons["23"]
+
+        changes = [
+            Change("person", "7", None, dict(markus, first_name="Anna")),
+            Change("person", "23", markus, dict(markus, mentor="1")),
+            Change("unit", "3", units["3"],
+                   dict(units["3"], participants=["7"], slack_url="")),
+            Change("unit", "2", units["2"], None)]
+
+        self.assertEqual(format_change_log(changes, persons), "\n".join([
+            "Joined: Anna Miller",
+            "Mentoring: Markus Miller is now mentored by  ",
+            "Anna Miller joined U - Support Unit Master",
+            "Yannick Müller left U - Support Unit Master",
+            "Changed unit U - Support Unit Master: slack_url=''",
+            "Closed unit: P - ",
+            "Yannick Müller left P - "]))
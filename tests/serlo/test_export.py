@@ -0,0 +1,83 @@
+"""Tests for the modul `serlo.export`."""
+
+import importlib.util
+import os
+import tempfile
+import unittest
+
+from serlo.export import TABLES, column_batches, export, export_table
+from tests.data import generate_working_units
+from tests.fixtures import DatabaseTestCase
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+class TestExport(DatabaseTestCase):
+    """Testcases for the columnar export."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.database.add_all(generate_working_units())
+
+    def table(self, name, batch_size=1000):
+        """Returns the rows of the exported table `name` as list of
+        dictionaries."""
+        return [dict(zip(batch, row)) for batch
+                in column_batches(self.database, name, batch_size)
+                for row in zip(*batch.values())]
+
+    def test_column_batches(self):
+        """Testcase for reading the tables in batches."""
+        batches = list(column_batches(self.database, "persons", 2))
+
+        self.assertListEqual([len(x["id"]) for x in batches], [2, 1])
+        self.assertListEqual(list(batches[0]),
+                             [x[0] for x in TABLES["persons"]])
+
+    def test_tables(self):
+        """Testcase for the content of the exported tables."""
+        persons = dict((x["id"], x) for x in self.table("persons"))
+        names = dict((key, x["first_name"]) for key, x in persons.items())
+        units = self.table("working_units")
+
+        self.assertEqual(len(self.table("emails")), 3)
+        self.assertEqual(len(self.table("phone_numbers")), 3)
+        self.assertEqual(len(self.table("tags")), 3)
+        self.assertEqual(len(self.table("participants")), 4)
+        self.assertSetEqual(set(x["unit_type"] for x in units),
+                            set(["project", "support_unit"]))
+        self.assertSetEqual(
+            set((names[x["mentor_id"]], names[x["mentee_id"]])
+                for x in self.table("mentoring")),
+            set([("Yannick", "Markus"), ("", "Yannick")]))
+
+    def test_unknown_format(self):
+        """Testcase for exporting into an unknown format."""
+        with self.assertRaises(ValueError):
+            export_table(self.database, "persons", "persons.csv", "csv")
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_export(self):
+        """Testcase for writing Parquet and Arrow files."""
+        import pyarrow.ipc # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet # pylint: disable=import-outside-toplevel
+
+        with tempfile.TemporaryDirectory() as directory:
+            rows = export(self.database, directory, batch_size=2)
+            persons = pyarrow.parquet.read_table(
+                os.path.join(directory, "persons.parquet"))
+
+            export_table(self.database, "working_units",
+                         os.path.join(directory, "units.arrow"), "arrow", 2)
+            units = pyarrow.ipc.open_file(
+                os.path.join(directory, "units.arrow"))
+
+            self.assertEqual(units.num_record_batches, 2)
+            self.assertListEqual(
+                units.read_all().column("unit_type").to_pylist(),
+                ["project", "support_unit", "project", "support_unit"])
+
+        self.assertEqual(rows["persons"], 3)
+        self.assertEqual(rows["participants"], 4)
+        self.assertListEqual(persons.column("first_name").to_pylist(),
+                             ["Markus", "Yannick", ""])
@@ -1,12 +1,21 @@
 """Tests for the modul `serlo.model`."""
 
+import os
+import tempfile
+
 from unittest import TestCase
 
-from serlo.model import UnitType, Email, Person, PhoneNumber, SerloDatabase, \
-                        WorkingUnit, Tag
+from sqlalchemy import func, inspect
+from sqlalchemy.dialects.postgresql import psycopg2
+from sqlalchemy.exc import IntegrityError
+
+from serlo.model import UnitType, Email, Person, PhoneNumber, WorkingUnit, \
+                        SerloDatabase, Tag, copy_columns, copy_payload, \
+                        copy_statement
 from tests.data import generate_persons, generate_emails, \
                        generate_working_units, generate_phone_numbers, \
                        generate_tags
+from tests.fixtures import DatabaseTestCase
 
 class TestEmail(TestCase):
     """Testcases for the model `Email`."""
@@ -264,12 +273,12 @@ class TestWorkingUnit(TestCase):
         self.assertEqual(self.unit1.title, "U - Support Unit Master")
         self.assertEqual(self.unit2.title, "U - Another support unit")
 
-class TestSerloDatabase(TestCase):
+class TestSerloDatabase(DatabaseTestCase):
     """Testcases for the class `SerloDatabase`."""
     # pylint: disable=too-many-instance-attributes
 
     def setUp(self):
-        self.database = SerloDatabase("sqlite:///:memory:")
+        super().setUp()
         self.person1, self.person2, self.person3 = generate_persons()[0:3]
 
         self.persons = [self.person1, self.person2, self.person3]
@@ -349,3 +358,170 @@ class TestSerloDatabase(TestCase):
         self.assertListEqual(self.person1.mentees, [])
         self.assertListEqual(self.person2.mentees, [self.person1])
         self.assertListEqual(self.person3.mentees, [self.person2])
+
+    def test_highrise_ids(self):
+        """Testcase for looking up entities by their Highrise ids."""
+        person1 = self.project1.person_responsible
+        person2 = self.project2.person_responsible
+
+        person1.highrise_id = "23"
+        self.project1.highrise_id = "1"
+
+        self.database.add_all(self.units)
+
+        self.assertIs(self.database.person_by_highrise_id("23"), person1)
+        self.assertIs(self.database.working_unit_by_highrise_id("1"),
+                      self.project1)
+        self.assertIsNone(self.database.person_by_highrise_id("42"))
+        self.assertIsNone(self.database.working_unit_by_highrise_id("23"))
+
+        self.assertEqual(person1.stable_id, "23")
+        self.assertEqual(person2.stable_id, str(person2.id))
+
+        with self.assertRaises(IntegrityError):
+            self.database.add_all([Person(highrise_id="23", first_name="",
+                                          last_name="")])
+
+    def test_revision(self):
+        """Testcase for the revision increased by every write."""
+        with tempfile.TemporaryDirectory() as directory:
+            url = "sqlite:///" + os.path.join(directory, "serlo.db")
+            writer, reader = SerloDatabase(url), SerloDatabase(url)
+
+            self.assertEqual(reader.revision, 0)
+
+            writer.add_all(self.persons)
+            self.assertEqual(reader.revision, 1)
+
+            writer.sync([], [self.person1], commit=False)
+            self.assertEqual(reader.revision, 1)
+
+            writer.bulk_update(Person.__table__, [
+                {"id": self.person2.id, "last_name": "Neu"}])
+            writer.commit()
+            self.assertEqual(reader.revision, 3)
+
+            writer.clear()
+            self.assertEqual(reader.revision, 4)
+            self.assertEqual(reader.persons.count(), 0)
+
+            writer.close()
+            reader.close()
+
+class TestDisplayProperties(DatabaseTestCase):
+    """Testcases for the display properties in queries."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.database.add_all(generate_working_units())
+        self.database.expunge_all()
+
+    def test_full_name(self):
+        """Testcase for filtering and sorting by `Person.full_name`."""
+        self.assertListEqual(
+            [x.full_name for x in self.database.persons
+             .filter(Person.full_name.like("%M_ller"))
+             .order_by(func.lower(Person.full_name))],
+            ["Markus Miller", "Yannick Müller"])
+
+    def test_title(self):
+        """Testcase for filtering and sorting by `WorkingUnit.title`."""
+        titles = [x for x, in self.database.working_units
+                  .with_entities(WorkingUnit.title)
+                  .order_by(WorkingUnit.title)]
+
+        self.assertListEqual(titles, ["P - ", "P - project1",
+                                      "U - Another support unit",
+                                      "U - Support Unit Master"])
+        self.assertListEqual(
+            [x.title for x in self.database.working_units
+             .filter(WorkingUnit.title.startswith("U - S"))],
+            ["U - Support Unit Master"])
+
+    def test_work_contacts(self):
+        """Testcase for loading only the work contacts."""
+        yannick = self.database.persons_with_work_contacts \
+                               .filter_by(first_name="Yannick").one()
+
+        self.assertListEqual([x.address for x in yannick.work_emails],
+                             ["some-string-with-ü"])
+        self.assertListEqual([x.number for x in yannick.work_phone_numbers],
+                             ["+490"])
+        self.assertTrue(set(["emails", "phone_numbers"])
+                        <= inspect(yannick).unloaded)
+
+        self.assertEqual(len(yannick.emails), 2)
+        self.assertListEqual([x.address for x in yannick.work_emails],
+                             ["some-string-with-ü"])
+
+class TestBulkInsert(DatabaseTestCase):
+    """Testcases for the bulk loading of rows."""
+
+    def test_copy_payload(self):
+        """Testcase for the input of a PostgreSQL `COPY`."""
+        rows = [{"name": "", "description": 'a,"b"\nc', "highrise_id": None,
+                 "unit_type": UnitType.project, "person_responsible_id": 2}]
+        payload = copy_payload(WorkingUnit.__table__, rows,
+                               psycopg2.dialect())
+
+        self.assertListEqual([x.name for x in copy_columns(
+            WorkingUnit.__table__, rows)], ["highrise_id", "name",
+                                            "description", "unit_type",
+                                            "person_responsible_id"])
+        self.assertEqual(payload.read(), ',"","a,""b""\nc","project",2\n')
+
+    def test_copy_statement(self):
+        """Testcase for the `COPY` statement of PostgreSQL."""
+        table = WorkingUnit.__table__
+
+        self.assertEqual(
+            copy_statement(table, [table.c.highrise_id, table.c.name],
+                           psycopg2.dialect()),
+            "COPY workingunit (highrise_id, name) FROM STDIN WITH "
+            "(FORMAT csv)")
+        self.assertEqual(
+            copy_statement(Email.__table__, [Email.__table__.c.location],
+                           psycopg2.dialect()),
+            "COPY email (location) FROM STDIN WITH (FORMAT csv)")
+
+    def test_bulk_insert(self):
+        """Testcase for inserting rows whose ids are assigned by the
+        database."""
+        self.database.add_all(generate_persons())
+
+        self.database.bulk_insert(Person.__table__, [
+            {"highrise_id": "7", "first_name": "Anna", "last_name": "Neu",
+             "mentor_id": 1}])
+        self.database.bulk_insert(Email.__table__, [])
+        self.database.commit()
+
+        anna = self.database.persons.filter_by(first_name="Anna").one()
+
+        self.assertEqual(anna.id, 4)
+        self.assertEqual(anna.mentor.first_name, "Markus")
+        self.assertEqual(self.database.max_id(Email), 3)
+        self.assertDictEqual(self.database.ids_by_highrise_id(
+            Person, ["7", "8"]), {"7": 4})
+
+    def test_bulk_update(self):
+        """Testcase for updating rows by their ids."""
+        self.database.add_all(generate_persons())
+        self.database.bulk_update(Person.__table__, [
+            {"id": 2, "mentor_id": None, "last_name": "Neu"},
+            {"id": 3, "mentor_id": 2, "last_name": "Alt"}])
+        self.database.commit()
+
+        self.assertListEqual(
+            [(x.id, x.mentor_id, x.last_name) for x
+             in self.database.persons.order_by(Person.id)][1:],
+            [(2, None, "Neu"), (3, 2, "Alt")])
+
+    def test_streamed(self):
+        """Testcase for loading entities in batches."""
+        self.database.add_all(generate_working_units())
+
+        self.assertListEqual(
+            [x.first_name for x in self.database.streamed(
+                self.database.persons.order_by(Person.id), 2)],
+            ["Markus", "Yannick", ""])
@@ -0,0 +1,55 @@
+"""Tests for the modul `serlo.profiler`."""
+
+from unittest import TestCase
+
+from serlo.model import SerloDatabase
+from serlo.profiler import QueryProfiler
+from tests.data import generate_working_units
+
+class TestQueryProfiler(TestCase):
+    """Testcases for the class `QueryProfiler`."""
+
+    def setUp(self):
+        self.profiler = QueryProfiler()
+        self.database = SerloDatabase("sqlite:///:memory:", self.profiler)
+        self.database.add_all(generate_working_units())
+        self.database.expunge_all()
+        self.profiler.reset()
+
+    def test_statements(self):
+        """Testcase for recording loops of queries."""
+        persons = list(self.database.persons)
+
+        for person in persons:
+            self.assertIsNotNone(person.emails)
+
+        statements = dict((x.statement.split(" FROM ")[1].split()[0], x)
+                          for x in self.profiler.statements)
+
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(statements["person"].count, 1)
+        self.assertEqual(statements["person"].rows, 3)
+        self.assertEqual(statements["email"].count, 3)
+        self.assertEqual(statements["email"].rows, 3)
+        self.assertTrue(all(x > 0 for x in statements["email"].durations))
+
+    def test_changed_rows(self):
+        """Testcase for counting the rows of changes."""
+        self.database.sync([], list(self.database.working_units))
+
+        rows = dict((x.statement.split()[2], x.rows)
+                    for x in self.profiler.statements
+                    if x.statement.startswith("DELETE"))
+
+        self.assertDictEqual(rows, {"working_unit_participants": 4,
+                                    "workingunit": 4})
+
+    def test_summary(self):
+        """Testcase for the summary."""
+        self.assertEqual(self.database.persons.count(), 3)
+
+        lines = self.profiler.summary().splitlines()
+
+        self.assertTrue(lines[0].startswith("Queries: 1 statements "
+                                            "(1 distinct)"))
+        self.assertTrue(lines[2].endswith("AS anon_1"))
@@ -0,0 +1,45 @@
+"""Tests for the modul `serlo.registry`."""
+
+from unittest import TestCase
+
+from serlo.model import Tag, UnitType
+from serlo.registry import Registry, default_registry
+
+class TestRegistry(TestCase):
+    """Testcases for the class `Registry`."""
+
+    def test_default_registry(self):
+        """Testcase for the registry of the Serlo account."""
+        self.assertEqual(default_registry().member_tag, "5360080")
+        self.assertDictEqual(default_registry().unit_types,
+                             {"6436430": UnitType.project,
+                              "4849968": UnitType.support_unit})
+        self.assertSetEqual(default_registry().mentoring_categories,
+                            set(["6438903"]))
+        self.assertDictEqual(default_registry().subject_fields,
+                             {"1224165": "overview_document",
+                              "1258882": "storage_url",
+                              "1311275": "slack_url"})
+        self.assertDictEqual(default_registry().tags, Tag.TAGS)
+
+    def test_tags(self):
+        """Testcase for attribute `Registry.tags`."""
+        registry = Registry({"member_tag": 1,
+                             "tags": {"Pause": "23", "Intern": [24, "25"]}})
+
+        self.assertDictEqual(registry.tags,
+                             {"Pause": [23], "Intern": [24, 25]})
+
+    def test_invalid_spec(self):
+        """Testcase for invalid registry specifications."""
+        with self.assertRaises(ValueError):
+            Registry({"member_tag": 1, "categories": {"1": "team"}})
+
+        with self.assertRaises(ValueError):
+            Registry({"member_tag": 1, "subject_fields": {"1": "title"}})
+
+        with self.assertRaises(ValueError):
+            Registry({"member_tag": 1, "subject_fields": {"1": "highrise_id"}})
+
+        with self.assertRaises(KeyError):
+            Registry({})
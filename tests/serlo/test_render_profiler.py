@@ -0,0 +1,70 @@
+"""Tests for the modul `serlo.render_profiler`."""
+
+from unittest import TestCase
+
+from jinja2 import Template
+from jinja2.runtime import Macro
+
+from serlo.model import Person, WorkingUnit
+from serlo.render_profiler import RenderProfiler
+from tests.data import generate_persons, generate_working_units
+from tests.fixtures import DatabaseTestCase
+
+TEMPLATE = """
+{%- macro item(person) %}[{{ person.name }}]{% endmacro -%}
+{%- macro listing(persons) %}{% for x in persons %}{{ caller(x) }}
+{%- endfor %}{% endmacro -%}
+{%- call(x) listing(persons) %}{{ item(x) }}{% endcall -%}
+"""
+
+class TestRenderProfiler(TestCase):
+    """Testcases for the class `RenderProfiler`."""
+
+    def test_instrument(self):
+        """Testcase for recording macros and properties."""
+        profiler = RenderProfiler()
+        macro_call, name = Macro.__call__, Person.name
+
+        with profiler.instrument():
+            content = Template(TEMPLATE).render(persons=generate_persons())
+
+        self.assertEqual(content, "[Markus Miller (Pause, Intern)]"
+                         "[Yannick Müller (Intern)][ ]")
+        self.assertDictEqual(dict(profiler.calls), {
+            "macro listing": 1, "macro caller": 3, "macro item": 3,
+            "Person.name": 3})
+        self.assertLessEqual(profiler.own["macro listing"],
+                             profiler.cumulative["macro listing"])
+        self.assertGreaterEqual(profiler.cumulative["macro listing"],
+                                profiler.cumulative["macro caller"])
+        self.assertIs(Macro.__call__, macro_call)
+        self.assertIs(Person.name, name)
+
+    def test_summary(self):
+        """Testcase for the summary."""
+        profiler = RenderProfiler(properties=[])
+
+        with profiler.instrument():
+            Template(TEMPLATE).render(persons=[])
+
+        lines = profiler.summary().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith("macro listing"))
+
+class TestHybridProperties(DatabaseTestCase):
+    """Testcases for profiling hybrid properties."""
+
+    def test_query(self):
+        """Testcase that hybrid properties stay usable in queries."""
+        self.database.add_all(generate_working_units())
+        profiler = RenderProfiler()
+        title = WorkingUnit.__dict__["title"]
+
+        with profiler.instrument():
+            titles = [x.title for x in self.database.working_units.order_by(
+                WorkingUnit.title)]
+
+        self.assertListEqual(titles, sorted(titles))
+        self.assertEqual(profiler.calls["WorkingUnit.title"], len(titles))
+        self.assertIs(WorkingUnit.__dict__["title"], title)
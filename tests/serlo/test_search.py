@@ -0,0 +1,77 @@
+"""Tests for the modul `serlo.search`."""
+
+import json
+import os
+import tempfile
+
+from serlo.search import build_search_index, write_search_index, shard_key, \
+                         tokenize
+from tests.data import generate_working_units
+from tests.fixtures import DatabaseTestCase
+
+class TestSearchIndex(DatabaseTestCase):
+    """Testcases for the static search index."""
+
+    def setUp(self):
+        super().setUp()
+        self.database.add_all(generate_working_units())
+
+    def lookup(self, token):
+        """Returns the anchors of all documents containing `token`."""
+        meta, shards, chunks = build_search_index(self.database)
+        numbers = shards.get(shard_key(token), {}).get(token, [])
+
+        self.assertIn(shard_key(token), meta["shards"])
+
+        return [chunks[x // meta["chunk_size"]][x % meta["chunk_size"]][0]
+                for x in numbers]
+
+    def test_tokenize(self):
+        """Testcase for the function `tokenize()`."""
+        self.assertListEqual(tokenize("P - Support Unit"),
+                             ["p", "support", "unit"])
+        self.assertListEqual(tokenize(""), [])
+
+    def test_build_search_index(self):
+        """Testcase for the function `build_search_index()`."""
+        markus = self.database.persons.filter_by(first_name="Markus").one()
+        unit = self.database.working_units.filter_by(name="project1").one()
+
+        self.assertListEqual(self.lookup("markus"), [f"#{markus.stable_id}"])
+        yannick = self.database.persons.filter_by(first_name="Yannick").one()
+
+        self.assertListEqual(self.lookup("hello"), ["#unit4"])
+        self.assertListEqual(self.lookup("string"),
+                             [f"#{yannick.stable_id}"])
+        self.assertListEqual(self.lookup("description"),
+                             [f"#unit{unit.stable_id}"])
+
+        meta, shards, chunks = build_search_index(self.database)
+
+        self.assertListEqual(meta["shards"], sorted(shards))
+        self.assertEqual(sum(len(x) for x in chunks), 7)
+
+        for shard in shards.values():
+            for numbers in shard.values():
+                self.assertListEqual(numbers, sorted(set(numbers)))
+
+    def test_write_search_index(self):
+        """Testcase for the function `write_search_index()`."""
+        meta, shards, chunks = build_search_index(self.database)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "shard-00.json"), "w") as old:
+                old.write("{}")
+
+            write_search_index(self.database, directory)
+
+            self.assertSetEqual(
+                set(os.listdir(directory)),
+                set(["meta.json", "docs-0.json"] +
+                    [f"shard-{x}.json" for x in shards]))
+
+            with open(os.path.join(directory, "meta.json")) as meta_file:
+                self.assertDictEqual(json.load(meta_file), meta)
+
+            with open(os.path.join(directory, "docs-0.json")) as chunk_file:
+                self.assertListEqual(json.load(chunk_file), chunks[0])
@@ -0,0 +1,74 @@
+"""Tests for the modul `serlo.snapshots`."""
+
+import os
+import tempfile
+
+from unittest import TestCase
+
+from serlo.snapshots import SnapshotCache, decode_snapshots, \
+                            encode_snapshots
+from serlo.validation import Rejection
+
+PERSONS = {"23": {"first_name": "Markus", "last_name": "Müller",
+                  "emails": [["hello@example.org", "Work"]],
+                  "phone_numbers": [], "tags": [5363523, -1],
+                  "mentor": None},
+           "42": {"first_name": "Markus", "last_name": "", "emails": [],
+                  "phone_numbers": [["+490", "Work"]], "tags": [],
+                  "mentor": "23"}}
+UNITS = {"1": {"name": "project1", "unit_type": "project",
+               "person_responsible": "23", "participants": ["42"],
+               "storage_url": None}}
+REJECTIONS = [Rejection("people", 3, None, ["`id` is missing"],
+                        "<person />")]
+
+class TestSnapshots(TestCase):
+    """Testcases for the binary encoding of snapshots."""
+
+    def test_round_trip(self):
+        """Testcase for encoding and decoding snapshots."""
+        data = encode_snapshots(PERSONS, UNITS, REJECTIONS)
+
+        self.assertEqual(decode_snapshots(data),
+                         (PERSONS, UNITS, [list(x) for x in REJECTIONS]))
+        self.assertEqual(data.count("Markus".encode("utf-8")), 1)
+        self.assertEqual(decode_snapshots(encode_snapshots({}, {})),
+                         ({}, {}, []))
+
+    def test_invalid_data(self):
+        """Testcase for decoding invalid data."""
+        data = encode_snapshots(PERSONS, UNITS)
+
+        for invalid in [b"", b"XXXX" + data[4:], data[:-1], data + b"N",
+                        data[:len(data) // 2]]:
+            with self.assertRaises(ValueError):
+                decode_snapshots(invalid)
+
+        with self.assertRaises(TypeError):
+            encode_snapshots({"1": {"x": 1.5}}, {})
+
+class TestSnapshotCache(TestCase):
+    """Testcases for the class `SnapshotCache`."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = SnapshotCache(os.path.join(self.directory.name, "cache"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        """Testcase for storing and loading entries."""
+        self.assertIsNone(self.cache.get("abc"))
+
+        self.cache.put("abc", PERSONS, UNITS)
+
+        self.assertEqual(self.cache.get("abc"), (PERSONS, UNITS, []))
+        self.assertListEqual(os.listdir(self.cache.directory), ["abc.bin"])
+
+    def test_corrupted_entry(self):
+        """Testcase for ignoring corrupted entries."""
+        with open(os.path.join(self.cache.directory, "abc.bin"), "wb") as entry:
+            entry.write(b"SRLS")
+
+        self.assertIsNone(self.cache.get("abc"))
@@ -0,0 +1,116 @@
+"""Tests for the modul `serlo.validation`."""
+
+import json
+import os
+import random
+import tempfile
+import xml.etree.ElementTree as ET
+
+from unittest import TestCase
+
+from serlo.validation import Quarantine, ValidationError, deal_problems, \
+                             person_problems, screen
+from tests.fuzzing import REGISTRY, deal_element, id_element, person_element
+
+def parse_id(xml):
+    """Returns the integer id of `xml`."""
+    return int(xml.findtext("id", ""))
+
+class TestValidation(TestCase):
+    """Testcases for the validation of Highrise records."""
+
+    def setUp(self):
+        self.people = ET.Element("people")
+        person_element(random.Random(0), self.people, 1, contacts=0)
+
+    def test_valid_person(self):
+        """Testcase for a valid person."""
+        self.assertListEqual(person_problems(self.people[0]), [])
+
+    def test_person_problems(self):
+        """Testcase for collecting all problems of a person."""
+        person = self.people[0]
+        person.remove(person.find("last-name"))
+        ET.SubElement(person, "tags")
+        ET.SubElement(person.find("contact-data/email-addresses"),
+                      "email-address")
+        id_element(ET.SubElement(person.find("tags"), "tag"), "id", "x")
+
+        self.assertListEqual(person_problems(person), [
+            "`last-name` is missing", "`tags` occurs 2 times",
+            "contact-data/email-addresses/email-address[1]: `address` is "
+            "missing",
+            "contact-data/email-addresses/email-address[1]: `location` is "
+            "missing",
+            "`tags/*/id` is no integer: 'x'"])
+
+    def test_deal_problems(self):
+        """Testcase for collecting all problems of deals."""
+        deals = ET.Element("deals")
+        deal_element(random.Random(0), deals, 1)
+        unit = deals[0]
+
+        self.assertListEqual(deal_problems(unit, REGISTRY), [])
+
+        unit.remove(unit.find("name"))
+        unit.remove(unit.find("party-id"))
+        ET.SubElement(unit.find("parties"), "party")
+
+        problems = deal_problems(unit, REGISTRY)
+
+        self.assertIn("`name` is missing", problems)
+        self.assertIn("`party-id` is missing", problems)
+        self.assertTrue(any(x.startswith("parties/party[") for x in problems))
+
+        unit.find("status").text = "won"
+        self.assertListEqual(deal_problems(unit, REGISTRY), [])
+
+        unit.find("category-id").text = "40"
+        self.assertEqual(deal_problems(unit, REGISTRY)[0],
+                         "`party-id` is missing")
+
+        unit.find("category-id").text = "99"
+        self.assertListEqual(deal_problems(unit, REGISTRY), [])
+
+        unit.remove(unit.find("category-id"))
+        self.assertListEqual(deal_problems(unit, REGISTRY),
+                             ["`category-id` is missing"])
+
+    def test_screen(self):
+        """Testcase for screening a page with malformed records."""
+        page = ET.fromstring("<people><person><id>1</id></person>"
+                             "<person><id>x</id></person><person/>"
+                             "<person><id>4</id></person></people>")
+        quarantine = Quarantine()
+
+        self.assertListEqual(screen(page, parse_id, person_problems,
+                                    "people", quarantine), [1, 4])
+        self.assertListEqual([(x.position, x.highrise_id)
+                              for x in quarantine.rejections],
+                             [(1, "x"), (2, None)])
+        self.assertIn("people #2: `id` is missing", quarantine.summary())
+
+        with self.assertRaises(ValidationError) as context:
+            screen(page, parse_id, lambda _: [], "people")
+
+        self.assertEqual(len(context.exception.rejections), 2)
+        self.assertTrue(str(context.exception).startswith(
+            "2 malformed records of `people`:"))
+
+    def test_save(self):
+        """Testcase for writing the quarantine into a file."""
+        quarantine = Quarantine()
+        screen(ET.fromstring("<people><person/></people>"), parse_id,
+               person_problems, "people", quarantine)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "quarantine.json")
+            quarantine.save(path)
+
+            with open(path, encoding="utf-8") as quarantine_file:
+                records = json.load(quarantine_file)
+
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["endpoint"], "people")
+        self.assertEqual(records[0]["source"], "<person />")
+        self.assertIn("`first-name` is missing", records[0]["problems"])
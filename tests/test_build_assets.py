@@ -0,0 +1,152 @@
+"""Testsuite for python script `build_assets.py`."""
+
+import os
+import tempfile
+
+from unittest import TestCase
+
+from build_assets import AssetCache, build_assets, content_hash, \
+                         fingerprint, minify_css, minify_js, pin_sources
+
+SOURCES = {"https://example.org/a.css": b"a  {  color : red; } /* A */\n",
+           "https://example.org/b.css": b"b, c{ }",
+           "https://example.org/a.js": b"a();\n//# sourceMappingURL=a.map",
+           "https://example.org/b.js": b"b()",
+           "https://example.org/favicon.ico": b"\x00\x01\x02"}
+
+class TestBuildAssets(TestCase):
+    """Testsuite for bundling the static assets."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, "cache")
+        self.output_dir = os.path.join(self.directory.name, "out")
+        self.downloads = []
+
+        os.mkdir(self.output_dir)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def download(self, url):
+        """Replacement for `download_url()` which records all downloads."""
+        self.downloads.append(url)
+
+        return SOURCES[url]
+
+    def test_minify_css(self):
+        """Testcase for the function `minify_css()`."""
+        self.assertEqual(minify_css("a  {  color : red; } /* A */\n"),
+                         "a{color : red;}")
+        self.assertEqual(minify_css("a::before { content: '/* x */ {' }"),
+                         "a::before{content: '/* x */ {'}")
+        self.assertEqual(minify_css("/*! MIT */\nb {}"), "/*! MIT */ b{}")
+
+    def test_minify_js(self):
+        """Testcase for the function `minify_js()`."""
+        self.assertEqual(minify_js("a();\n//# sourceMappingURL=a.map\n"),
+                         "a();")
+        self.assertEqual(minify_js("a('//# sourceMappingURL=x')"),
+                         "a('//# sourceMappingURL=x')")
+
+    def test_fingerprint(self):
+        """Testcase for the function `fingerprint()`."""
+        self.assertEqual(fingerprint("script.js", b"a"),
+                         "script." + content_hash(b"a")[:12] + ".js")
+
+    def test_cache(self):
+        """Testcase for downloading assets only on a cache miss."""
+        url = "https://example.org/a.js"
+        cache = AssetCache(self.cache_dir, self.download)
+
+        self.assertEqual(cache.get(url), SOURCES[url])
+        self.assertEqual(cache.get(url), SOURCES[url])
+        self.assertEqual(self.downloads, [url])
+
+        cache = AssetCache(self.cache_dir, self.download)
+
+        self.assertEqual(cache.get(url, content_hash(SOURCES[url])),
+                         SOURCES[url])
+        self.assertEqual(self.downloads, [url])
+
+    def test_cache_corrupted(self):
+        """Testcase for a corrupted cache entry."""
+        url = "https://example.org/b.js"
+        cache = AssetCache(self.cache_dir, self.download)
+        cache.get(url)
+
+        with open(os.path.join(self.cache_dir, content_hash(SOURCES[url])),
+                  "wb") as asset_file:
+            asset_file.write(b"evil()")
+
+        self.assertEqual(cache.get(url), SOURCES[url])
+        self.assertEqual(self.downloads, [url, url])
+
+    def test_cache_hash_mismatch(self):
+        """Testcase for downloads which do not match the expected hash."""
+        cache = AssetCache(self.cache_dir, self.download)
+
+        with self.assertRaises(ValueError):
+            cache.get("https://example.org/a.css", content_hash(b""))
+
+    def test_pin_sources(self):
+        """Testcase for the function `pin_sources()`."""
+        manifest = {"script.js": [{"url": "https://example.org/a.js"},
+                                  {"url": "https://example.org/b.js",
+                                   "sha256": content_hash(b"b()")}]}
+
+        self.assertListEqual(pin_sources(manifest, AssetCache(
+            self.cache_dir, self.download)), ["https://example.org/a.js"])
+        self.assertEqual(manifest["script.js"][0]["sha256"],
+                         content_hash(SOURCES["https://example.org/a.js"]))
+        self.assertEqual(self.downloads, ["https://example.org/a.js"])
+
+    def test_build_assets_unpinned(self):
+        """Testcase for sources without digest."""
+        manifest = {"script.js": [{"url": "https://example.org/a.js"}]}
+
+        with self.assertRaisesRegex(ValueError, "no pinned sha256 digest"):
+            build_assets(manifest, self.output_dir,
+                         AssetCache(self.cache_dir, self.download),
+                         strict=True)
+
+        self.assertListEqual(self.downloads, [])
+
+        result = build_assets(manifest, self.output_dir,
+                              AssetCache(self.cache_dir, self.download))
+
+        self.assertEqual(result["script.js"], fingerprint("script.js",
+                                                          b"a();"))
+        self.assertListEqual(self.downloads, ["https://example.org/a.js"])
+
+    def test_build_assets(self):
+        """Testcase for the function `build_assets()`."""
+        manifest = {
+            "styles.css": [{"url": "https://example.org/a.css"},
+                           {"url": "https://example.org/b.css"}],
+            "script.js": [{"url": "https://example.org/a.js"},
+                          {"url": "https://example.org/b.js"}],
+            "favicon.ico": [{"url": "https://example.org/favicon.ico"}]}
+
+        for sources in manifest.values():
+            for source in sources:
+                source["sha256"] = content_hash(SOURCES[source["url"]])
+
+        expected = {"styles.css": b"a{color : red;}\nb,c{}",
+                    "script.js": b"a();;\nb()",
+                    "favicon.ico": b"\x00\x01\x02"}
+
+        result = build_assets(manifest, self.output_dir,
+                              AssetCache(self.cache_dir, self.download))
+
+        self.assertSetEqual(set(result), set(expected))
+
+        for name, content in expected.items():
+            self.assertEqual(result[name], fingerprint(name, content))
+
+            with open(os.path.join(self.output_dir, result[name]),
+                      "rb") as asset_file:
+                self.assertEqual(asset_file.read(), content)
+
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir,
+                                                    "assets.json")))
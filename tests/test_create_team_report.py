@@ -0,0 +1,249 @@
+"""Testsuite for python script `create_team_report.py`."""
+
+import gzip
+import json
+import os
+import tempfile
+import threading
+import urllib.request
+
+from unittest import TestCase
+
+from sqlalchemy import inspect
+
+from create_team_report import build_view_model, build_data_feed, \
+                               write_data_feed, create_server, \
+                               parse_arguments
+from serlo.model import SerloDatabase
+from serlo.profiler import QueryProfiler
+from tests.data import generate_working_units
+from tests.fixtures import DatabaseTestCase
+
+class TestViewModel(DatabaseTestCase):
+    """Testcases for the view model of the report."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.database.add_all(generate_working_units())
+
+        self.report = build_view_model(self.database)
+
+    def test_units(self):
+        """Testcase for the sorted projects and support units."""
+        self.assertListEqual([x["title"] for x in self.report["projects"]],
+                             ["P - ", "P - project1"])
+        self.assertListEqual([x["title"] for x
+                              in self.report["support_units"]],
+                             ["U - Another support unit",
+                              "U - Support Unit Master"])
+
+        unit = self.report["support_units"][0]
+
+        self.assertEqual(unit["person_responsible"]["name"], " ")
+        self.assertListEqual([x["name"].split(" (")[0] for x
+                              in unit["members"]],
+                             [" ", "Markus Miller", "Yannick Müller"])
+
+    def test_loaded_contacts(self):
+        """Testcase that only the shown work contacts are loaded."""
+        self.database.expunge_all()
+
+        self.assertDictEqual(build_view_model(self.database), self.report)
+
+        for person in self.database.persons:
+            self.assertTrue(set(["emails", "phone_numbers"])
+                            <= inspect(person).unloaded)
+
+    def test_persons(self):
+        """Testcase for the precomputed persons."""
+        persons = dict((x["name"].split(" (")[0], x)
+                       for x in self.report["persons"])
+        markus = persons["Markus Miller"]
+        yannick = persons["Yannick Müller"]
+
+        self.assertEqual(len(persons), 3)
+        self.assertListEqual(yannick["work_emails"], ["some-string-with-ü"])
+        self.assertListEqual(yannick["work_phone_numbers"], ["+490"])
+        self.assertListEqual([x["title"] for x in markus["managing_units"]],
+                             ["P - project1", "U - Support Unit Master"])
+        self.assertListEqual([x["title"] for x
+                              in yannick["participating_units"]],
+                             ["U - Another support unit",
+                              "U - Support Unit Master"])
+        self.assertEqual(markus["mentor"], {"id": yannick["id"],
+                                            "name": yannick["name"]})
+        self.assertListEqual(yannick["mentees"], [{"id": markus["id"],
+                                                   "name": markus["name"]}])
+
+    def test_statements(self):
+        """Testcase that the number of statements does not grow with the
+        number of persons and units."""
+        query_profiler = QueryProfiler()
+        database = SerloDatabase("sqlite://", query_profiler)
+        statements = []
+
+        for count in [1, 5]:
+            database.add_all([x for _ in range(count)
+                              for x in generate_working_units()])
+            database.expunge_all()
+            query_profiler.reset()
+
+            build_view_model(database)
+
+            statements.append(sum(x.count for x
+                                  in query_profiler.statements))
+
+        database.close()
+
+        self.assertEqual(statements[0], statements[1])
+        self.assertLessEqual(statements[0], 9)
+
+    def test_tags(self):
+        """Testcase for the displayed tags passed to the view model."""
+        report = build_view_model(self.database, {"Team": [23]})
+
+        self.assertSetEqual(set(x["name"] for x in report["persons"]),
+                            set(["Markus Miller (Team)", "Yannick Müller",
+                                 " "]))
+
+        report = build_view_model(self.database, {})
+
+        self.assertSetEqual(set(x["name"] for x in report["persons"]),
+                            set(["Markus Miller", "Yannick Müller", " "]))
+
+class TestDataFeed(DatabaseTestCase):
+    """Testcases for the JSON data feed of the report."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.database.add_all(generate_working_units())
+        self.report = build_view_model(self.database)
+
+    def test_build_data_feed(self):
+        """Testcase for the function `build_data_feed()`."""
+        feed = build_data_feed(self.report)
+        project1 = self.report["projects"][1]
+        person = self.report["persons"][0]
+
+        self.assertListEqual(feed["projects"][1],
+                             [project1["id"], "P - project1",
+                              "overview_document", "storage_url",
+                              "slack_url",
+                              project1["person_responsible"]["id"],
+                              [x["id"] for x in project1["members"]],
+                              "My description"])
+        self.assertEqual(len(feed["support_units"]), 2)
+        self.assertListEqual(feed["persons"][0][:4],
+                             [person["id"], person["name"],
+                              person["work_emails"],
+                              person["work_phone_numbers"]])
+        self.assertListEqual([x[6] is None for x in feed["persons"]],
+                             [x["mentor"] is None
+                              for x in self.report["persons"]])
+
+    def test_write_data_feed(self):
+        """Testcase for the function `write_data_feed()`."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "team.json")
+            url = write_data_feed(self.report, path)
+
+            with open(path, encoding="utf-8") as data_file:
+                self.assertDictEqual(json.load(data_file),
+                                     build_data_feed(self.report))
+
+        self.assertRegex(url, r"^\./team\.json\?v=[0-9a-f]{12}$")
+
+class TestReportServer(TestCase):
+    """Testcases for the server mode of the report."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database_file = os.path.join(self.directory.name, "serlo.db")
+        self.template_file = os.path.join(self.directory.name, "report.html")
+
+        SerloDatabase("sqlite:///" + self.database_file) \
+            .add_all(generate_working_units())
+
+        self.write_template("{{ report.persons|length }} persons")
+
+        arguments = parse_arguments(["sqlite:///" + self.database_file,
+                                     self.template_file,
+                                     "--root", self.directory.name])
+
+        self.server = create_server(arguments, ("localhost", 0))
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={"poll_interval": 0.01})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.directory.cleanup()
+
+    def write_template(self, content):
+        """Replaces the template and advances its modification time."""
+        mtime = os.stat(self.template_file).st_mtime_ns \
+                if os.path.exists(self.template_file) else 0
+
+        with open(self.template_file, "w", encoding="utf-8") as template:
+            template.write(content)
+
+        os.utime(self.template_file, ns=(mtime + 10**9, mtime + 10**9))
+
+    def request(self, path="/", headers=None):
+        """Returns the response of the server to the GET request `path`."""
+        req = urllib.request.Request(
+            f"http://localhost:{self.server.server_port}{path}",
+            headers=headers or {})
+
+        try:
+            with urllib.request.urlopen(req) as response:
+                return (response.status, response.headers, response.read())
+        except urllib.error.HTTPError as error:
+            return (error.code, error.headers, error.read())
+
+    def test_report(self):
+        """Testcase for serving the cached report."""
+        status, headers, body = self.request()
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b"3 persons")
+        self.assertEqual(self.request("/index.html")[2], body)
+
+        status, headers, body = self.request(
+            headers={"If-None-Match": headers["ETag"]})
+
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b"")
+
+    def test_gzip(self):
+        """Testcase for gzip compressed responses."""
+        _, headers, body = self.request(headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), b"3 persons")
+
+    def test_reload(self):
+        """Testcase for rendering the report again after changes."""
+        etag = self.request()[1]["ETag"]
+
+        self.write_template("{{ report.projects|length }} projects")
+
+        status, headers, body = self.request(
+            headers={"If-None-Match": etag})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b"2 projects")
+        self.assertNotEqual(headers["ETag"], etag)
+
+        SerloDatabase("sqlite:///" + self.database_file).clear()
+
+        self.assertEqual(self.request()[2], b"0 projects")
+
+    def test_static_files(self):
+        """Testcase for serving the static files next to the report."""
+        self.assertEqual(self.request("/report.html")[0], 200)
+        self.assertEqual(self.request("/missing.css")[0], 404)
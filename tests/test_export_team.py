@@ -0,0 +1,49 @@
+"""Testsuite for python script `export_team.py`."""
+
+import os
+import tempfile
+import unittest
+
+from unittest import TestCase
+
+from export_team import run_script
+from serlo.model import SerloDatabase
+from tests.data import generate_working_units
+from tests.serlo.test_export import HAS_PYARROW
+
+class TestExportTeamScript(TestCase):
+    """Testcases for the script `export_team.py`."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database_spec = "sqlite:///" + os.path.join(
+            self.directory.name, "serlo.db")
+
+        database = SerloDatabase(self.database_spec)
+        database.add_all(generate_working_units())
+        database.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @unittest.skipIf(HAS_PYARROW, "pyarrow is installed")
+    def test_missing_pyarrow(self):
+        """Testcase for exporting without `pyarrow`."""
+        with self.assertRaises(SystemExit) as context:
+            run_script([self.database_spec, self.directory.name])
+
+        self.assertEqual(str(context.exception), "Error: The export "
+                         "requires the package `pyarrow`.")
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_run_script(self):
+        """Testcase for exporting Arrow files."""
+        output = os.path.join(self.directory.name, "export")
+
+        run_script([self.database_spec, output, "--format", "arrow"])
+
+        self.assertSetEqual(set(os.listdir(output)),
+                            set(f"{x}.arrow" for x in
+                                ["persons", "emails", "phone_numbers", "tags",
+                                 "working_units", "participants",
+                                 "mentoring"]))
@@ -1,15 +1,32 @@
 """Testsuite for python script `highrise_importer.py`."""
 
+import json
 import os
+import random
 import subprocess
+import tempfile
+import time
+import unittest
 import xml.etree.ElementTree as ET
 
 from unittest import TestCase
 
+import requests
+
 from highrise_importer import parse_email, parse_phone_number, parse_person, \
                               parse_people, parse_working_unit, xml_text, \
                               xml_find, parse_working_units, parse_mentoring, \
-                              parse_tag
+                              parse_tag, run_pipeline, sync, \
+                              load_snapshots, snapshot_key, \
+                              parse_subject_datas, parse_deals, \
+                              parse_working_unit_spec, Account, RateLimiter, \
+                              import_accounts, load_accounts, \
+                              format_status, api_request, MAX_RETRIES, \
+                              resume_offsets
+from serlo.model import SerloDatabase, UnitType
+from serlo.registry import Registry, default_registry
+from serlo.snapshots import SnapshotCache
+from serlo.validation import Quarantine, ValidationError
 from tests.data import generate_emails, generate_email_specs, \
                        generate_phone_numbers, generate_phone_number_specs, \
                        generate_persons, generate_person_specs, \
@@ -18,6 +35,10 @@ from tests.data import generate_emails, generate_email_specs, \
                        generate_person_ids, generate_working_unit_list_spec, \
                        generate_mentoring_spec, generate_tags, \
                        generate_tag_specs
+from tests.fixtures import POSTGRES_URL, POSTGRES_VARIABLE, \
+                           DatabaseTestCase, highrise_responses, xml_fixture
+from tests.fuzzing import REGISTRY, best_time, deal_element, id_element, \
+                          people_document, person_element
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 
@@ -52,18 +73,42 @@ class TestHighriseImporterScript(TestCase):
         self.assertEqual(xml_find("b", xml), xml.find("b"))
         self.assertEqual(xml_find("e", xml).text, "42")
 
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(ValidationError):
             xml_find("b", ET.fromstring("<a><c/><d/></a>"))
 
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(ValidationError):
             xml_find("b", ET.fromstring("<a><b><c/></b><b /></a>"))
 
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(ValidationError):
             xml_find("b", ET.fromstring("<a></a>"))
 
         with self.assertRaises(TypeError):
             xml_find("b", None)
 
+    def test_xml_find_optimized(self):
+        """Testcase for the validation of `xml_find()` under `python -O`."""
+        returncode, _, err = run_command(
+            "python -O -c 'import xml.etree.ElementTree as ET; "
+            "from highrise_importer import xml_find; "
+            "xml_find(\"b\", ET.fromstring(\"<a/>\"))'")
+
+        self.assertEqual(returncode, 1)
+        self.assertIn("ValidationError: Child with tag `b` not found.", err)
+
+    def test_parse_subject_datas(self):
+        """Tests for function `parse_subject_datas()`."""
+        spec = ET.fromstring(generate_working_unit_specs()[0])
+
+        self.assertDictEqual(parse_subject_datas(spec),
+                             {"1311275": "slack_url",
+                              "1224165": "overview_document",
+                              "1258882": "storage_url"})
+        self.assertDictEqual(parse_subject_datas(spec, ["1224165"]),
+                             {"1224165": "overview_document"})
+        self.assertDictEqual(parse_subject_datas(spec, set()), {})
+        self.assertDictEqual(parse_subject_datas(ET.fromstring("<deal/>"),
+                                                 ["1224165"]), {})
+
     def test_parse_email(self):
         """Testcase for the function `parse_email()`."""
         specs = [ET.fromstring(x) for x in generate_email_specs()]
@@ -126,6 +171,18 @@ class TestHighriseImporterScript(TestCase):
                               <category-id type="integer">123</category-id>
                              </deal>"""), persons))
 
+        registry = Registry({"member_tag": "1",
+                             "categories": {"6436430": "support_unit"},
+                             "subject_fields": {"1311275": "storage_url"}})
+        unit = parse_working_unit(specs[0], persons, registry)
+
+        self.assertEqual(unit.storage_url, "slack_url")
+        self.assertEqual(unit.description, units[0].description)
+        self.assertIsNone(unit.overview_document)
+        self.assertIsNone(unit.slack_url)
+        self.assertEqual(unit.unit_type, UnitType.support_unit)
+        self.assertIsNone(parse_working_unit(specs[2], persons, registry))
+
     def test_parse_working_units(self):
         """Testcase for the function `parse_working_units()`."""
         units = generate_working_units()
@@ -148,5 +205,659 @@ class TestHighriseImporterScript(TestCase):
 
         self.assertEqual(returncode, 1)
         self.assertEqual(out, "")
-        self.assertEqual(err.strip(), "Error: No database file specified as " + \
-                                      "first argument.")
+        self.assertEqual(err.strip(), "Error: No database file specified "
+                                      "as first argument.")
+
+def fake_api(responses, page_size):
+    """Returns a function which serves the XML specifications `responses`
+    (a dictionary from endpoints to specifications) page by page like the
+    Highrise API."""
+    def fetch_page(endpoint, params):
+        xml = ET.fromstring(responses[endpoint])
+        offset = params["n"]
+        page = ET.Element(xml.tag)
+
+        page.extend(list(xml)[offset:offset + page_size])
+
+        return ET.tostring(page, encoding="unicode")
+
+    return fetch_page
+
+class TestPipeline(TestCase):
+    """Testsuite for the asynchronous import pipeline."""
+
+    def setUp(self):
+        self.responses = dict(highrise_responses())
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = SerloDatabase("sqlite:///" + os.path.join(
+            self.directory.name, "serlo.db"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_imported(self):
+        """Checks that the database contains all test entities."""
+        persons = generate_persons()
+        units = generate_working_units()
+
+        self.assertSetEqual(
+            set((p.name, p.mentor.name if p.mentor else None)
+                for p in self.database.persons),
+            set((p.name, p.mentor.name if p.mentor else None)
+                for p in persons))
+        self.assertSetEqual(
+            set((u.title, u.person_responsible.name,
+                 frozenset(x.name for x in u.participants))
+                for u in self.database.working_units),
+            set((u.title, u.person_responsible.name,
+                 frozenset(x.name for x in u.participants)) for u in units))
+
+    def test_run_pipeline(self):
+        """Testcase for importing everything with one page per endpoint."""
+        run_pipeline(self.database, fake_api(self.responses, 500))
+
+        self.assert_imported()
+
+    def test_run_pipeline_paged(self):
+        """Testcase for importing with many small pages and queues."""
+        run_pipeline(self.database, fake_api(self.responses, 2),
+                     queue_size=1, page_size=2)
+
+        self.assert_imported()
+
+    def test_run_pipeline_error(self):
+        """Testcase for an error while downloading."""
+        def fetch_page(endpoint, params):
+            raise ConnectionError(f"{endpoint} not reachable")
+
+        with self.assertRaises(ConnectionError):
+            run_pipeline(self.database, fetch_page)
+
+    def test_run_pipeline_again(self):
+        """Testcase for importing into a database which already holds an
+        import."""
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2)
+
+        self.responses["people"] = self.responses["people"].replace(
+            "<first-name>Markus</first-name>", "<first-name>Max</first-name>")
+
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2)
+
+        self.assertSetEqual(set(x.first_name for x in self.database.persons),
+                            set(["Max", "Yannick", ""]))
+        self.assertEqual(self.database.working_units.count(), 4)
+        self.assertEqual(self.database.checkpoints.count(), 9)
+
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2,
+                     resume=True)
+
+        self.assertEqual(self.database.persons.count(), 3)
+
+    def test_run_pipeline_writer_error(self):
+        """Testcase for stopping the downloads after an error of the
+        writer."""
+        fetch_page = fake_api(self.responses, 1)
+        offsets = []
+
+        def counting_fetch_page(endpoint, params):
+            offsets.append((endpoint, params["n"]))
+            return fetch_page(endpoint, params)
+
+        def add_all(instances):
+            raise RuntimeError("database is gone")
+
+        self.database.add_all = add_all
+
+        with self.assertRaisesRegex(RuntimeError, "database is gone"):
+            run_pipeline(self.database, counting_fetch_page, queue_size=1,
+                         page_size=1)
+
+        self.assertLess(len([x for x in offsets if x[0] == "deals"]), 13)
+
+    def test_run_pipeline_quarantine(self):
+        """Testcase for importing with a malformed person."""
+        self.responses["people"] = self.responses["people"].replace(
+            "<first-name></first-name>", "", 1)
+        quarantine = Quarantine()
+
+        with self.assertRaises(ValidationError):
+            run_pipeline(self.database, fake_api(self.responses, 500))
+
+        run_pipeline(self.database, fake_api(self.responses, 2),
+                     page_size=2, quarantine=quarantine)
+
+        self.assertEqual(self.database.persons.count(), 2)
+        self.assertListEqual([(x.endpoint, x.problems)
+                              for x in quarantine.rejections],
+                             [("people", ["`first-name` is missing"])])
+
+    def test_run_pipeline_checkpoints(self):
+        """Testcase for the checkpoints of the imported pages."""
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2)
+
+        self.assertListEqual(
+            sorted((x.endpoint, x.offset, x.records)
+                   for x in self.database.checkpoints),
+            [("deals", 0, 2), ("deals", 2, 2), ("deals", 4, 2),
+             ("deals", 6, 2), ("deals", 8, 2), ("deals", 10, 2),
+             ("deals", 12, 1),
+             ("people", 0, 2), ("people", 2, 1)])
+
+    def test_run_pipeline_resume(self):
+        """Testcase for resuming an interrupted import."""
+        fetch_page = fake_api(self.responses, 2)
+
+        def failing_fetch_page(endpoint, params):
+            if endpoint == "deals" and params["n"] >= 6:
+                raise ConnectionError("Too many requests")
+
+            return fetch_page(endpoint, params)
+
+        with self.assertRaises(ConnectionError):
+            run_pipeline(self.database, failing_fetch_page, page_size=2)
+
+        self.assertEqual(self.database.persons.count(), 3)
+
+        run_pipeline(self.database, fetch_page, page_size=2, resume=True)
+
+        self.assert_imported()
+
+    def test_resume_without_deals(self):
+        """Testcase for resuming an import which was interrupted before the
+        first page of deals."""
+        fetch_page = fake_api(self.responses, 2)
+        requests_sent = []
+
+        def failing_fetch_page(endpoint, params):
+            if endpoint == "deals":
+                # Fail only after both pages of people are written
+                observer = SerloDatabase("sqlite:///" + os.path.join(
+                    self.directory.name, "serlo.db"))
+
+                for _ in range(500):
+                    if observer.checkpoints.count() == 2:
+                        break
+
+                    observer.commit()
+                    time.sleep(0.01)
+
+                observer.close()
+
+                raise ConnectionError("Too many requests")
+
+            return fetch_page(endpoint, params)
+
+        def counting_fetch_page(endpoint, params):
+            requests_sent.append((endpoint, params["n"]))
+            return fetch_page(endpoint, params)
+
+        with self.assertRaises(ConnectionError):
+            run_pipeline(self.database, failing_fetch_page, page_size=2)
+
+        self.assertDictEqual(resume_offsets(self.database, fetch_page, 2),
+                             {"people": None, "deals": 0})
+
+        run_pipeline(self.database, counting_fetch_page, page_size=2,
+                     resume=True)
+
+        self.assert_imported()
+        self.assertListEqual([x for x in requests_sent if x[0] == "people"],
+                             [("people", 2)])
+
+        requests_sent.clear()
+        resume_offsets(self.database, counting_fetch_page, 2,
+                       verify_all=True)
+
+        self.assertEqual(len(requests_sent), 9)
+
+    def test_run_pipeline_resume_changed(self): # pylint: disable=invalid-name
+        """Testcase for resuming an import whose source has changed."""
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2)
+
+        self.responses["people"] = generate_people_specs()[0].replace(
+            "<first-name></first-name>", "<first-name>Anna</first-name>")
+
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2,
+                     resume=True)
+
+        self.assertSetEqual(set(x.first_name for x in self.database.persons),
+                            set(["Markus", "Yannick", "Anna"]))
+        self.assertEqual(self.database.working_units.count(), 4)
+
+    def test_resume_changed_first_page(self):
+        """Testcase for resuming an import whose first page has changed."""
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2)
+
+        self.responses["people"] = self.responses["people"].replace(
+            "<first-name>Markus</first-name>", "<first-name>Max</first-name>")
+
+        run_pipeline(self.database, fake_api(self.responses, 2), page_size=2,
+                     resume=True)
+
+        self.assertSetEqual(set(x.first_name for x in self.database.persons),
+                            set(["Max", "Yannick", ""]))
+
+class TestSync(DatabaseTestCase):
+    """Testsuite for synchronizing an existing database."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.people = xml_fixture(highrise_responses()["people"])
+        self.deals = xml_fixture(highrise_responses()["deals"])
+
+    def sync(self):
+        """Synchronizes the database with the current specifications."""
+        return sync(self.database,
+                    ET.tostring(self.people, encoding="unicode"),
+                    ET.tostring(self.deals, encoding="unicode"))
+
+    def test_sync(self):
+        """Testcase for synchronizing an empty database."""
+        log = self.sync().split("\n")
+
+        self.assertIn("Joined: Markus Miller", log)
+        self.assertIn("New unit: P - project1", log)
+        self.assertIn("Markus Miller joined P - project1", log)
+        self.assertEqual(self.database.persons.count(), 3)
+        self.assertEqual(self.database.working_units.count(), 4)
+        self.assertEqual(self.sync(), "")
+
+    def test_sync_changes(self):
+        """Testcase for synchronizing changed specifications."""
+        self.sync()
+
+        markus = [x for x in self.people
+                  if xml_text(xml_find("id", x)) == "23"][0]
+        xml_find("last-name", markus).text = "Meyer"
+
+        unit = [x for x in self.deals
+                if x.find("id") is not None
+                and xml_text(xml_find("id", x)) == "2"][0]
+        self.deals.remove(unit)
+
+        ids = [x.highrise_id for x in self.database.persons]
+
+        self.assertEqual(self.sync(), "\n".join([
+            "Changed person Markus Miller: last_name='Meyer'",
+            "Closed unit: P - ",
+            "Yannick Müller left P - "]))
+        self.assertListEqual([x.highrise_id for x in self.database.persons],
+                             ids)
+        self.assertEqual(self.database.working_units.count(), 3)
+
+    def test_sync_quarantine(self):
+        """Testcase that quarantined records keep their stored entities."""
+        self.sync()
+        persons = dict((xml_text(xml_find("id", x)), x) for x in self.people)
+
+        persons["23"].remove(xml_find("last-name", persons["23"]))
+        xml_find("last-name", persons["42"]).text = "Meyer"
+
+        quarantine = Quarantine()
+        log = sync(self.database, ET.tostring(self.people, encoding="unicode"),
+                   ET.tostring(self.deals, encoding="unicode"),
+                   quarantine=quarantine)
+
+        self.assertListEqual([x.highrise_id for x in quarantine.rejections],
+                             ["23"])
+        self.assertEqual(log, "Changed person Yannick Müller: "
+                              "last_name='Meyer'")
+        self.assertEqual(self.database.persons.count(), 3)
+        self.assertEqual(self.database.working_units.count(), 4)
+        self.assertEqual(self.database.person_by_highrise_id("23").last_name,
+                         "Miller")
+
+    def test_snapshot_cache(self):
+        """Testcase for loading cached snapshots instead of parsing."""
+        people = ET.tostring(self.people, encoding="unicode")
+        deals = ET.tostring(self.deals, encoding="unicode")
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SnapshotCache(directory)
+            persons, units = load_snapshots(people, deals, cache=cache)
+
+            self.assertSetEqual(set(persons), set(["1", "23", "42"]))
+            self.assertEqual(cache.get(snapshot_key(people, deals,
+                                                    default_registry())),
+                             (persons, units, []))
+
+            cache.put(snapshot_key(people, deals, default_registry()),
+                      {}, {})
+
+            self.assertEqual(load_snapshots(people, deals, cache=cache),
+                             ({}, {}))
+            self.assertEqual(load_snapshots(people, deals), (persons, units))
+
+    def test_snapshot_cache_rejections(self):
+        """Testcase for reporting the rejected records of a cached
+        payload."""
+        self.people[0].remove(self.people[0].find("first-name"))
+        people = ET.tostring(self.people, encoding="unicode")
+        deals = ET.tostring(self.deals, encoding="unicode")
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SnapshotCache(directory)
+
+            for _ in range(2):
+                quarantine = Quarantine()
+                persons, _ = load_snapshots(people, deals, cache=cache,
+                                            quarantine=quarantine)
+
+                self.assertEqual(len(persons), 2)
+                self.assertListEqual([(x.endpoint, x.problems)
+                                      for x in quarantine.rejections],
+                                     [("people",
+                                       ["`first-name` is missing"])])
+
+            with self.assertRaises(ValidationError):
+                load_snapshots(people, deals, cache=cache)
+
+@unittest.skipUnless(POSTGRES_URL, f"{POSTGRES_VARIABLE} is not set")
+class TestSyncPostgres(TestSync):
+    """The testcases of `TestSync` against the PostgreSQL database of the
+    environment variable `SERLO_TEST_POSTGRES`. The first sync is bulk
+    loaded with `COPY`."""
+
+    def setUp(self):
+        self.database = SerloDatabase(POSTGRES_URL)
+        self.database.clear()
+
+        self.people = xml_fixture(highrise_responses()["people"])
+        self.deals = xml_fixture(highrise_responses()["deals"])
+
+    def tearDown(self):
+        self.database.clear()
+        self.database.close()
+
+class FakeSession(object):
+    """Replacement of `requests.Session` which serves the responses of
+    `fake_api()` for several accounts. The dictionary `accounts` maps the base
+    URLs of the accounts onto their responses."""
+    # pylint: disable=too-few-public-methods
+
+    class Response(object):
+        """Response of the fake session."""
+        # pylint: disable=too-few-public-methods
+
+        def __init__(self, text, status_code=200, headers=None):
+            self.text = text
+            self.status_code = status_code
+            self.headers = headers or {}
+
+        def raise_for_status(self):
+            """Raises a `requests.HTTPError` for error responses."""
+            if self.status_code >= 400:
+                raise requests.HTTPError(f"{self.status_code} Error")
+
+    def __init__(self, accounts):
+        self.accounts = accounts
+
+    def get(self, url, auth, params):
+        """Returns the response of the API call to `url`."""
+        # pylint: disable=unused-argument
+        base_url, endpoint = url[:-len(".xml")].rsplit("/", 1)
+
+        if base_url not in self.accounts:
+            raise ConnectionError(f"{base_url} not reachable")
+
+        return self.Response(fake_api(self.accounts[base_url],
+                                      500)(endpoint, params))
+
+class StatusSession(object):
+    """Replacement of `requests.Session` which answers the requests with the
+    status codes of the list `status_codes` and afterwards with `text`."""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, status_codes, text="<people />"):
+        self.status_codes = list(status_codes)
+        self.text = text
+        self.requests = 0
+
+    def get(self, url, auth, params):
+        """Returns the next response."""
+        # pylint: disable=unused-argument
+        self.requests += 1
+
+        if self.status_codes:
+            return FakeSession.Response("<errors />",
+                                        self.status_codes.pop(0),
+                                        {"Retry-After": "0"})
+
+        return FakeSession.Response(self.text)
+
+class TestApiRequest(TestCase):
+    """Testcases for the function `api_request()`."""
+
+    def test_retry(self):
+        """Testcase for retrying throttled requests."""
+        session = StatusSession([429, 429, 503])
+
+        self.assertEqual(api_request("people", "token", session=session),
+                         "<people />")
+        self.assertEqual(session.requests, 4)
+
+        session = StatusSession([429] * (MAX_RETRIES + 1))
+
+        with self.assertRaises(requests.HTTPError):
+            api_request("people", "token", session=session)
+
+        self.assertEqual(session.requests, MAX_RETRIES + 1)
+
+    def test_error(self):
+        """Testcase for error responses which are not retried."""
+        session = StatusSession([500])
+
+        with self.assertRaises(requests.HTTPError):
+            api_request("people", "token", session=session)
+
+        self.assertEqual(session.requests, 1)
+
+class TestMultiAccountImport(TestCase):
+    """Testsuite for importing several accounts concurrently."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def database(self, name):
+        """Returns the database specification of the account `name`."""
+        return "sqlite:///" + os.path.join(self.directory.name, name + ".db")
+
+    def test_rate_limiter(self):
+        """Testcase for the class `RateLimiter`."""
+        limiter = RateLimiter(100)
+        start = time.monotonic()
+
+        for _ in range(6):
+            limiter.wait()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_load_accounts(self):
+        """Testcase for the function `load_accounts()`."""
+        config = os.path.join(self.directory.name, "accounts.json")
+
+        with open(config, "w") as config_file:
+            json.dump({"accounts": [
+                {"name": "a", "database": "sqlite://",
+                 "token_variable": "TEST_TOKEN_A", "rate_limit": 5},
+                {"name": "b", "database": "sqlite://",
+                 "base_url": "https://b.example.org",
+                 "token_variable": "TEST_TOKEN_B"}]}, config_file)
+
+        os.environ["TEST_TOKEN_A"] = "token a"
+
+        with self.assertRaises(ValueError):
+            load_accounts(config)
+
+        os.environ["TEST_TOKEN_B"] = "token b"
+
+        try:
+            account1, account2 = load_accounts(config)
+        finally:
+            del os.environ["TEST_TOKEN_A"]
+            del os.environ["TEST_TOKEN_B"]
+
+        self.assertEqual(account1.api_token, "token a")
+        self.assertEqual(account1.rate_limit, 5)
+        self.assertEqual(account2.base_url, "https://b.example.org")
+        self.assertIsNone(account2.rate_limit)
+        self.assertDictEqual(account2.registry.unit_types,
+                             default_registry().unit_types)
+
+    def test_import_accounts(self):
+        """Testcase for the function `import_accounts()`."""
+        responses = highrise_responses()
+        small_responses = {"people": generate_people_specs()[1],
+                           "deals": "<deals />"}
+        session = FakeSession({"https://a": responses,
+                               "https://b": small_responses})
+        accounts = [Account(name, base_url, "token", self.database(name),
+                            default_registry(), 1000) for name, base_url
+                    in [("a", "https://a"), ("b", "https://b"),
+                        ("c", "https://c")]]
+
+        results = import_accounts(accounts, session)
+
+        self.assertListEqual([x[:1] + x[2:] for x in results],
+                             [("a", 3, 4, None), ("b", 2, 0, None),
+                              ("c", 0, 0,
+                               "ConnectionError: https://c not reachable")])
+
+        status = format_status(results).splitlines()
+
+        self.assertEqual(len(status), 4)
+        self.assertTrue(status[1].startswith("a "))
+        self.assertTrue(status[3].endswith("https://c not reachable"))
+
+        session.accounts["https://b"] = {
+            "people": generate_people_specs()[0], "deals": "<deals />"}
+
+        results = import_accounts(accounts[:2], session)
+
+        self.assertListEqual([x[:1] + x[2:] for x in results],
+                             [("a", 3, 4, None), ("b", 3, 0, None)])
+
+class TestParserFuzzing(TestCase):
+    """Testcases for parsing random Highrise-shaped XML (see
+    `tests.fuzzing`). The time of the parsers has to grow linearly with the
+    size of the input and to stay within a budget per element."""
+
+    SEEDS = range(40)
+
+    # Budgets of the parse time per element in seconds
+    PERSON_BUDGET = 2e-3
+    ELEMENT_BUDGET = 2e-5
+
+    # Maximal growth of the parse time when the input grows fourfold
+    GROWTH_LIMIT = 8
+
+    def assert_parsed_person(self, person, expected):
+        """Checks the parsed `person` against its `expected` values."""
+        self.assertEqual(person.highrise_id, expected["highrise_id"])
+        self.assertEqual(person.first_name, expected["first_name"])
+        self.assertEqual(person.last_name, expected["last_name"])
+        self.assertListEqual([(x.address, x.location) for x in person.emails],
+                             expected["emails"])
+        self.assertListEqual([(x.number, x.location)
+                              for x in person.phone_numbers],
+                             expected["phone_numbers"])
+        self.assertListEqual([x.tag_id for x in person.tags],
+                             expected["tags"])
+
+    def assert_linear(self, parse, size):
+        """Checks that the time of `parse(size)` grows at most linearly
+        with `size` and returns the time per element of the larger input."""
+        small = best_time(lambda: parse(size))
+        large = best_time(lambda: parse(4 * size))
+
+        self.assertLess(large, self.GROWTH_LIMIT * small)
+
+        return large / (4 * size)
+
+    def test_people(self):
+        """Testcase for parsing random people."""
+        for seed in self.SEEDS:
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                source, expected = people_document(rng, rng.randint(0, 10),
+                                                   depth=rng.randint(0, 4))
+                people = parse_people(ET.fromstring(source))
+
+                self.assertListEqual([x[0] for x in people],
+                                     [x["highrise_id"] for x in expected])
+
+                for (_, person), values in zip(people, expected):
+                    self.assert_parsed_person(person, values)
+
+    def test_deals(self):
+        """Testcase for parsing random working units."""
+        for seed in self.SEEDS:
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                deals = ET.Element("deals", type="array")
+                expected = [deal_element(rng, deals, number + 1)
+                            for number in range(rng.randint(0, 10))]
+                deals = ET.fromstring(ET.tostring(deals, encoding="unicode"))
+
+                self.assertTupleEqual(parse_deals(deals, REGISTRY),
+                                      (expected, {}))
+
+    def test_deep_names(self):
+        """Testcase for names split over deeply nested elements."""
+        rng = random.Random(0)
+        people = ET.Element("people", type="array")
+        expected = [person_element(rng, people, number + 1, depth=2000)
+                    for number in range(2)]
+
+        for (_, person), values in zip(parse_people(people), expected):
+            self.assert_parsed_person(person, values)
+
+    def test_people_time(self):
+        """Testcase for the parse time of many people."""
+        documents = dict((size, ET.fromstring(people_document(
+            random.Random(size), size, contacts=2)[0])) for size in (50, 200))
+        per_person = self.assert_linear(
+            lambda size: parse_people(documents[size]), 50)
+
+        self.assertLess(per_person, self.PERSON_BUDGET)
+
+    def test_screen_time(self):
+        """Testcase for the overhead of screening the records of a page
+        compared to parsing them directly."""
+        people = ET.fromstring(people_document(random.Random(0), 200)[0])
+
+        direct = best_time(lambda: [parse_person(x) for x in people], 5)
+        screened = best_time(lambda: parse_people(people, Quarantine()), 5)
+
+        self.assertLess(screened, 1.5 * direct)
+
+    def test_party_list_time(self):
+        """Testcase for the parse time of huge lists of participants and
+        of custom fields."""
+        def deal(size):
+            deals = ET.Element("deals")
+            deal_element(random.Random(size), deals, 1, parties=0,
+                         subject_datas=0)
+            parties = deals[0].find("parties")
+            fields = deals[0].find("subject_datas")
+
+            for number in range(size):
+                id_element(ET.SubElement(parties, "party"), "id", number)
+                field = ET.SubElement(fields, "subject_data")
+                id_element(field, "subject_field_id", 1000 + number)
+                ET.SubElement(field, "value").text = str(number)
+
+            return deals[0]
+
+        specs = dict((size, deal(size)) for size in (2000, 8000))
+        per_element = self.assert_linear(
+            lambda size: parse_working_unit_spec(specs[size], REGISTRY),
+            2000)
+
+        self.assertLess(per_element, self.ELEMENT_BUDGET)
+        self.assertEqual(len(parse_working_unit_spec(specs[8000],
+                                                     REGISTRY)[2]), 8000)
@@ -0,0 +1,60 @@
+"""Startup time budget of the command line scripts."""
+
+import subprocess
+import sys
+
+from unittest import TestCase
+
+SCRIPTS = ["create_team_report", "export_team", "highrise_importer",
+           "team_analytics"]
+HEAVY_MODULES = ["asyncio", "http.server", "jinja2", "pytz", "requests",
+                 "sqlalchemy", "serlo.model"]
+
+# Module imported after a script as baseline of its startup time budget
+BASELINE_MODULE = "sqlalchemy"
+
+# Maximal cumulative import time of a script relative to the one of the
+# baseline module in the same interpreter, so that the budget scales with
+# the load of the machine (e.g. with parallel tests)
+STARTUP_BUDGET = 0.5
+
+def import_times(*modules):
+    """Returns a dictionary mapping all modules loaded while importing
+    `modules` (in this order) onto their cumulative import time in
+    microseconds. The times are measured in a new interpreter with `python
+    -X importtime`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             f"import {', '.join(modules)}"],
+                            stderr=subprocess.PIPE, universal_newlines=True,
+                            check=True)
+    times = dict()
+
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+
+    return times
+
+class TestStartup(TestCase):
+    """Testcases for the startup of the scripts."""
+
+    def test_lazy_imports(self):
+        """Testcase that no heavy module is loaded at startup."""
+        for script in SCRIPTS:
+            with self.subTest(script=script):
+                times = import_times(script)
+
+                self.assertIn(script, times)
+                self.assertListEqual([x for x in HEAVY_MODULES
+                                      if x in times], [])
+
+    def test_startup_budget(self):
+        """Testcase for the startup time budget of the scripts."""
+        for script in SCRIPTS:
+            with self.subTest(script=script):
+                times = import_times(script, BASELINE_MODULE)
+
+                self.assertLess(times[script],
+                                STARTUP_BUDGET * times[BASELINE_MODULE])
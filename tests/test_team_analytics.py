@@ -0,0 +1,35 @@
+"""Testsuite for python script `team_analytics.py`."""
+
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+
+from serlo.model import SerloDatabase
+from team_analytics import run_script
+from tests.data import generate_working_units
+
+class TestTeamAnalyticsScript(TestCase):
+    """Testcases for the script `team_analytics.py`."""
+
+    def test_run_script(self):
+        """Testcase for writing the analytics as JSON file."""
+        with tempfile.TemporaryDirectory() as directory:
+            database_spec = "sqlite:///" + os.path.join(directory, "serlo.db")
+            output = os.path.join(directory, "analytics.json")
+
+            database = SerloDatabase(database_spec)
+            database.add_all(generate_working_units())
+            database.close()
+
+            run_script([database_spec, "--output", output, "--indent", "2"])
+
+            with open(output, encoding="utf-8") as output_file:
+                result = json.load(output_file)
+
+        self.assertEqual(len(result["persons"]), 3)
+        self.assertEqual(result["mentoring"]["max_depth"], 2)
+        self.assertListEqual(result["without_unit"], [])
+        self.assertEqual(sum(len(x) for x
+                             in result["unit_overlaps"]["shared"].values()), 5)